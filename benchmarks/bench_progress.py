@@ -0,0 +1,102 @@
+"""
+Micro-benchmark for adb progress output parsing.
+
+Replays recorded `adb pull -p` / `adb push -p` output through a pipe and
+compares the old char-by-char text loop with src.utils.progress.
+
+    python benchmarks/bench_progress.py [--input recording.txt] [--repeat 3]
+
+Without --input a synthetic recording in adb's format is generated.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.progress import read_progress
+
+
+def synthetic_recording(files=200, steps=100):
+    chunks = []
+    for index in range(files):
+        path = f"/sdcard/DCIM/Camera/VID_{index:05d}.mp4"
+        for percent in range(steps + 1):
+            chunks.append(f"[{percent * 100 // steps:3d}%] {path}\r")
+        chunks.append(f"{path}: 1 file pulled, 0 skipped. 38.{index % 10} MB/s (104857600 bytes in 2.613s)\n")
+    return "".join(chunks).encode("utf-8")
+
+
+def legacy_parse(path):
+    """The loop the transfer workers used before: text mode, read(1), uncompiled regexes."""
+    process = subprocess.Popen(["cat", path], stdout=subprocess.PIPE, universal_newlines=True)
+    lines = 0
+    buffer = ""
+    while True:
+        char = process.stdout.read(1)
+        if not char and process.poll() is not None:
+            break
+        if char in ['\r', '\n']:
+            if buffer:
+                line = buffer.strip()
+                match = re.search(r'\[\s*(\d+)%\]', line)
+                if match:
+                    int(match.group(1))
+                    re.search(r'(\d+\.?\d+\s*[KMG]?B/s)', line)
+                lines += 1
+                buffer = ""
+        else:
+            buffer += char
+    process.wait()
+    return lines
+
+
+def buffered_parse(path):
+    process = subprocess.Popen(["cat", path], stdout=subprocess.PIPE)
+    lines = sum(1 for _ in read_progress(process.stdout))
+    process.wait()
+    return lines
+
+
+def measure(func, path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return lines, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="recorded adb output to replay")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = args.input
+    if not path:
+        handle, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(handle, "wb") as f:
+            f.write(synthetic_recording())
+    try:
+        size = os.path.getsize(path)
+        print(f"Replaying {size / 1024:.0f} KB of adb output, best of {args.repeat}")
+        results = {}
+        for name, func in (("before (read(1) loop)", legacy_parse), ("after (buffered parser)", buffered_parse)):
+            lines, elapsed = measure(func, path, args.repeat)
+            results[name] = lines / elapsed
+            print(f"  {name:26s} {lines} lines in {elapsed:.3f}s = {lines / elapsed:,.0f} lines/sec")
+        before, after = results.values()
+        print(f"  speedup: {after / before:.1f}x")
+    finally:
+        if not args.input:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Query latency benchmark for the fuzzy file name search.
+
+Builds a FuzzyIndex over synthetic camera-roll and document names and times
+a mix of substring, typo, subsequence and short queries.
+
+    python benchmarks/bench_search.py [--entries 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.fuzzy import FuzzyIndex
+
+QUERIES = ["holiday", "holdiay", "img_2023", "dcmcam", "qzxw", "ab", "x", "IMG_20230512_1234"]
+
+
+def synthetic_names(count, seed=1):
+    rnd = random.Random(seed)
+    names = []
+    for _ in range(count):
+        if rnd.random() < 0.5:
+            names.append(f"IMG_2023{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}_{rnd.randint(0, 999999):06d}.jpg")
+        else:
+            stem = "".join(rnd.choices(string.ascii_lowercase + "_ ", k=rnd.randint(5, 20)))
+            names.append(stem + rnd.choice([".pdf", ".txt", ".mp3", ".png"]))
+    names += ["Holiday_Pictures.zip", "DCIM_Camera_notes.txt", "my holiday.mp4"]
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    names = synthetic_names(args.entries)
+    start = time.perf_counter()
+    index = FuzzyIndex(names)
+    print(f"Indexed {len(index):,} names in {time.perf_counter() - start:.1f}s, best of {args.repeat}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = index.search(query)
+            timings.append(time.perf_counter() - start)
+        top = results[0][0] if results else "-"
+        print(f"  {query!r:22s} {min(timings) * 1000:6.1f} ms  {len(results):4d} hits  top: {top}")
+
+
+if __name__ == "__main__":
+    main()
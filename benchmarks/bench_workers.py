@@ -0,0 +1,261 @@
+"""
+End-to-end benchmark of the workers against the simulated adb server.
+
+Runs FileListWorker, AdbCommandWorker, AdbTransferWorker (push and pull),
+ZipWorker and MultiDownloadWorker headless against benchmarks/fake_adb.py
+over a simulated link and reports ops/s, MB/s and latency percentiles.
+
+    python benchmarks/bench_workers.py [--profile usb] [--only list,pull] [--repeat 1]
+    python benchmarks/bench_workers.py --check            # exit 1 on regressions against baselines.json or failures
+    python benchmarks/bench_workers.py --update-baseline  # record this machine's results
+
+Profiles: usb and wifi run by default; local (no simulated delay) measures
+the app's own overhead and is noisier, so it only runs when asked for.
+Baselines are machine specific; record them again after moving machines.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_adb import FakeAdbServer, FakeDevice, SyntheticFs
+
+MB = 1024 * 1024
+SERIAL = "bench-1"
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# rtt in seconds, bandwidth in bytes/s each way
+PROFILES = {
+    "local": {"rtt": 0.0, "bandwidth": 0},
+    "usb": {"rtt": 0.001, "bandwidth": 40 * MB},
+    "wifi": {"rtt": 0.008, "bandwidth": 5 * MB},
+}
+DEFAULT_PROFILES = ["usb", "wifi"]
+# Metrics --check compares; p99 over a few dozen runs is the single slowest one, too noisy to fail on.
+CHECKED = {"ops_per_sec", "mb_per_sec", "p50_ms", "p95_ms"}
+# Metrics where a lower value is better; the rest are rates.
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms"}
+# Sub-millisecond latencies jitter by more than any tolerance; differences below this never count.
+LATENCY_SLACK_MS = 2.0
+
+LIST_ENTRIES = 2000
+TRANSFER_BYTES = 8 * MB  # below the ranged push threshold, so a single sync SEND
+ZIP_FILES, ZIP_FILE_BYTES = 100, 64 * 1024
+BULK_FILES, BULK_FILE_BYTES = 300, 16 * 1024
+
+
+def build_fs():
+    fs = SyntheticFs(seed=7)
+    fs.populate("/sdcard/bench/listing", LIST_ENTRIES, 4096, "entry", ".txt")
+    fs.add_file("/sdcard/bench/big.bin", TRANSFER_BYTES)
+    fs.populate("/sdcard/bench/photos", ZIP_FILES, ZIP_FILE_BYTES, "IMG", ".jpg")
+    fs.populate("/sdcard/bench/small", BULK_FILES, BULK_FILE_BYTES, "note", ".txt")
+    fs.makedirs("/sdcard/bench/upload")
+    return fs
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def summarize(seconds, nbytes=0):
+    """ops/s (and MB/s when bytes moved) plus latency percentiles in ms."""
+    total = sum(seconds)
+    result = {"ops_per_sec": len(seconds) / total}
+    if nbytes:
+        result["mb_per_sec"] = nbytes / total / MB
+    for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        result[name] = percentile(seconds, q) * 1000
+    return result
+
+
+def run_worker(worker):
+    """Runs a worker's run() on this thread and returns the seconds it took."""
+    start = time.perf_counter()
+    worker.run()
+    return time.perf_counter() - start
+
+
+class Bench:
+    def __init__(self, workdir, repeat):
+        self.workdir = workdir
+        self.repeat = repeat
+
+    def times(self, count, make_worker):
+        """Runs make_worker(index) count times after one untimed warm-up run; returns the seconds each took."""
+        seconds = []
+        for index in range(count * self.repeat + 1):
+            elapsed = make_worker(index)
+            if index:
+                seconds.append(elapsed)
+        return seconds
+
+    def list(self):
+        from src.workers import FileListWorker
+        def once(_):
+            worker = FileListWorker("/sdcard/bench/listing", SERIAL)
+            return run_worker(worker)
+        return summarize(self.times(20, once))
+
+    def command(self):
+        from src.workers import AdbCommandWorker
+        def once(index):
+            worker = AdbCommandWorker(["adb", "shell", "echo", f"ping {index}"], SERIAL)
+            return run_worker(worker)
+        return summarize(self.times(100, once))
+
+    def push(self):
+        from src.workers import AdbTransferWorker
+        source = os.path.join(self.workdir, "push.bin")
+        if not os.path.exists(source):
+            with open(source, "wb") as f:
+                f.write(os.urandom(TRANSFER_BYTES))
+        def once(index):
+            worker = AdbTransferWorker(["adb", "push", "-p", source, f"/sdcard/bench/upload/push_{index}.bin"], SERIAL)
+            return run_worker(worker)
+        seconds = self.times(3, once)
+        return summarize(seconds, TRANSFER_BYTES * len(seconds))
+
+    def pull(self):
+        from src.workers import AdbTransferWorker
+        def once(index):
+            target = os.path.join(self.workdir, f"pull_{index}.bin")
+            worker = AdbTransferWorker(["adb", "pull", "-p", "/sdcard/bench/big.bin", target], SERIAL)
+            return run_worker(worker)
+        seconds = self.times(3, once)
+        return summarize(seconds, TRANSFER_BYTES * len(seconds))
+
+    def zip(self):
+        from src.workers import ZipWorker
+        def once(index):
+            worker = ZipWorker(["photos"], "/sdcard/bench", os.path.join(self.workdir, f"photos_{index}.zip"), SERIAL)
+            return run_worker(worker)
+        seconds = self.times(2, once)
+        return summarize(seconds, ZIP_FILES * ZIP_FILE_BYTES * len(seconds))
+
+    def multi_download(self):
+        from src.workers import MultiDownloadWorker
+        def once(index):
+            target = os.path.join(self.workdir, f"download_{index}")
+            os.makedirs(target)
+            worker = MultiDownloadWorker(["small"], "/sdcard/bench", target, SERIAL)
+            return run_worker(worker)
+        seconds = self.times(2, once)
+        return summarize(seconds, BULK_FILES * BULK_FILE_BYTES * len(seconds))
+
+
+SCENARIOS = ["list", "command", "push", "pull", "zip", "multi_download"]
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing every metric that got worse than its baseline by more than tolerance."""
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            expected = baseline.get(scenario, {}).get(metric)
+            if expected is None or metric not in CHECKED:
+                continue
+            if metric in LOWER_IS_BETTER:
+                worse = value > expected * (1 + tolerance) + LATENCY_SLACK_MS
+            else:
+                worse = value < expected * (1 - tolerance)
+            if worse:
+                regressions.append(f"{scenario} {metric}: {value:.2f} vs baseline {expected:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), action="append",
+                        help="link profile, may be repeated (default: usb and wifi)")
+    parser.add_argument("--only", help="comma separated scenarios to run")
+    parser.add_argument("--repeat", type=int, default=1, help="multiply the iterations of every scenario")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of device requests that fail")
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if a result regressed past the baselines or an operation failed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression as a fraction (default 0.25)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--baseline-file", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    profiles = args.profile or DEFAULT_PROFILES
+    scenarios = args.only.split(",") if args.only else SCENARIOS
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="bench_workers_")
+    # The journal, caches and the adb client all have to see the sandbox before src is imported.
+    os.environ["HOME"] = workdir
+    devices = [FakeDevice(SERIAL, build_fs(), error_rate=args.error_rate, seed=7)]
+    server = FakeAdbServer(devices).start()
+    os.environ["ANDROID_ADB_SERVER_PORT"] = str(server.port)
+
+    from PyQt6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    from src.utils import tar_stream
+    from src.utils.metrics import get_metrics
+
+    baselines = {}
+    if os.path.exists(args.baseline_file):
+        with open(args.baseline_file, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    all_results = {}
+    regressions = []
+    try:
+        for profile in profiles:
+            device = devices[0]
+            device.rtt = PROFILES[profile]["rtt"]
+            device.up.bandwidth = device.down.bandwidth = PROFILES[profile]["bandwidth"]
+            # The tar path caches the measured link speed per device; measure again for this link.
+            tar_stream._link_speeds.clear()
+            get_metrics().reset()
+            bench = Bench(tempfile.mkdtemp(dir=workdir), args.repeat)
+            results = all_results[profile] = {}
+            link = f"rtt {device.rtt * 1000:.0f} ms, {device.up.bandwidth / MB:.0f} MB/s" if device.rtt else "no link delay"
+            print(f"\n{profile}: {link}")
+            print(f"{'scenario':16s} {'ops/s':>9s} {'MB/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+            for scenario in scenarios:
+                result = results[scenario] = getattr(bench, scenario)()
+                mb = f"{result['mb_per_sec']:8.1f}" if "mb_per_sec" in result else f"{'':8s}"
+                print(f"{scenario:16s} {result['ops_per_sec']:9.1f} {mb} {result['p50_ms']:9.1f} "
+                      f"{result['p95_ms']:9.1f} {result['p99_ms']:9.1f}")
+            # Failures show up in the metrics every worker reports to, whichever way the worker surfaces them.
+            failed = [f"{op['operation']} {op['errors']}" for op in get_metrics().snapshot()["operations"] if op["errors"]]
+            if failed:
+                print(f"Failed operations: {', '.join(failed)}")
+                # Failures are expected when injected with --error-rate; otherwise a fast failure is no result.
+                if not args.error_rate:
+                    regressions.append(f"{profile}: failed operations: {', '.join(failed)}")
+            regressions += [f"{profile}: {line}" for line in compare(results, baselines.get(profile, {}), args.tolerance)]
+        print(f"\nserver: {devices[0].stats}")
+    finally:
+        server.stop()
+        app.quit()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.update_baseline:
+        for profile, results in all_results.items():
+            baselines.setdefault(profile, {}).update(results)
+        with open(args.baseline_file, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baseline_file}")
+    elif args.check:
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} of the baselines")
+
+
+if __name__ == "__main__":
+    main()
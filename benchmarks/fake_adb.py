@@ -0,0 +1,937 @@
+"""
+Simulated adb server for the benchmarks, and for trying the app without a phone.
+
+Speaks the adb server protocol on a local port: the host services the app
+uses, sync (STAT/LIST/RECV/SEND and their v2 forms), shell v2 sessions and
+streams and exec: streams with a small shell covering the commands the app
+sends. Devices serve a synthetic in-memory filesystem. Every device request
+pays a round trip, data is paced to a bandwidth all streams of a device
+share, and a fraction of requests can be made to fail.
+
+    python benchmarks/fake_adb.py [--port 5037] [--rtt 2] [--bandwidth 40] [--error-rate 0.01]
+
+Point the app at it with ANDROID_ADB_SERVER_PORT=<port>.
+"""
+import argparse
+import hashlib
+import io
+import posixpath
+import random
+import re
+import shlex
+import socket
+import socketserver
+import stat
+import struct
+import tarfile
+import threading
+import time
+
+BLOCK = 64 * 1024
+SYNC_DATA_MAX = 64 * 1024
+SHELL_PACKET_MAX = 64 * 1024
+STAT_V2 = struct.Struct("<IQQIIIIQqqq")
+DENT_V2 = struct.Struct("<IQQIIIIQqqqI")
+FEATURES = "shell_v2,cmd,stat_v2,ls_v2"
+ENOENT = 2
+DIR_MODE = stat.S_IFDIR | 0o771
+FILE_MODE = stat.S_IFREG | 0o660
+
+# The framing ShellSession wraps around each command of a long-lived shell.
+SCRIPT_RE = re.compile(rb'\( (.*?)\n\) </dev/null; echo "([^"]+):\$\?"; echo "[^"]+" >&2\n', re.S)
+
+
+class _Abort(Exception):
+    """Drops the connection, like a device that went away mid-request."""
+
+
+# --- Filesystem ---
+class _Node:
+    __slots__ = ("mode", "size", "mtime", "data", "shift")
+
+    def __init__(self, mode, size=0, mtime=0, data=None, shift=0):
+        self.mode = mode
+        self.size = size
+        self.mtime = mtime
+        self.data = data
+        self.shift = shift
+
+    @property
+    def is_dir(self):
+        return stat.S_ISDIR(self.mode)
+
+
+class SyntheticFs:
+    """
+    Directory tree held in memory. Generated files have a size but no stored
+    content: their bytes are cut from one block of random data at a per-file
+    offset, so they cost nothing and do not compress. Written files keep
+    their bytes.
+    """
+
+    def __init__(self, seed=1, mtime=1700000000):
+        self.block = random.Random(seed).randbytes(BLOCK)
+        self._doubled = self.block * 2
+        self.mtime = mtime
+        self.nodes = {"/": _Node(DIR_MODE, mtime=mtime)}
+        self.children = {"/": set()}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(path):
+        return posixpath.normpath("/" + path.lstrip("/"))
+
+    def get(self, path):
+        return self.nodes.get(self.normalize(path))
+
+    def makedirs(self, path):
+        path = self.normalize(path)
+        with self.lock:
+            self._makedirs(path)
+
+    def _makedirs(self, path):
+        node = self.nodes.get(path)
+        if node is not None:
+            if not node.is_dir:
+                raise OSError(f"{path}: Not a directory")
+            return
+        parent = posixpath.dirname(path)
+        self._makedirs(parent)
+        self.nodes[path] = _Node(DIR_MODE, mtime=self.mtime)
+        self.children[path] = set()
+        self.children[parent].add(posixpath.basename(path))
+
+    def add_file(self, path, size=0, data=None, mode=FILE_MODE, mtime=None):
+        path = self.normalize(path)
+        if data is not None:
+            size = len(data)
+        shift = int.from_bytes(hashlib.md5(path.encode("utf-8")).digest()[:4], "little") % BLOCK
+        with self.lock:
+            parent = posixpath.dirname(path)
+            self._makedirs(parent)
+            existing = self.nodes.get(path)
+            if existing is not None and existing.is_dir:
+                raise OSError(f"{path}: Is a directory")
+            self.nodes[path] = _Node(stat.S_IFREG | (mode & 0o7777), size, mtime or self.mtime, data, shift)
+            self.children[parent].add(posixpath.basename(path))
+
+    def populate(self, directory, count, size, prefix="file", suffix=".bin"):
+        """Adds count files of size bytes to directory; returns their paths."""
+        paths = [f"{self.normalize(directory).rstrip('/')}/{prefix}_{index:05d}{suffix}" for index in range(count)]
+        for index, path in enumerate(paths):
+            self.add_file(path, size, mtime=self.mtime + index)
+        return paths
+
+    def listdir(self, path):
+        """[(name, node)] of a directory, or None if it is not one."""
+        path = self.normalize(path)
+        with self.lock:
+            names = self.children.get(path)
+            if names is None:
+                return None
+            base = path.rstrip("/")
+            return [(name, self.nodes[f"{base}/{name}"]) for name in sorted(names)]
+
+    def read(self, path, offset=0, size=None):
+        """Yields the file's bytes from offset on in chunks of at most BLOCK."""
+        node = self.get(path)
+        if node is None or node.is_dir:
+            raise OSError(f"{path}: No such file or directory")
+        end = node.size if size is None else min(node.size, offset + size)
+        while offset < end:
+            count = min(BLOCK, end - offset)
+            if node.data is not None:
+                yield node.data[offset:offset + count]
+            else:
+                start = (node.shift + offset) % BLOCK
+                yield self._doubled[start:start + count]
+            offset += count
+
+    def content(self, path):
+        return b"".join(self.read(path))
+
+    def truncate(self, path, size):
+        node = self.get(path)
+        data = b"".join(self.read(path, 0, size)) if node is not None else b""
+        self.add_file(path, data=data + b"\0" * (size - len(data)))
+
+    def append(self, path, data):
+        node = self.get(path)
+        self.add_file(path, data=(self.content(path) if node is not None else b"") + data)
+
+    def remove(self, path):
+        path = self.normalize(path)
+        with self.lock:
+            if path not in self.nodes or path == "/":
+                raise OSError(f"{path}: No such file or directory")
+            self._drop(path)
+            self.children[posixpath.dirname(path)].discard(posixpath.basename(path))
+
+    def _drop(self, path):
+        for name in list(self.children.get(path, ())):
+            self._drop(f"{path}/{name}")
+        self.nodes.pop(path, None)
+        self.children.pop(path, None)
+
+    def rename(self, source, destination):
+        source, destination = self.normalize(source), self.normalize(destination)
+        node = self.get(source)
+        if node is None:
+            raise OSError(f"{source}: No such file or directory")
+        if node.is_dir:
+            raise OSError(f"{source}: renaming directories is not simulated")
+        target = self.get(destination)
+        if target is not None and target.is_dir:
+            destination = f"{destination.rstrip('/')}/{posixpath.basename(source)}"
+        with self.lock:
+            parent = posixpath.dirname(destination)
+            self._makedirs(parent)
+            self.nodes[destination] = node
+            self.children[parent].add(posixpath.basename(destination))
+            del self.nodes[source]
+            self.children[posixpath.dirname(source)].discard(posixpath.basename(source))
+
+
+# --- Link ---
+class Link:
+    """
+    One direction of a device's connection. transmit() blocks until the
+    bytes would have crossed at bandwidth bytes/s; streams of the same device
+    queue behind each other as they would on one cable. 0 is unlimited.
+    """
+
+    def __init__(self, bandwidth=0):
+        self.bandwidth = bandwidth
+        self._lock = threading.Lock()
+        self._free_at = 0.0
+
+    def transmit(self, nbytes):
+        if not self.bandwidth:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._free_at = max(now, self._free_at) + nbytes / self.bandwidth
+            wait = self._free_at - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FakeDevice:
+    """
+    A simulated device: rtt seconds per request, bandwidth bytes/s each way
+    and error_rate, the chance that opening a service, a sync request or a
+    shell command fails (the connection is dropped, as when a cable is
+    pulled). Counters of what it served are kept in stats.
+    """
+
+    def __init__(self, serial, fs=None, rtt=0.0, bandwidth=0, error_rate=0.0, model="Pixel_7", seed=1):
+        self.serial = serial
+        self.fs = fs or SyntheticFs(seed)
+        self.rtt = rtt
+        self.up = Link(bandwidth)
+        self.down = Link(bandwidth)
+        self.error_rate = error_rate
+        self.model = model
+        self.stats = {"requests": 0, "injected_errors": 0, "bytes_sent": 0, "bytes_received": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def request(self):
+        """Pays one round trip; raises _Abort when an error is injected."""
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.stats["injected_errors"] += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+        if failed:
+            raise _Abort()
+
+    def count(self, key, nbytes):
+        with self._lock:
+            self.stats[key] += nbytes
+
+
+# --- Device shell ---
+class _Input:
+    """stdin of a command: read(n) returns b"" at end of input."""
+
+    def __init__(self, source=None):
+        self.source = source  # callable returning the next chunk or b""
+        self.buffer = b""
+        self.eof = source is None
+
+    def read(self, size=-1):
+        while not self.eof and (size is None or size < 0 or len(self.buffer) < size):
+            chunk = self.source()
+            if not chunk:
+                self.eof = True
+            self.buffer += chunk
+        if size is None or size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class _Output:
+    def __init__(self, write):
+        self.write_data = write
+
+    def write(self, data):
+        if data:
+            self.write_data(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class DeviceShell:
+    """
+    Runs the shell commands the app sends: sequences with ;, && and ||,
+    ( subshells ), pipes and > / >> into files, over a handful of toybox
+    commands working on the device's SyntheticFs.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.fs = device.fs
+
+    def run(self, command, stdin, out, err):
+        # Stderr redirections are dropped and stdin is empty anyway.
+        for noise in ("2>/dev/null", "2>&1", "</dev/null"):
+            command = command.replace(noise, " ")
+        lexer = shlex.shlex(command, posix=True, punctuation_chars="();&|<>")
+        lexer.whitespace_split = True
+        try:
+            tokens = list(lexer)
+        except ValueError as e:
+            err(f"sh: {e}\n".encode())
+            return 2
+        return self._list(tokens, stdin, out, err)[0]
+
+    def _list(self, tokens, stdin, out, err):
+        rc = 0
+        skip = False
+        while tokens and tokens[0] != ")":
+            end = 0
+            depth = 0
+            while end < len(tokens):
+                token = tokens[end]
+                if token == "(":
+                    depth += 1
+                elif token == ")":
+                    if depth == 0:
+                        break
+                    depth -= 1
+                elif depth == 0 and token in (";", "&&", "||"):
+                    break
+                end += 1
+            pipeline, tokens = tokens[:end], tokens[end:]
+            if not skip and pipeline:
+                rc = self._pipeline(pipeline, stdin, out, err)
+            separator = tokens.pop(0) if tokens and tokens[0] != ")" else ";"
+            skip = (separator == "&&" and rc != 0) or (separator == "||" and rc == 0)
+        return rc, tokens
+
+    def _pipeline(self, tokens, stdin, out, err):
+        stages = []
+        current = []
+        depth = 0
+        for token in tokens:
+            if token == "|" and depth == 0:
+                stages.append(current)
+                current = []
+                continue
+            depth += token == "("
+            depth -= token == ")"
+            current.append(token)
+        stages.append(current)
+        rc = 0
+        for index, stage in enumerate(stages):
+            last = index == len(stages) - 1
+            buffer = io.BytesIO()
+            rc = self._command(stage, stdin, out if last else buffer.write, err)
+            if not last:
+                data = buffer.getvalue()
+                stdin = _Input()
+                stdin.buffer = data
+        return rc
+
+    def _command(self, tokens, stdin, out, err):
+        if tokens and tokens[0] == "(":
+            rc, _ = self._list(tokens[1:-1], stdin, out, err)
+            return rc
+        args = []
+        redirect = None
+        while tokens:
+            token = tokens.pop(0)
+            if token in (">", ">>") and tokens:
+                redirect = (token, tokens.pop(0))
+            else:
+                args.append(token)
+        if not args:
+            return 0
+        if redirect:
+            collected = io.BytesIO()
+            rc = self._exec(args, stdin, collected.write, err)
+            mode, path = redirect
+            try:
+                if mode == ">>":
+                    self.fs.append(path, collected.getvalue())
+                else:
+                    self.fs.add_file(path, data=collected.getvalue())
+            except OSError as e:
+                err(f"sh: {e}\n".encode())
+                return 1
+            return rc
+        return self._exec(args, stdin, out, err)
+
+    def _exec(self, args, stdin, out, err):
+        name = args[0]
+        if name in ("cmd", "pm"):
+            name = "install" if "install" in args else name
+        handler = getattr(self, f"cmd_{name}", None)
+        if handler is None:
+            err(f"sh: {args[0]}: not found\n".encode())
+            return 127
+        try:
+            return handler(args[1:], stdin, out, err) or 0
+        except OSError as e:
+            err(f"{args[0]}: {e}\n".encode())
+            return 1
+        except (ValueError, IndexError) as e:
+            err(f"{args[0]}: bad arguments ({e})\n".encode())
+            return 1
+
+    # --- Commands ---
+    def cmd_true(self, args, stdin, out, err):
+        return 0
+
+    def cmd_false(self, args, stdin, out, err):
+        return 1
+
+    def cmd_echo(self, args, stdin, out, err):
+        newline = True
+        if args and args[0] == "-n":
+            newline = False
+            args = args[1:]
+        out((" ".join(args) + ("\n" if newline else "")).encode("utf-8"))
+
+    def cmd_getprop(self, args, stdin, out, err):
+        props = {"ro.product.model": self.device.model, "ro.serialno": self.device.serial,
+                 "ro.build.version.sdk": "34", "ro.build.version.release": "14"}
+        if args:
+            out(f"{props.get(args[0], '')}\n".encode())
+        else:
+            out("".join(f"[{key}]: [{value}]\n" for key, value in sorted(props.items())).encode())
+
+    def cmd_sleep(self, args, stdin, out, err):
+        time.sleep(float(args[0]))
+
+    def cmd_ls(self, args, stdin, out, err):
+        paths = [arg for arg in args if not arg.startswith("-")] or ["/"]
+        rc = 0
+        for path in paths:
+            entries = self.fs.listdir(path)
+            if entries is None:
+                if self.fs.get(path) is None:
+                    err(f"ls: {path}: No such file or directory\n".encode())
+                    rc = 1
+                else:
+                    out(f"{path}\n".encode())
+                continue
+            out("".join(f"{name}\n" for name, _ in entries).encode("utf-8"))
+        return rc
+
+    def cmd_cat(self, args, stdin, out, err):
+        for path in args:
+            for chunk in self.fs.read(path):
+                out(chunk)
+
+    def cmd_mkdir(self, args, stdin, out, err):
+        for path in args:
+            if not path.startswith("-"):
+                self.fs.makedirs(path)
+
+    def cmd_rm(self, args, stdin, out, err):
+        rc = 0
+        force = any(arg.startswith("-") and "f" in arg for arg in args)
+        for path in args:
+            if path.startswith("-"):
+                continue
+            try:
+                self.fs.remove(path)
+            except OSError as e:
+                if not force:
+                    err(f"rm: {e}\n".encode())
+                    rc = 1
+        return rc
+
+    def cmd_mv(self, args, stdin, out, err):
+        source, destination = [arg for arg in args if not arg.startswith("-")][-2:]
+        self.fs.rename(source, destination)
+
+    def cmd_touch(self, args, stdin, out, err):
+        mtime = None
+        paths = []
+        iterator = iter(args)
+        for arg in iterator:
+            if arg == "-d":
+                value = next(iterator)
+                mtime = int(value[1:]) if value.startswith("@") else None
+            elif not arg.startswith("-"):
+                paths.append(arg)
+        for path in paths:
+            node = self.fs.get(path)
+            if node is None:
+                self.fs.add_file(path, data=b"")
+            elif mtime is not None:
+                node.mtime = mtime
+
+    def cmd_truncate(self, args, stdin, out, err):
+        size = int(args[args.index("-s") + 1])
+        self.fs.truncate(args[-1], size)
+
+    def cmd_head(self, args, stdin, out, err):
+        count = int(args[args.index("-c") + 1])
+        paths = [arg for index, arg in enumerate(args) if not arg.startswith("-") and args[index - 1] != "-c"]
+        if paths and paths[0] == "/dev/zero":
+            zeros = bytes(BLOCK)
+            while count > 0:
+                out(zeros[:min(count, BLOCK)])
+                count -= BLOCK
+        elif paths:
+            for chunk in self.fs.read(paths[0], 0, count):
+                out(chunk)
+        else:
+            while count > 0:
+                data = stdin.read(min(count, BLOCK))
+                if not data:
+                    break
+                out(data)
+                count -= len(data)
+
+    def cmd_tail(self, args, stdin, out, err):
+        start = int(args[args.index("-c") + 1].lstrip("+")) - 1
+        paths = [arg for index, arg in enumerate(args) if not arg.startswith(("-", "+")) and args[index - 1] != "-c"]
+        if paths:
+            for chunk in self.fs.read(paths[0], start):
+                out(chunk)
+        else:
+            out(stdin.read()[start:])
+
+    def cmd_stat(self, args, stdin, out, err):
+        form = args[args.index("-c") + 1]
+        rc = 0
+        for path in args[args.index("-c") + 2:]:
+            node = self.fs.get(path)
+            if node is None:
+                err(f"stat: {path}: No such file or directory\n".encode())
+                rc = 1
+                continue
+            out(form.replace("%s", str(node.size)).replace("%Y", str(node.mtime)).encode() + b"\n")
+        return rc
+
+    def cmd_md5sum(self, args, stdin, out, err):
+        for path in args or ["-"]:
+            digest = hashlib.md5()
+            for chunk in ([stdin.read()] if path == "-" else self.fs.read(path)):
+                digest.update(chunk)
+            out(f"{digest.hexdigest()}  {path}\n".encode())
+
+    def cmd_install(self, args, stdin, out, err):
+        size = int(args[args.index("-S") + 1]) if "-S" in args else None
+        received = 0
+        while size is None or received < size:
+            data = stdin.read(min(BLOCK, size - received) if size is not None else BLOCK)
+            if not data:
+                break
+            received += len(data)
+        if size is not None and received < size:
+            out(b"Failure [INSTALL_FAILED_INVALID_APK: truncated]\n")
+            return 1
+        out(b"Success\n")
+
+    def cmd_tar(self, args, stdin, out, err):
+        flags = args[0].lstrip("-")
+        root = args[args.index("-C") + 1] if "-C" in args else "/"
+        gzipped = "z" in flags
+        if "c" in flags:
+            listing = stdin.read().decode("utf-8", errors="replace") if "-T" in args else ""
+            sink = _Output(out)
+            archive = tarfile.open(fileobj=sink, mode="w|gz" if gzipped else "w|", format=tarfile.GNU_FORMAT)
+            rc = 0
+            with archive:
+                for name in listing.splitlines():
+                    path = posixpath.join(root, name)
+                    node = self.fs.get(path)
+                    if node is None or node.is_dir:
+                        err(f"tar: {name}: No such file or directory\n".encode())
+                        rc = 1
+                        continue
+                    info = tarfile.TarInfo(name)
+                    info.size, info.mtime, info.mode = node.size, node.mtime, node.mode & 0o7777
+                    archive.addfile(info, io.BufferedReader(_ChunkStream(self.fs.read(path))))
+            return rc
+        if "x" in flags:
+            with tarfile.open(fileobj=stdin, mode="r|gz" if gzipped else "r|") as archive:
+                for member in archive:
+                    path = posixpath.join(root, member.name)
+                    if member.isdir():
+                        self.fs.makedirs(path)
+                    elif member.isfile():
+                        self.fs.add_file(path, data=archive.extractfile(member).read(),
+                                         mode=member.mode, mtime=int(member.mtime))
+            return 0
+        err(b"tar: need -c or -x\n")
+        return 1
+
+
+class _ChunkStream(io.RawIOBase):
+    """Readable view of a chunk generator, so tarfile can copy a synthetic file."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b""
+                return 0
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        return count
+
+
+# --- Server ---
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.fake = self.server.fake
+        self.device = None
+        self.pending = b""
+
+    def handle(self):
+        try:
+            while True:
+                length = self.recv_exactly(4)
+                if length is None:
+                    return
+                service = self.recv_exactly(int(length, 16)).decode("utf-8")
+                if service.startswith("host"):
+                    if self.host_service(service):
+                        return
+                    continue
+                self.device_service(service)
+                return
+        except (_Abort, EOFError, OSError, ValueError):
+            pass
+
+    # --- I/O ---
+    def recv_exactly(self, size, paced=False):
+        """size bytes from the client, None on a clean end of stream before any byte."""
+        data = self.pending
+        while len(data) < size:
+            chunk = self.request.recv(max(size - len(data), SYNC_DATA_MAX))
+            if not chunk:
+                if not data:
+                    return None
+                raise EOFError("connection closed mid-message")
+            data += chunk
+        data, self.pending = data[:size], data[size:]
+        if paced and self.device is not None:
+            self.device.up.transmit(len(data))
+            self.device.count("bytes_received", len(data))
+        return data
+
+    def recv_some(self):
+        if self.pending:
+            data, self.pending = self.pending, b""
+        else:
+            data = self.request.recv(SYNC_DATA_MAX)
+        if data and self.device is not None:
+            self.device.up.transmit(len(data))
+            self.device.count("bytes_received", len(data))
+        return data
+
+    def send(self, data):
+        if self.device is not None and data:
+            self.device.down.transmit(len(data))
+            self.device.count("bytes_sent", len(data))
+        self.request.sendall(data)
+
+    def okay(self, text=None):
+        if text is None:
+            self.request.sendall(b"OKAY")
+        else:
+            data = text.encode("utf-8")
+            self.request.sendall(b"OKAY" + b"%04x" % len(data) + data)
+
+    def fail(self, text):
+        data = text.encode("utf-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    # --- Host services ---
+    def host_service(self, service):
+        """Answers a host: request; True when the connection is done."""
+        devices = self.fake.devices
+        if service == "host:version":
+            self.okay("0029")
+        elif service in ("host:devices", "host:devices-l"):
+            self.okay(self.fake.device_list(service.endswith("-l")))
+        elif service in ("host:track-devices", "host:track-devices-l"):
+            self.okay()
+            listing = self.fake.device_list(service.endswith("-l")).encode("utf-8")
+            self.request.sendall(b"%04x" % len(listing) + listing)
+            # The list never changes; hold the subscription until the client hangs up.
+            while self.request.recv(SYNC_DATA_MAX):
+                pass
+        elif service.endswith(":features"):
+            serial = service.split(":")[1] if service.startswith("host-serial:") else None
+            if serial is not None and serial not in devices:
+                self.fail(f"device '{serial}' not found")
+            else:
+                self.okay(FEATURES)
+        elif service.startswith("host:transport:") or service == "host:transport-any":
+            serial = service[len("host:transport:"):] if service.startswith("host:transport:") else None
+            if serial is None and len(devices) == 1:
+                serial = next(iter(devices))
+            if serial not in devices:
+                self.fail("more than one device/emulator" if serial is None else f"device '{serial}' not found")
+                return True
+            self.device = devices[serial]
+            self.okay()
+            return False
+        else:
+            self.fail(f"unknown host service {service}")
+        return True
+
+    # --- Device services ---
+    def device_service(self, service):
+        if self.device is None:
+            self.fail("no device selected")
+            return
+        try:
+            self.device.request()
+        except _Abort:
+            self.fail("device offline")
+            return
+        if service == "sync:":
+            self.okay()
+            self.sync()
+        elif service == "shell,v2,raw:":
+            self.okay()
+            self.shell_session()
+        elif service.startswith("shell,v2,raw:"):
+            self.okay()
+            self.shell_stream(service[len("shell,v2,raw:"):])
+        elif service.startswith(("exec:", "shell:")):
+            self.okay()
+            self.exec_stream(service.split(":", 1)[1])
+        else:
+            self.fail(f"unknown device service {service}")
+
+    def sync(self):
+        fs = self.device.fs
+        while True:
+            header = self.recv_exactly(8)
+            if header is None:
+                return
+            cmd, length = header[:4], struct.unpack("<I", header[4:])[0]
+            path = self.recv_exactly(length).decode("utf-8") if length else ""
+            if cmd == b"QUIT":
+                return
+            self.device.request()
+            if cmd == b"STAT":
+                node = fs.get(path)
+                self.send(b"STAT" + struct.pack("<III", *((node.mode, node.size & 0xFFFFFFFF, node.mtime) if node else (0, 0, 0))))
+            elif cmd in (b"STA2", b"LST2"):
+                node = fs.get(path)
+                if node is None:
+                    self.send(cmd + STAT_V2.pack(ENOENT, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+                else:
+                    self.send(cmd + STAT_V2.pack(0, 1, 1, node.mode, 1, 0, 0, node.size, node.mtime, node.mtime, node.mtime))
+            elif cmd in (b"LIST", b"LIS2"):
+                parts = []
+                for name, node in fs.listdir(path) or []:
+                    encoded = name.encode("utf-8")
+                    if cmd == b"LIS2":
+                        parts.append(b"DNT2" + DENT_V2.pack(0, 1, 1, node.mode, 1, 0, 0, node.size, node.mtime,
+                                                            node.mtime, node.mtime, len(encoded)) + encoded)
+                    else:
+                        parts.append(b"DENT" + struct.pack("<IIII", node.mode, node.size & 0xFFFFFFFF, node.mtime,
+                                                           len(encoded)) + encoded)
+                parts.append(b"DONE" + bytes(DENT_V2.size if cmd == b"LIS2" else 16))
+                self.send(b"".join(parts))
+            elif cmd == b"RECV":
+                try:
+                    for chunk in fs.read(path):
+                        self.send(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                    self.send(b"DONE" + bytes(4))
+                except OSError as e:
+                    message = str(e).encode("utf-8")
+                    self.send(b"FAIL" + struct.pack("<I", len(message)) + message)
+            elif cmd == b"SEND":
+                target, _, mode = path.rpartition(",")
+                data = bytearray()
+                while True:
+                    chunk_header = self.recv_exactly(8, paced=True)
+                    if chunk_header is None:
+                        return
+                    kind, size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+                    if kind != b"DATA":
+                        break
+                    data += self.recv_exactly(size, paced=True)
+                try:
+                    fs.add_file(target, data=bytes(data), mode=int(mode or FILE_MODE), mtime=size)
+                    self.send(b"OKAY" + bytes(4))
+                except OSError as e:
+                    message = str(e).encode("utf-8")
+                    self.send(b"FAIL" + struct.pack("<I", len(message)) + message)
+            else:
+                message = f"unknown sync command {cmd!r}".encode("utf-8")
+                self.send(b"FAIL" + struct.pack("<I", len(message)) + message)
+                return
+
+    def packet(self, kind, data):
+        for start in range(0, max(len(data), 1), SHELL_PACKET_MAX):
+            chunk = data[start:start + SHELL_PACKET_MAX]
+            self.send(bytes([kind]) + struct.pack("<I", len(chunk)) + chunk)
+
+    def read_packet(self):
+        header = self.recv_exactly(5)
+        if header is None:
+            return None, b""
+        length = struct.unpack("<I", header[1:])[0]
+        return header[0], self.recv_exactly(length, paced=True) if length else b""
+
+    def shell_session(self):
+        """A shell reading command scripts from stdin, as ShellSession drives it."""
+        shell = DeviceShell(self.device)
+        script = b""
+        while True:
+            kind, data = self.read_packet()
+            if kind is None:
+                return
+            if kind == 3:
+                self.packet(3, b"\x00")
+                return
+            script += data
+            while True:
+                match = SCRIPT_RE.match(script)
+                if not match:
+                    break
+                script = script[match.end():]
+                command, token = match.group(1).decode("utf-8"), match.group(2)
+                self.device.request()
+                stdout, stderr = bytearray(), bytearray()
+                rc = shell.run(command, _Input(), stdout.extend, stderr.extend)
+                self.packet(1, bytes(stdout) + token + b":%d\n" % rc)
+                self.packet(2, bytes(stderr) + token + b"\n")
+
+    def shell_stream(self, command):
+        """One shell v2 command: stdin packets until close-stdin, stdout/stderr packets, then the exit code."""
+        def next_input():
+            kind, data = self.read_packet()
+            while kind == 0 and not data:
+                kind, data = self.read_packet()
+            return data if kind == 0 else b""
+        rc = DeviceShell(self.device).run(command, _Input(next_input), lambda data: self.packet(1, data),
+                                          lambda data: self.packet(2, data))
+        self.packet(3, bytes([rc & 0xFF]))
+
+    def exec_stream(self, command):
+        """exec: is raw both ways and ends when the command does."""
+        stdout = lambda data: self.send(data)
+        DeviceShell(self.device).run(command, _Input(self.recv_some), stdout, stdout)
+        self.request.shutdown(socket.SHUT_WR)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeAdbServer:
+    """
+    The simulated server for a set of FakeDevice. port=0 picks a free port;
+    use it as a context manager or call start() and stop().
+    """
+
+    def __init__(self, devices, host="127.0.0.1", port=0):
+        self.devices = {device.serial: device for device in devices}
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def device_list(self, long_format):
+        lines = []
+        for transport_id, device in enumerate(self.devices.values(), 1):
+            if long_format:
+                lines.append(f"{device.serial:22s} device product:fake model:{device.model} device:fake "
+                             f"transport_id:{transport_id}\n")
+            else:
+                lines.append(f"{device.serial}\tdevice\n")
+        return "".join(lines)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def demo_fs(seed=1):
+    """A small phone-like tree to browse when running the server by hand."""
+    fs = SyntheticFs(seed)
+    fs.populate("/sdcard/DCIM/Camera", 400, 3 * 1024 * 1024, "IMG", ".jpg")
+    fs.populate("/sdcard/Download", 40, 256 * 1024, "document", ".pdf")
+    fs.populate("/sdcard/Music", 120, 6 * 1024 * 1024, "track", ".mp3")
+    fs.populate("/sdcard/Android/data/com.example/cache", 1500, 4 * 1024, "entry", ".tmp")
+    fs.makedirs("/data/local/tmp")
+    return fs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5037)
+    parser.add_argument("--devices", type=int, default=1, help="number of simulated devices")
+    parser.add_argument("--rtt", type=float, default=2.0, help="round trip per request in ms")
+    parser.add_argument("--bandwidth", type=float, default=40.0, help="MB/s each way, 0 for unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    args = parser.parse_args()
+
+    devices = [FakeDevice(f"fake-{index + 1}", demo_fs(index + 1), args.rtt / 1000, args.bandwidth * 1024 * 1024,
+                          args.error_rate, seed=index + 1)
+               for index in range(args.devices)]
+    server = FakeAdbServer(devices, port=args.port)
+    print(f"Fake adb server on port {server.port} with {len(devices)} device(s); Ctrl+C to stop")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,10 @@
 import sys
-import logging
 from PyQt6.QtWidgets import QApplication
+from src.utils.logs import setup_logging
 from src.ui.main_window import AdbFileBrowser
 
-# Setup logging
-logging.basicConfig(
-    filename='adb_file_browser.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Setup logging: a background thread writes the rotating log file
+setup_logging()
 
 def main():
     app = QApplication(sys.argv)
@@ -1,12 +1,21 @@
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QProgressBar, QLineEdit, QHBoxLayout, 
-    QCheckBox, QPushButton, QMessageBox, QPlainTextEdit, QFileDialog
+    QCheckBox, QPushButton, QMessageBox, QPlainTextEdit, QFileDialog, QTreeWidget, QTreeWidgetItem,
+    QComboBox, QListWidget, QListWidgetItem, QSpinBox
 )
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtNetwork import QTcpSocket, QHostAddress
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QPixmap
+import os
 import subprocess
 
+from src.utils.adb import AdbManager
+from src.utils.adb_client import posix_basename
+from src.utils.formatting import format_size, format_time
+from src.utils.fuzzy import FuzzyIndex
+from src.utils.logs import LOG_FILE, log_files, read_from, read_page
+from src.utils.wifi_scan import local_network, parse_hosts, parse_ports
+from src.workers import SearchWorker, WifiScanWorker
+
 class ProgressDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -61,9 +70,24 @@ class WiFiConnectionDialog(QDialog):
         self.pair_code_layout.addWidget(self.pair_code_edit)
         layout.addLayout(self.pair_code_layout)
 
-        # Port Scanning
-        self.scan_ports_check = QCheckBox("Scan Common Ports (5555-5585)")
-        layout.addWidget(self.scan_ports_check)
+        # Network scan: port probes and mDNS browsing run together and results show up as they are found.
+        scan_layout = QHBoxLayout()
+        scan_layout.addWidget(QLabel("Scan:"))
+        self.scan_hosts_edit = QLineEdit(local_network())
+        self.scan_hosts_edit.setPlaceholderText("192.168.1.0/24")
+        scan_layout.addWidget(self.scan_hosts_edit)
+        scan_layout.addWidget(QLabel("Ports:"))
+        self.scan_ports_edit = QLineEdit("5555-5585")
+        scan_layout.addWidget(self.scan_ports_edit)
+        self.scan_btn = QPushButton("Scan Network")
+        self.scan_btn.clicked.connect(self.toggle_scan)
+        scan_layout.addWidget(self.scan_btn)
+        layout.addLayout(scan_layout)
+        self.scan_results = QListWidget()
+        self.scan_results.setToolTip("Double-click a device to connect")
+        self.scan_results.itemDoubleClicked.connect(self.connect_found_device)
+        layout.addWidget(self.scan_results)
+        self.scan_worker = None
 
         # Connection Buttons
         btn_layout = QHBoxLayout()
@@ -95,13 +119,10 @@ class WiFiConnectionDialog(QDialog):
             QMessageBox.warning(self, "Error", "Please enter IP address!")
             return
 
-        if self.scan_ports_check.isChecked():
-            self.scan_ports(ip)
-        else:
-            if use_pairing:
-                self.pair_device(ip, port, pairing_code)
-            self.connect_to_device(ip, port)
-            self.close()
+        if use_pairing:
+            self.pair_device(ip, port, pairing_code)
+        self.connect_to_device(ip, port)
+        self.close()
 
     def pair_device(self, ip, port, code):
         try:
@@ -128,24 +149,52 @@ class WiFiConnectionDialog(QDialog):
         finally:
             self.progress_bar.setVisible(False)
 
-    def scan_ports(self, ip):
+    def toggle_scan(self):
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            return
+        try:
+            hosts = parse_hosts(self.scan_hosts_edit.text() or self.ip_edit.text())
+            ports = parse_ports(self.scan_ports_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", f"Invalid scan range: {e}")
+            return
+        self.scan_results.clear()
+        self.progress_bar.setRange(0, max(1, len(hosts) * len(ports)))
+        self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
-        found = False
-        # Limit scan for UI responsiveness or run in thread... keeping simple for now
-        # Ideally should be a thread
-        for port in range(5555, 5586):
-            try:
-                sock = QTcpSocket()
-                sock.connectToHost(QHostAddress(ip), port)
-                if sock.waitForConnected(100):
-                    self.connect_to_device(ip, str(port))
-                    found = True
-                    break
-            except Exception:
-                continue
-        if not found:
-            QMessageBox.warning(self, "Scan Result", "No open ADB ports found!")
+        self.scan_btn.setText("Stop")
+        self.scan_worker = WifiScanWorker(hosts, ports, self)
+        self.scan_worker.deviceFound.connect(self.add_found_device)
+        self.scan_worker.progress.connect(lambda done, _total: self.progress_bar.setValue(done))
+        self.scan_worker.finished_scan.connect(self.on_scan_finished)
+        self.scan_worker.start()
+
+    def add_found_device(self, device):
+        label = f"{device.host}:{device.port}"
+        if device.name:
+            label += f"  {device.name}"
+        item = QListWidgetItem(f"{label}  ({'port scan' if device.source == 'scan' else device.source})")
+        item.setData(Qt.ItemDataRole.UserRole, (device.host, device.port))
+        self.scan_results.addItem(item)
+
+    def on_scan_finished(self, found):
+        self.scan_worker = None
+        self.scan_btn.setText("Scan Network")
         self.progress_bar.setVisible(False)
+        if not found:
+            self.scan_results.addItem("No ADB devices found")
+
+    def connect_found_device(self, item):
+        target = item.data(Qt.ItemDataRole.UserRole)
+        if target:
+            self.connect_to_device(target[0], str(target[1]))
+
+    def done(self, result):
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.scan_worker.wait()
+        super().done(result)
 
     def reset_adb_over_usb(self):
         try:
@@ -177,6 +226,129 @@ class GenericTextDialog(QDialog):
         self.setLayout(layout)
         self.resize(width, height)
 
+class LogViewerDialog(QDialog):
+    """
+    Shows the log one page at a time, starting with the newest lines, so a
+    huge log opens instantly. Follow appends lines as they are written.
+    """
+    FOLLOW_LINES = 20000
+
+    def __init__(self, path=LOG_FILE, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Log Viewer")
+        self.path = path
+        self.start = self.end = 0
+        layout = QVBoxLayout()
+
+        top_layout = QHBoxLayout()
+        self.file_combo = QComboBox()
+        self.file_combo.addItems(log_files(path) or [path])
+        self.file_combo.currentTextChanged.connect(self.open_file)
+        top_layout.addWidget(self.file_combo)
+        self.position_label = QLabel()
+        top_layout.addWidget(self.position_label, 1)
+        self.follow_check = QCheckBox("Follow")
+        self.follow_check.toggled.connect(self.set_follow)
+        top_layout.addWidget(self.follow_check)
+        layout.addLayout(top_layout)
+
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text_edit.setMaximumBlockCount(self.FOLLOW_LINES)
+        layout.addWidget(self.text_edit)
+
+        btn_layout = QHBoxLayout()
+        for label, slot in (("Oldest", self.show_oldest), ("Older", self.show_older),
+                            ("Newer", self.show_newer), ("Newest", self.show_newest)):
+            btn = QPushButton(label)
+            btn.clicked.connect(slot)
+            btn_layout.addWidget(btn)
+        btn_layout.addStretch()
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+        self.resize(900, 500)
+
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(1000)
+        self.follow_timer.timeout.connect(self.poll)
+        self.open_file(self.file_combo.currentText())
+
+    def open_file(self, path):
+        self.path = path
+        self.show_newest()
+
+    def show_page(self, text, start, end, scroll_to_end):
+        self.start, self.end = start, end
+        self.text_edit.setPlainText(text)
+        scrollbar = self.text_edit.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum() if scroll_to_end else 0)
+        self.update_position()
+
+    def update_position(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        self.position_label.setText(f"{format_size(self.start)} - {format_size(self.end)} of {format_size(size)}")
+
+    def read(self, reader, *args):
+        try:
+            return reader(self.path, *args)
+        except OSError as e:
+            self.follow_check.setChecked(False)
+            self.text_edit.setPlainText(f"Could not open log: {e}")
+            return None
+
+    def show_newest(self):
+        page = self.read(read_page)
+        if page:
+            self.show_page(*page, scroll_to_end=True)
+
+    def show_older(self):
+        if self.start > 0:
+            page = self.read(read_page, self.start)
+            if page:
+                self.show_page(*page, scroll_to_end=True)
+
+    def show_newer(self):
+        page = self.read(read_from, self.end)
+        if page and page[0]:
+            self.show_page(page[0], self.end, page[1], scroll_to_end=False)
+
+    def show_oldest(self):
+        page = self.read(read_from, 0)
+        if page:
+            self.show_page(page[0], 0, page[1], scroll_to_end=False)
+
+    def set_follow(self, follow):
+        if follow:
+            self.show_newest()
+            self.follow_timer.start()
+        else:
+            self.follow_timer.stop()
+
+    def poll(self):
+        try:
+            rotated = os.path.getsize(self.path) < self.end
+        except OSError:
+            return
+        if rotated:
+            self.show_newest()
+            return
+        page = self.read(read_from, self.end)
+        if page and page[0]:
+            self.text_edit.appendPlainText(page[0].rstrip("\n"))
+            self.end = page[1]
+            self.update_position()
+
+    def done(self, result):
+        self.follow_timer.stop()
+        super().done(result)
+
 class ImagePreviewDialog(QDialog):
     def __init__(self, pixmap, parent=None):
         super().__init__(parent)
@@ -191,19 +363,36 @@ class ImagePreviewDialog(QDialog):
         self.setLayout(layout)
 
 class SettingsDialog(QDialog):
-    def __init__(self, current_refresh, current_interval, parent=None):
+    def __init__(self, current_concurrency, current_cache_ttl, current_max_transfers, current_per_device,
+                 current_global_limit, current_device_limit, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Settings")
-        self.result_settings = None # (bool, int)
+        self.result_settings = None # (int, int, int, int, int, int)
         
         layout = QVBoxLayout()
-        self.auto_refresh_cb = QCheckBox("Auto-refresh device list")
-        self.auto_refresh_cb.setChecked(current_refresh)
-        layout.addWidget(self.auto_refresh_cb)
-        
-        layout.addWidget(QLabel("Device refresh interval (ms):"))
-        self.interval_edit = QLineEdit(str(current_interval))
-        layout.addWidget(self.interval_edit)
+        layout.addWidget(QLabel("Parallel downloads per device:"))
+        self.concurrency_edit = QLineEdit(str(current_concurrency))
+        layout.addWidget(self.concurrency_edit)
+
+        layout.addWidget(QLabel("Transfers running at once:"))
+        self.max_transfers_edit = QLineEdit(str(current_max_transfers))
+        layout.addWidget(self.max_transfers_edit)
+
+        layout.addWidget(QLabel("Transfers running at once per device:"))
+        self.per_device_edit = QLineEdit(str(current_per_device))
+        layout.addWidget(self.per_device_edit)
+
+        layout.addWidget(QLabel("Bandwidth limit for all transfers (KB/s, 0 = unlimited):"))
+        self.global_limit_edit = QLineEdit(str(current_global_limit))
+        layout.addWidget(self.global_limit_edit)
+
+        layout.addWidget(QLabel("Bandwidth limit per device (KB/s, 0 = unlimited):"))
+        self.device_limit_edit = QLineEdit(str(current_device_limit))
+        layout.addWidget(self.device_limit_edit)
+
+        layout.addWidget(QLabel("Directory cache lifetime (s):"))
+        self.cache_ttl_edit = QLineEdit(str(current_cache_ttl))
+        layout.addWidget(self.cache_ttl_edit)
         
         btn_box = QHBoxLayout()
         ok_btn = QPushButton("OK")
@@ -218,11 +407,18 @@ class SettingsDialog(QDialog):
 
     def apply_settings(self):
         try:
-            interval = int(self.interval_edit.text())
-            self.result_settings = (self.auto_refresh_cb.isChecked(), interval)
+            concurrency = int(self.concurrency_edit.text())
+            cache_ttl = int(self.cache_ttl_edit.text())
+            max_transfers = int(self.max_transfers_edit.text())
+            per_device = int(self.per_device_edit.text())
+            global_limit = int(self.global_limit_edit.text())
+            device_limit = int(self.device_limit_edit.text())
+            if concurrency < 1 or cache_ttl < 0 or max_transfers < 1 or per_device < 1 or global_limit < 0 or device_limit < 0:
+                raise ValueError
+            self.result_settings = (concurrency, cache_ttl, max_transfers, per_device, global_limit, device_limit)
             self.accept()
         except ValueError:
-            QMessageBox.warning(self, "Error", "Invalid interval value")
+            QMessageBox.warning(self, "Error", "Invalid settings value")
 
 class TerminalDialog(QDialog):
     def __init__(self, adb_manager_cls, device=None, parent=None):
@@ -264,3 +460,231 @@ class TerminalDialog(QDialog):
         except subprocess.CalledProcessError as e:
             self.output_edit.appendPlainText(f"> {cmd_text}\nError: {e}")
         self.input_line.clear()
+
+class IndexSearchDialog(QDialog):
+    """Searches the persistent device index; works from the last scan even while the device is offline."""
+    openRequested = pyqtSignal(str, bool)
+    updateRequested = pyqtSignal()
+
+    def __init__(self, index, serial, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Device Search")
+        self.index = index
+        self.serial = serial
+        self.search_worker = None
+        self.query_id = None
+
+        layout = QVBoxLayout()
+        search_layout = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Search all indexed files...")
+        self.query_edit.textChanged.connect(self.run_search)
+        search_layout.addWidget(self.query_edit)
+        self.prefix_cb = QCheckBox("Prefix")
+        self.prefix_cb.stateChanged.connect(self.run_search)
+        search_layout.addWidget(self.prefix_cb)
+        self.fuzzy_cb = QCheckBox("Fuzzy")
+        self.fuzzy_cb.setChecked(True)
+        self.fuzzy_cb.stateChanged.connect(self.run_search)
+        search_layout.addWidget(self.fuzzy_cb)
+        layout.addLayout(search_layout)
+
+        self.results = QTreeWidget()
+        self.results.setHeaderLabels(["Path", "Size", "Modified"])
+        self.results.setRootIsDecorated(False)
+        self.results.setUniformRowHeights(True)
+        self.results.setColumnWidth(0, 450)
+        self.results.itemDoubleClicked.connect(self.open_result)
+        layout.addWidget(self.results)
+
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        status_layout.addWidget(self.status_label)
+        self.update_btn = QPushButton("Update Index")
+        self.update_btn.clicked.connect(self.updateRequested.emit)
+        status_layout.addWidget(self.update_btn)
+        layout.addLayout(status_layout)
+
+        self.setLayout(layout)
+        self.resize(700, 450)
+        self.refresh_status()
+
+    def refresh_status(self, text=None):
+        if text is None:
+            indexed = {serial: indexed_at for serial, _, indexed_at in self.index.devices()}
+            if self.serial in indexed:
+                text = f"{self.index.count(self.serial)} files indexed, last scan {format_time(indexed[self.serial])}"
+            else:
+                text = "Device not indexed yet"
+        self.status_label.setText(text)
+
+    def run_search(self):
+        text = self.query_edit.text()
+        if self.fuzzy_cb.isChecked() and not self.prefix_cb.isChecked() and text.strip():
+            if self.search_worker is None:
+                index, serial = self.index, self.serial
+                self.search_worker = SearchWorker(lambda: FuzzyIndex(index.paths(serial), key=posix_basename),
+                                                  parent=self)
+                self.search_worker.resultsReady.connect(self.on_fuzzy_results)
+                self.search_worker.start()
+                self.refresh_status("Building search index...")
+            self.query_id = self.search_worker.submit(text)
+            return
+        self.query_id = None
+        self.show_results(self.index.search(self.serial, text, self.prefix_cb.isChecked()))
+
+    def on_fuzzy_results(self, query_id, results):
+        if query_id != self.query_id:
+            return
+        if self.status_label.text() == "Building search index...":
+            self.refresh_status()
+        entries = self.index.lookup(self.serial, [path for path, _ in results])
+        self.show_results([entries[path] for path, _ in results if path in entries])
+
+    def index_changed(self):
+        """Called after an index update: the fuzzy index is rebuilt on the next query."""
+        self.stop_search()
+        self.refresh_status()
+        self.run_search()
+
+    def stop_search(self):
+        if self.search_worker:
+            self.search_worker.stop()
+            self.search_worker = None
+
+    def done(self, result):
+        self.stop_search()
+        super().done(result)
+
+    def show_results(self, matches):
+        self.results.clear()
+        for entry in matches:
+            item = QTreeWidgetItem([entry.display_name, "" if entry.is_dir else format_size(entry.size),
+                                    format_time(entry.mtime)])
+            item.setData(0, Qt.ItemDataRole.UserRole, entry)
+            self.results.addTopLevelItem(item)
+
+    def open_result(self, item):
+        entry = item.data(0, Qt.ItemDataRole.UserRole)
+        self.openRequested.emit(entry.name, entry.is_dir)
+
+class SyncOptionsDialog(QDialog):
+    DIRECTIONS = [("Device → Computer", "pull"), ("Computer → Device", "push"), ("Two-way", "both")]
+
+    def __init__(self, remote_root, local_root, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Sync Folder")
+        self.result_options = None # (direction, delete, checksum)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"Device: {remote_root}\nComputer: {local_root}"))
+        self.direction_combo = QComboBox()
+        self.direction_combo.addItems([label for label, _ in self.DIRECTIONS])
+        layout.addWidget(self.direction_combo)
+        self.delete_cb = QCheckBox("Delete files that were removed on the other side")
+        layout.addWidget(self.delete_cb)
+        self.checksum_cb = QCheckBox("Compare checksums when only the modification time differs")
+        layout.addWidget(self.checksum_cb)
+
+        btn_box = QHBoxLayout()
+        ok_btn = QPushButton("Preview")
+        cancel_btn = QPushButton("Cancel")
+        btn_box.addWidget(ok_btn)
+        btn_box.addWidget(cancel_btn)
+        layout.addLayout(btn_box)
+        ok_btn.clicked.connect(self.apply_options)
+        cancel_btn.clicked.connect(self.reject)
+        self.setLayout(layout)
+
+    def apply_options(self):
+        direction = self.DIRECTIONS[self.direction_combo.currentIndex()][1]
+        self.result_options = (direction, self.delete_cb.isChecked(), self.checksum_cb.isChecked())
+        self.accept()
+
+class DeviceSelectionDialog(QDialog):
+    """Picks the devices a fan-out push or install goes to, plus how many are served at once."""
+
+    def __init__(self, devices, title, concurrency, remote_dir=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.selected_devices = []
+        self.concurrency = concurrency
+        self.remote_dir = remote_dir
+
+        layout = QVBoxLayout()
+        self.all_cb = QCheckBox("All devices")
+        self.all_cb.setChecked(True)
+        self.all_cb.toggled.connect(self.toggle_all)
+        layout.addWidget(self.all_cb)
+        self.device_list = QListWidget()
+        for device in devices:
+            item = QListWidgetItem(device)
+            item.setData(Qt.ItemDataRole.UserRole, AdbManager.get_serial(device))
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.device_list.addItem(item)
+        layout.addWidget(self.device_list)
+
+        if remote_dir is not None:
+            layout.addWidget(QLabel("Destination folder on each device:"))
+            self.remote_input = QLineEdit(remote_dir)
+            layout.addWidget(self.remote_input)
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Devices at once:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 64)
+        self.concurrency_spin.setValue(concurrency)
+        concurrency_layout.addWidget(self.concurrency_spin)
+        layout.addLayout(concurrency_layout)
+
+        btn_box = QHBoxLayout()
+        ok_btn = QPushButton("Start")
+        cancel_btn = QPushButton("Cancel")
+        btn_box.addWidget(ok_btn)
+        btn_box.addWidget(cancel_btn)
+        layout.addLayout(btn_box)
+        ok_btn.clicked.connect(self.apply_selection)
+        cancel_btn.clicked.connect(self.reject)
+        self.setLayout(layout)
+
+    def toggle_all(self, checked):
+        state = Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked
+        for i in range(self.device_list.count()):
+            self.device_list.item(i).setCheckState(state)
+
+    def apply_selection(self):
+        self.selected_devices = [self.device_list.item(i).data(Qt.ItemDataRole.UserRole)
+                                 for i in range(self.device_list.count())
+                                 if self.device_list.item(i).checkState() == Qt.CheckState.Checked]
+        if not self.selected_devices:
+            QMessageBox.warning(self, "Warning", "Select at least one device.")
+            return
+        if self.remote_dir is not None:
+            self.remote_dir = self.remote_input.text().strip() or "/"
+        self.concurrency = self.concurrency_spin.value()
+        self.accept()
+
+class SyncPlanDialog(QDialog):
+    """Dry run: shows every planned action and only runs the sync when confirmed."""
+
+    def __init__(self, plan, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Sync Preview")
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"{len(plan.actions)} actions, {format_size(plan.transfer_bytes())} to transfer"))
+        text_edit = QPlainTextEdit()
+        text_edit.setReadOnly(True)
+        text_edit.setPlainText(plan.summary())
+        layout.addWidget(text_edit)
+
+        btn_box = QHBoxLayout()
+        self.run_btn = QPushButton("Run Sync")
+        self.run_btn.setEnabled(bool(plan.actions))
+        cancel_btn = QPushButton("Cancel")
+        btn_box.addWidget(self.run_btn)
+        btn_box.addWidget(cancel_btn)
+        layout.addLayout(btn_box)
+        self.run_btn.clicked.connect(self.accept)
+        cancel_btn.clicked.connect(self.reject)
+        self.setLayout(layout)
+        self.resize(600, 400)
@@ -0,0 +1,169 @@
+import stat
+from array import array
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+from src.utils.adb_client import FileEntry
+from src.utils.formatting import format_size, format_time
+from src.utils.icons import create_icon
+
+class FileListModel(QAbstractTableModel):
+    """
+    Flat model for one directory listing. Entries are stored column-wise
+    (names plus packed integer arrays) and display strings are only built
+    when the view asks for a visible row, so 100k-entry folders stay cheap.
+    """
+    COLUMNS = ["File List", "Size", "Modified"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._sort = None  # (column, order) last requested by the view
+        self._reset_columns()
+
+    def _reset_columns(self):
+        self._names = []
+        self._lower_names = []
+        self._modes = array("I")
+        self._sizes = array("q")
+        self._mtimes = array("q")
+
+    def _append_columns(self, entries):
+        for entry in entries:
+            self._names.append(entry.name)
+            self._lower_names.append(entry.display_name.lower())
+            self._modes.append(entry.mode)
+            self._sizes.append(entry.size)
+            self._mtimes.append(entry.mtime)
+
+    # --- Loading ---
+    def set_entries(self, entries):
+        self.beginResetModel()
+        self._reset_columns()
+        self._append_columns(entries)
+        if self._sort:
+            self._apply_permutation(self._sort_permutation())
+        self.endResetModel()
+
+    def append_entries(self, entries):
+        if not entries:
+            return
+        first = len(self._names)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self._append_columns(entries)
+        self.endInsertRows()
+
+    def clear(self):
+        self.set_entries([])
+
+    # --- Access ---
+    def entry(self, row):
+        return FileEntry(self._names[row], self._modes[row], self._sizes[row], self._mtimes[row])
+
+    def entries(self):
+        return [self.entry(row) for row in range(len(self._names))]
+
+    def lower_name(self, row):
+        return self._lower_names[row]
+
+    # --- Qt model interface ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            entry = self.entry(row)
+            if column == 0:
+                return entry.display_name
+            if column == 1:
+                return "" if entry.is_dir else format_size(entry.size)
+            return format_time(entry.mtime)
+        if role == Qt.ItemDataRole.DecorationRole and column == 0:
+            # create_icon is cached, so all rows share two QIcon instances.
+            return create_icon('folder' if self.entry(row).is_dir else 'file')
+        if role == Qt.ItemDataRole.TextAlignmentRole and column == 1:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.UserRole:
+            return self.entry(row)
+        return None
+
+    def resort(self):
+        """Re-applies the current sort after rows were appended out of order."""
+        if self._sort:
+            self.sort(*self._sort)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if column < 0:
+            return
+        self._sort = (column, order)
+        self.layoutAboutToBeChanged.emit()
+        old_persistent = self.persistentIndexList()
+        permutation = self._sort_permutation()
+        self._apply_permutation(permutation)
+        new_row = {old: new for new, old in enumerate(permutation)}
+        self.changePersistentIndexList(
+            old_persistent,
+            [self.index(new_row[index.row()], index.column()) for index in old_persistent],
+        )
+        self.layoutChanged.emit()
+
+    def _sort_permutation(self):
+        # Sorts with a key function over the columns instead of Qt calling data() per comparison.
+        column, order = self._sort
+        keys = {0: self._lower_names, 1: self._sizes, 2: self._mtimes}[column]
+        permutation = sorted(range(len(self._names)), key=keys.__getitem__,
+                             reverse=order == Qt.SortOrder.DescendingOrder)
+        # Stable second pass keeps folders on top in either direction.
+        permutation.sort(key=lambda row: not stat.S_ISDIR(self._modes[row]))
+        return permutation
+
+    def _apply_permutation(self, permutation):
+        self._names = [self._names[row] for row in permutation]
+        self._lower_names = [self._lower_names[row] for row in permutation]
+        self._modes = array("I", (self._modes[row] for row in permutation))
+        self._sizes = array("q", (self._sizes[row] for row in permutation))
+        self._mtimes = array("q", (self._mtimes[row] for row in permutation))
+
+class FileFilterProxyModel(QSortFilterProxyModel):
+    """
+    Shows the rows of a fuzzy search result, best match first. Scores are
+    keyed by lower-case display name so they survive re-sorting the source.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._scores = None
+
+    def set_scores(self, scores):
+        """scores maps lower-case display names to rank; None shows every row in source order."""
+        if scores is None:
+            # Drop the ranking while the old scores are still there for lessThan.
+            super().sort(-1)
+            self._scores = None
+            self.invalidateFilter()
+        else:
+            self._scores = scores
+            self.invalidateFilter()
+            super().sort(0, Qt.SortOrder.DescendingOrder)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self._scores is None or self.sourceModel().lower_name(source_row) in self._scores
+
+    def lessThan(self, left, right):
+        model = self.sourceModel()
+        return self._scores[model.lower_name(left.row())] < self._scores[model.lower_name(right.row())]
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        # Header clicks reorder the source columns; search ranking, if any, stays on top of that.
+        if column >= 0:
+            self.sourceModel().sort(column, order)
@@ -1,23 +1,43 @@
 import os
 import sys
+import stat
+import posixpath
+import time
 import logging
 import csv
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QMessageBox,
-    QTreeWidget, QTreeWidgetItem, QFileDialog, QHBoxLayout, QProgressBar, QLineEdit,
+    QTreeView, QFileDialog, QHBoxLayout, QProgressBar, QLineEdit,
     QMenu, QAbstractItemView, QInputDialog, QComboBox, QApplication
 )
 from PyQt6.QtGui import QAction, QDragEnterEvent, QDropEvent
-from PyQt6.QtCore import Qt, QTimer, QUrl
+from PyQt6.QtCore import Qt, QTimer, QUrl, QThread
 
 from src.utils.icons import create_icon
 from src.utils.adb import AdbManager
-from src.workers import FileListWorker, AdbCommandWorker, ZipWorker, MultiDownloadWorker
+from src.utils.formatting import format_size, format_time
+from src.utils.cache import ListingCache, normalize_path
+from src.utils.file_index import FileIndex
+from src.utils.fuzzy import FuzzyIndex
+from src.utils.folder_sync import PUSH, DELETE_REMOTE
+from src.utils.checksums import ALGORITHMS, find_duplicates
+from src.utils.transfer_journal import TransferJournal, discard_job
+from src.utils.scheduler import TransferScheduler, HIGH, NORMAL, LOW, CANCELLED, COMPLETED, FAILED
+from src.utils.throttle import get_limits
+from src.utils.logs import LOG_FILE
+from src.workers import (
+    AdbTransferWorker, FileListWorker, AdbCommandWorker, BatchOperationWorker, ZipWorker, MultiDownloadWorker, PrefetchWorker,
+    InstallWorker, FanOutWorker, DeviceTracker,
+    IndexWorker, SearchWorker, SyncPlanWorker, FolderSyncWorker, ChecksumWorker
+)
 from src.ui.dialogs import (
     ProgressDialog, WiFiConnectionDialog, GenericTextDialog, 
-    ImagePreviewDialog, SettingsDialog, TerminalDialog
+    ImagePreviewDialog, SettingsDialog, TerminalDialog, IndexSearchDialog,
+    SyncOptionsDialog, SyncPlanDialog, DeviceSelectionDialog, LogViewerDialog
 )
 from src.ui.transfer_window import TransferWindow
+from src.ui.performance_window import PerformanceWindow
+from src.ui.file_model import FileListModel, FileFilterProxyModel
 
 class AdbFileBrowser(QWidget):
     def __init__(self):
@@ -33,24 +53,46 @@ class AdbFileBrowser(QWidget):
         self.favorites = []
         self.search_target = None
         
-        self.auto_refresh_devices = True
-        self.device_refresh_interval = 10000
+        self.download_concurrency = MultiDownloadWorker.DEFAULT_CONCURRENCY
+        self.max_transfers = 3
+        self.max_transfers_per_device = 2
+        self.fan_out_concurrency = FanOutWorker.DEFAULT_CONCURRENCY
+        self.listing_cache_ttl = 30
+
+        self.listing_cache = ListingCache(ttl=self.listing_cache_ttl)
+        self.list_worker = None
+        self.displayed_entries = None
+        self.prefetch_worker = None
+        self.prefetch_limit = 24
+
+        self.file_index = FileIndex()
+        self.index_worker = None
+        self.search_dialog = None
+        self.search_worker = None
+        self.search_query_id = None
+
+        # Prefetch starts once the browser has been idle for a moment after a listing.
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(500)
+        self.prefetch_timer.timeout.connect(self.start_prefetch)
 
-        self.transfer_window = TransferWindow()
+        self.scheduler = TransferScheduler(self.max_transfers, self.max_transfers_per_device, self)
+        self.scheduler.transferFinished.connect(self.on_transfer_finished)
+        self.transfer_window = TransferWindow(self.scheduler)
+        self.transfers_failed = 0  # since the queue last ran empty
+        self.performance_window = None
+        self.transfer_journal = TransferJournal()
+        self.started_at = time.time()
+        self.resume_offered = set()  # journal job ids the user was already asked about
+        self.device_infos = []  # the tracker's latest device table
         
         self.init_ui()
-        
-        self.list_files()
-        
-        self.connection_timer = QTimer(self)
-        self.connection_timer.setInterval(10000)
-        self.connection_timer.timeout.connect(self.check_device)
-        self.connection_timer.start()
 
-        self.device_timer = QTimer(self)
-        self.device_timer.setInterval(self.device_refresh_interval)
-        self.device_timer.timeout.connect(self.update_devices)
-        self.device_timer.start()
+        # The device list comes from the adb server's change stream; the first list triggers the first listing.
+        self.device_tracker = DeviceTracker(self)
+        self.device_tracker.devicesChanged.connect(self.update_devices)
+        self.device_tracker.start()
 
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -64,7 +106,7 @@ class AdbFileBrowser(QWidget):
         top_layout.addWidget(self.path_edit)
         
         refresh_btn = QPushButton("Refresh")
-        refresh_btn.clicked.connect(self.list_files)
+        refresh_btn.clicked.connect(self.refresh_files)
         top_layout.addWidget(refresh_btn)
         
         new_folder_btn = QPushButton("New Folder")
@@ -73,7 +115,7 @@ class AdbFileBrowser(QWidget):
         
         top_layout.addWidget(QLabel("Device:"))
         self.device_combo = QComboBox()
-        self.update_devices() # Initial population
+        self.device_combo.addItem("No Device")
         top_layout.addWidget(self.device_combo)
         
         # Favorites
@@ -105,9 +147,9 @@ class AdbFileBrowser(QWidget):
         main_layout.addLayout(top_layout)
         
         # Header & Search
-        header_label = QLabel("Browse files on your connected device")
-        header_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        main_layout.addWidget(header_label)
+        self.header_label = QLabel("Browse files on your connected device")
+        self.header_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        main_layout.addWidget(self.header_label)
         
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search files...")
@@ -115,13 +157,22 @@ class AdbFileBrowser(QWidget):
         main_layout.addWidget(self.search_bar)
         
         # Tree Widget
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabel("File List")
+        # Model/view instead of one widget item per entry, so huge folders stay responsive.
+        self.file_model = FileListModel(self)
+        self.proxy_model = FileFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.file_model)
+        self.tree = QTreeView()
+        self.tree.setModel(self.proxy_model)
+        self.tree.setRootIsDecorated(False)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setSortingEnabled(True)
+        self.tree.sortByColumn(0, Qt.SortOrder.AscendingOrder)
         self.tree.setColumnWidth(0, 500)
+        self.tree.setColumnWidth(1, 100)
         self.tree.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.tree.customContextMenuRequested.connect(self.show_context_menu)
-        self.tree.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.tree.doubleClicked.connect(self.on_item_double_clicked)
         main_layout.addWidget(self.tree)
         
         # Buttons
@@ -193,10 +244,22 @@ class AdbFileBrowser(QWidget):
         terminal_btn.clicked.connect(self.open_terminal)
         extra_layout.addWidget(terminal_btn)
         
+        device_search_btn = QPushButton("Device Search")
+        device_search_btn.clicked.connect(self.open_device_search)
+        extra_layout.addWidget(device_search_btn)
+
         sync_btn = QPushButton("Sync")
         sync_btn.clicked.connect(self.sync_folder)
         extra_layout.addWidget(sync_btn)
         
+        push_devices_btn = QPushButton("Push to Devices")
+        push_devices_btn.clicked.connect(self.push_to_devices)
+        extra_layout.addWidget(push_devices_btn)
+
+        install_devices_btn = QPushButton("Install on Devices")
+        install_devices_btn.clicked.connect(self.install_on_devices)
+        extra_layout.addWidget(install_devices_btn)
+
         copy_btn = QPushButton("Copy")
         copy_btn.clicked.connect(self.copy_files)
         extra_layout.addWidget(copy_btn)
@@ -213,6 +276,10 @@ class AdbFileBrowser(QWidget):
         self.transfers_btn.clicked.connect(self.show_transfers)
         extra_layout.addWidget(self.transfers_btn)
 
+        performance_btn = QPushButton("Performance")
+        performance_btn.clicked.connect(self.show_performance)
+        extra_layout.addWidget(performance_btn)
+
         main_layout.addLayout(button_layout)
         main_layout.addLayout(extra_layout)
         
@@ -223,6 +290,16 @@ class AdbFileBrowser(QWidget):
         self.setLayout(main_layout)
         self.setWindowIcon(create_icon('folder'))
 
+    def closeEvent(self, event):
+        self.device_tracker.stop()
+        self.device_tracker.wait()
+        if self.search_worker:
+            self.search_worker.stop()
+            self.search_worker.wait()
+        self.stop_index()
+        self.stop_prefetch()
+        super().closeEvent(event)
+
     # --- Themes ---
     def apply_theme(self):
         theme = self.theme_combo.currentText()
@@ -265,25 +342,76 @@ class AdbFileBrowser(QWidget):
         device = self.get_selected_device()
         for file_path in files:
             file_name = os.path.basename(file_path)
-            transfer_id = f"upload_{file_name}_{os.urandom(4).hex()}"
-            self.transfer_window.add_transfer(transfer_id, f"Uploading {file_name}")
-            self.set_processing_style(True)
-            
-            # Using AdbTransferWorker for upload
-            from src.workers import AdbTransferWorker
             worker = AdbTransferWorker(["adb", "push", file_path, self.current_directory], device, self)
-            
-            worker.progress_update.connect(lambda msg, pct, spd, eta, tid=transfer_id: self.transfer_window.update_progress(tid, pct, spd))
-            worker.finished_transfer.connect(lambda tid=transfer_id: self.on_transfer_finished(tid))
-            worker.finished_transfer.connect(self.list_files)
-            worker.error_occurred.connect(lambda err: QMessageBox.critical(self, "Error", f"Upload failed: {err}"))
-            worker.start()
+            worker.finished_transfer.connect(lambda d=self.current_directory: self.on_remote_changed([d]))
+            worker.error_occurred.connect(lambda err: QMessageBox.critical(
+                self, "Error", f"Upload failed: {err}\n\nIt will be offered for resume the next time the app starts."))
+            self.queue_transfer(worker, f"Uploading {file_name}", device)
+
+    def queue_transfer(self, worker, title, device=None, priority=NORMAL):
+        """Shows a transfer in the transfer window and hands its worker to the scheduler, which starts it when a slot is free."""
+        transfer_id = f"transfer_{os.urandom(4).hex()}"
+        self.transfer_window.add_transfer(transfer_id, title)
+        self.set_processing_style(True)
+        worker.progress_update.connect(lambda msg, pct, spd, eta, tid=transfer_id: self.transfer_window.update_progress(tid, pct, spd))
+        self.scheduler.submit(transfer_id, worker, device, priority)
+        return transfer_id
 
-    def on_transfer_finished(self, transfer_id):
-        self.transfer_window.mark_finished(transfer_id)
+    def on_transfer_finished(self, transfer_id, outcome=COMPLETED):
+        self.transfer_window.mark_finished(transfer_id, outcome.capitalize())
+        if outcome == FAILED:
+            self.transfers_failed += 1
         if self.transfer_window.active_count == 0:
             self.set_processing_style(False)
-            QMessageBox.information(self, "Finished", "Transfer completed!")
+            # Failures already brought up their own message.
+            if outcome != CANCELLED and not self.transfers_failed:
+                QMessageBox.information(self, "Finished", "Transfer completed!")
+            self.transfers_failed = 0
+
+    # --- Resumable transfers ---
+    def offer_resume_transfers(self, devices):
+        """
+        Offers the transfers a crash or a lost connection left unfinished, for
+        the devices that are online. Runs on every device change, so a job is
+        offered once its device is plugged in, and only asked about once.
+        """
+        devices = {info.serial: AdbManager.display_name(info) for info in devices if info.state == "device"}
+        for job in self.transfer_journal.jobs():
+            if job.created >= self.started_at or job.id in self.resume_offered:
+                continue  # started in this session, or already answered
+            if not job.files:
+                self.transfer_journal.finish(job.id)
+                continue
+            device = devices.get(job.serial)
+            if device is None:
+                logging.debug(f"Unfinished transfer '{job.title}' waits for {job.serial}")
+                continue
+            self.resume_offered.add(job.id)
+            reply = QMessageBox.question(
+                self, "Resume Transfer",
+                f"{job.title}\n{job.files} files, {format_size(job.remaining_bytes)} left on {job.serial}.\n\n"
+                "Resume this unfinished transfer?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Discard)
+            if reply == QMessageBox.StandardButton.Yes:
+                self.resume_transfer(job, device)
+            elif reply == QMessageBox.StandardButton.Discard:
+                discard_job(self.transfer_journal, job.id)
+
+    def resume_transfer(self, job, device):
+        if job.direction == "pull":
+            worker = MultiDownloadWorker([], "", "", device, self, self.download_concurrency, job=job.id)
+            worker.finished.connect(lambda: self.report_failed_downloads(worker))
+        else:
+            folders = list({posixpath.dirname(item.destination) for item in self.transfer_journal.files(job.id)})
+            worker = AdbTransferWorker(None, device, self, job=job.id)
+            worker.finished_transfer.connect(lambda: self.on_remote_changed(folders))
+            worker.error_occurred.connect(lambda err: QMessageBox.critical(self, "Error", f"Resume failed: {err}"))
+        self.queue_transfer(worker, f"Resuming: {job.title}", device, LOW)
+
+    def report_failed_downloads(self, worker):
+        if worker.failed:
+            QMessageBox.warning(self, "Download", f"{worker.failed} files could not be downloaded, see the log. "
+                                "The download will be offered for resume the next time the app starts.")
 
     def set_processing_style(self, active):
         if hasattr(self, 'transfers_btn'):
@@ -326,42 +454,155 @@ class AdbFileBrowser(QWidget):
             return text
         return None
 
-    def update_devices(self):
-        devices = AdbManager.get_devices()
-        current = self.device_combo.currentText()
+    def update_devices(self, devices):
+        """Rebuilds the device list from the tracker's table and relists if another device got selected."""
+        self.device_infos = devices
+        current = AdbManager.get_serial(self.device_combo.currentText())
+        self.device_combo.blockSignals(True)
         self.device_combo.clear()
-        if devices:
-            self.device_combo.addItems(devices)
-            if current in devices:
-                self.device_combo.setCurrentText(current)
-        else:
+        for info in devices:
+            if info.state in ("device", "unauthorized"):
+                self.device_combo.addItem(AdbManager.display_name(info))
+                if info.model:
+                    self.device_combo.setItemData(self.device_combo.count() - 1, info.model, Qt.ItemDataRole.ToolTipRole)
+        if self.device_combo.count() == 0:
             self.device_combo.addItem("No Device")
+        for i in range(self.device_combo.count()):
+            if AdbManager.get_serial(self.device_combo.itemText(i)) == current:
+                self.device_combo.setCurrentIndex(i)
+        self.device_combo.blockSignals(False)
+        selected = AdbManager.get_serial(self.device_combo.currentText())
+        if selected and selected != current:
+            self.list_files()
+        elif current and not selected:
+            self.show_no_device()
+        self.offer_resume_transfers(devices)
 
-    def check_device(self):
-        pass
+    def show_no_device(self):
+        """Empties the view once the last device is gone, instead of leaving its files up as if they were browsable."""
+        self.stop_prefetch()
+        if self.list_worker:
+            self.list_worker.cancel()
+            self.list_worker = None
+        self.file_model.clear()
+        self.displayed_entries = None
+        self.progress_bar.setVisible(False)
+        self.header_label.setText("No device connected")
 
     def list_files(self):
-        self.progress_bar.setVisible(True)
-        self.tree.clear()
+        self.stop_prefetch()
+        if self.list_worker:
+            self.list_worker.cancel()
+        self.file_model.clear()
+        self.displayed_entries = None
         self.path_edit.setText(self.current_directory)
+        self.header_label.setText("Browse files on your connected device")
         device = self.get_selected_device()
-        
-        self.list_worker = FileListWorker(self.current_directory, device, self)
-        self.list_worker.filesListed.connect(self.populate_file_tree)
-        self.list_worker.errorOccurred.connect(self.on_list_error)
-        self.list_worker.finished.connect(lambda: self.progress_bar.setVisible(False))
-        self.list_worker.start()
-
-    def populate_file_tree(self, files):
-        for file in files:
-            item = QTreeWidgetItem([file])
-            if file.endswith('/'):
-                item.setIcon(0, create_icon('folder'))
-            else:
-                item.setIcon(0, create_icon('file'))
-            self.tree.addTopLevelItem(item)
-        
-    def on_list_error(self, error):
+
+        # Show a cached listing right away; only go to the device when it is missing or stale.
+        cached = self.listing_cache.get(AdbManager.get_serial(device), self.current_directory)
+        if cached:
+            entries, fresh = cached
+            self.populate_file_tree(entries)
+            if fresh:
+                self.list_worker = None
+                self.progress_bar.setVisible(False)
+                self.prefetch_timer.start()
+                return
+
+        self.progress_bar.setVisible(True)
+        # Without a cached listing on screen, rows are appended as batches arrive from the device.
+        worker = FileListWorker(self.current_directory, device, self, streaming=not cached)
+        generation = self.listing_cache.generation(AdbManager.get_serial(device), self.current_directory)
+        worker.entriesBatch.connect(lambda batch, w=worker: self.on_files_batch(w, batch))
+        worker.filesListed.connect(lambda entries, w=worker: self.on_files_listed(w, entries, generation))
+        worker.errorOccurred.connect(lambda error, w=worker: self.on_list_error(error, w.directory) if w is self.list_worker else None)
+        worker.finished.connect(lambda w=worker: self.progress_bar.setVisible(False) if w is self.list_worker else None)
+        self.list_worker = worker
+        worker.start()
+
+    def refresh_files(self):
+        self.listing_cache.invalidate(AdbManager.get_serial(self.get_selected_device()), self.current_directory)
+        self.list_files()
+
+    def on_files_listed(self, worker, entries, generation=None):
+        self.listing_cache.put(AdbManager.get_serial(worker.device), worker.directory, entries, generation)
+        # Ignore results for a directory the user already left, and skip redraws when revalidation found no change.
+        if worker is not self.list_worker:
+            return
+        self.prefetch_timer.start()
+        if worker.streaming:
+            # Rows are already in the model; put them in their final order without a reset.
+            self.displayed_entries = entries
+            self.file_model.resort()
+            self.reset_search()
+            return
+        if entries == self.displayed_entries:
+            return
+        self.populate_file_tree(entries)
+
+    def on_files_batch(self, worker, batch):
+        if worker is self.list_worker:
+            self.file_model.append_entries(batch)
+
+    # --- Prefetch ---
+    def prefetch_candidates(self):
+        """Subfolders of the current view first, then favorites and recent history."""
+        base = self.current_directory.rstrip("/")
+        candidates = [f"{base}/{entry.name}" for entry in (self.displayed_entries or []) if entry.is_dir]
+        candidates += self.favorites
+        candidates += list(reversed(self.history[-5:])) + list(reversed(self.forward_history[-5:]))
+        seen, ordered = set(), []
+        for path in candidates:
+            key = normalize_path(path)
+            if key not in seen and key != normalize_path(self.current_directory):
+                seen.add(key)
+                ordered.append(path)
+        return ordered[:self.prefetch_limit]
+
+    def start_prefetch(self):
+        candidates = self.prefetch_candidates()
+        if not candidates or (self.prefetch_worker and self.prefetch_worker.isRunning()):
+            return
+        self.prefetch_worker = PrefetchWorker(candidates, self.listing_cache, self.get_selected_device(), self)
+        self.prefetch_worker.start(QThread.Priority.LowestPriority)
+
+    def stop_prefetch(self):
+        self.prefetch_timer.stop()
+        if self.prefetch_worker:
+            # Waits out at most the listing in flight, so the next start_prefetch is not skipped as busy.
+            self.prefetch_worker.stop()
+            self.prefetch_worker.wait()
+            self.prefetch_worker = None
+
+    def on_remote_changed(self, paths, removed=()):
+        """Drops cached listings touched by a mutation and reloads the view if it is one of them."""
+        serial = AdbManager.get_serial(self.get_selected_device())
+        for path in paths:
+            self.listing_cache.invalidate(serial, path)
+        for path in removed:
+            self.listing_cache.invalidate(serial, path, recursive=True)
+        if normalize_path(self.current_directory) in {normalize_path(path) for path in paths}:
+            self.list_files()
+
+    def populate_file_tree(self, entries):
+        self.displayed_entries = entries
+        self.file_model.set_entries(entries)
+        self.reset_search()
+
+    def selected_entries(self):
+        rows = sorted(self.proxy_model.mapToSource(index).row() for index in self.tree.selectionModel().selectedRows())
+        return [self.file_model.entry(row) for row in rows]
+
+    def on_list_error(self, error, directory=None):
+        # Fall back to the last indexed copy when the device cannot be reached.
+        serial = self.index_serial()
+        entries = self.file_index.list_dir(serial, directory) if serial and directory else None
+        if entries is not None:
+            logging.warning(f"Listing {directory} failed ({error}); showing indexed copy")
+            self.header_label.setText(f"Offline: showing the indexed copy of {serial}")
+            self.populate_file_tree(entries)
+            return
         QMessageBox.critical(self, "Error", error)
 
     # --- Navigation ---
@@ -372,8 +613,8 @@ class AdbFileBrowser(QWidget):
             self.current_directory = new_path
             self.list_files()
 
-    def on_item_double_clicked(self, item, column):
-        name = item.text(0)
+    def on_item_double_clicked(self, index):
+        name = self.file_model.entry(self.proxy_model.mapToSource(index).row()).display_name
         if name.endswith("/"):
             self.history.append(self.current_directory)
             self.forward_history.clear()
@@ -403,30 +644,86 @@ class AdbFileBrowser(QWidget):
 
     # --- Search ---
     def filter_files(self, text):
-        search_term = text.lower()
-        for i in range(self.tree.topLevelItemCount()):
-            item = self.tree.topLevelItem(i)
-            item.setHidden(search_term not in item.text(0).lower())
+        if not text.strip():
+            self.search_query_id = None
+            self.proxy_model.set_scores(None)
+            return
+        if self.search_worker is None:
+            # The worker indexes the names shown right now; reset_search() replaces it when they change.
+            names = [self.file_model.lower_name(row) for row in range(self.file_model.rowCount())]
+            worker = SearchWorker(lambda: FuzzyIndex(names), None, self)
+            worker.resultsReady.connect(lambda query_id, results, w=worker: self.on_search_results(w, query_id, results))
+            worker.start()
+            self.search_worker = worker
+        self.search_query_id = self.search_worker.submit(text)
+
+    def on_search_results(self, worker, query_id, results):
+        if worker is self.search_worker and query_id == self.search_query_id:
+            self.proxy_model.set_scores(dict(results))
+
+    def reset_search(self):
+        """Drops the search index after the listing changed and re-runs an active query."""
+        if self.search_worker:
+            self.search_worker.stop()
+            self.search_worker = None
+        self.filter_files(self.search_bar.text())
+
+    # --- Device index ---
+    def index_serial(self):
+        """Serial to use for the file index: the selected device, else the most recently indexed one."""
+        serial = AdbManager.get_serial(self.get_selected_device())
+        if serial:
+            return serial
+        devices = self.file_index.devices()
+        return devices[0][0] if devices else None
+
+    def open_device_search(self):
+        serial = self.index_serial()
+        if not serial:
+            QMessageBox.warning(self, "Device Search", "Connect a device to build its file index.")
+            return
+        self.search_dialog = IndexSearchDialog(self.file_index, serial, self)
+        self.search_dialog.openRequested.connect(self.open_indexed_path)
+        self.search_dialog.updateRequested.connect(self.update_index)
+        self.search_dialog.finished.connect(self.stop_index)
+        self.search_dialog.show()
+
+    def update_index(self):
+        if self.index_worker and self.index_worker.isRunning():
+            return
+        dialog = self.search_dialog
+        self.index_worker = IndexWorker(self.file_index, dialog.serial, "/sdcard", self)
+        self.index_worker.progress.connect(lambda count: dialog.refresh_status(f"Scanning... {count} folders"))
+        self.index_worker.finished_indexing.connect(lambda _: dialog.index_changed())
+        self.index_worker.errorOccurred.connect(lambda error: dialog.refresh_status(f"Index update failed: {error}"))
+        dialog.update_btn.setEnabled(False)
+        self.index_worker.finished.connect(lambda: dialog.update_btn.setEnabled(True))
+        dialog.refresh_status("Scanning...")
+        self.index_worker.start(QThread.Priority.LowPriority)
+
+    def stop_index(self):
+        if self.index_worker:
+            self.index_worker.stop()
+            self.index_worker.wait()
+            self.index_worker = None
+
+    def open_indexed_path(self, path, is_dir):
+        """Shows a search hit: folders are opened, files are shown in their parent folder."""
+        self.history.append(self.current_directory)
+        self.forward_history.clear()
+        self.current_directory = path if is_dir else posixpath.dirname(path)
+        self.list_files()
+        if not is_dir:
+            self.search_bar.setText(posixpath.basename(path))
 
     # --- Actions ---
     def download_file(self):
-        selected = self.tree.selectedItems()
+        selected = self.selected_entries()
         if not selected:
             return
             
         device = self.get_selected_device()
-        files = [item.text(0) for item in selected]
-        
-        # Helper for common connection logic
-        def setup_worker(worker, title):
-            transfer_id = f"dl_{os.urandom(4).hex()}"
-            self.transfer_window.add_transfer(transfer_id, title)
-            self.set_processing_style(True)
-            
-            # Using new signal signature: msg, pct, speed, eta
-            worker.progress_update.connect(lambda msg, pct, spd, eta, tid=transfer_id: self.transfer_window.update_progress(tid, pct, spd))
-            worker.finished.connect(lambda tid=transfer_id: self.on_transfer_finished(tid))
-            worker.start()
+        files = [entry.display_name for entry in selected]
 
         if len(files) > 1:
             reply = QMessageBox.question(self, "Download", "Download as Zip?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
@@ -434,13 +731,15 @@ class AdbFileBrowser(QWidget):
                 save_path, _ = QFileDialog.getSaveFileName(self, "Save Zip", "download.zip", "Zip (*.zip)")
                 if save_path:
                     self.zip_worker = ZipWorker(files, self.current_directory, save_path, device, self)
-                    setup_worker(self.zip_worker, "Downloading Zip")
+                    self.zip_worker.error_occurred.connect(lambda err: QMessageBox.warning(self, "Zip", err))
+                    self.queue_transfer(self.zip_worker, "Downloading Zip", device)
                 return
 
         folder = QFileDialog.getExistingDirectory(self, "Select Download Folder")
         if folder:
-            self.multi_dl_worker = MultiDownloadWorker(files, self.current_directory, folder, device, self)
-            setup_worker(self.multi_dl_worker, "Downloading Files")
+            self.multi_dl_worker = MultiDownloadWorker(files, self.current_directory, folder, device, self, self.download_concurrency)
+            self.multi_dl_worker.finished.connect(lambda worker=self.multi_dl_worker: self.report_failed_downloads(worker))
+            self.queue_transfer(self.multi_dl_worker, "Downloading Files", device)
 
     def upload_file(self):
         path, _ = QFileDialog.getOpenFileName(self, "Select File")
@@ -448,44 +747,43 @@ class AdbFileBrowser(QWidget):
             self.upload_dropped_files([path])
 
     def delete_file(self):
-        selected = self.tree.selectedItems()
+        selected = self.selected_entries()
         if not selected:
             return
         if QMessageBox.question(self, "Confirm", "Delete selected?") != QMessageBox.StandardButton.Yes:
             return
             
-        device = self.get_selected_device()
-        for item in selected:
-            name = item.text(0)
-            cmd = ["adb", "shell", "rm", "-rf", f"{self.current_directory}/{name}"]
-            worker = AdbCommandWorker(cmd, device, self)
-            worker.finished_with_output.connect(self.list_files)
-            worker.start()
+        operations = [("rm", f"{self.current_directory}/{entry.name}") for entry in selected]
+        self.run_batch(operations, "Delete")
 
     def show_properties(self):
-        selected = self.tree.selectedItems()
+        selected = self.selected_entries()
         if len(selected) != 1:
             return
-        name = selected[0].text(0)
-        device = self.get_selected_device()
-        cmd = ["adb", "shell", "ls", "-l", f"{self.current_directory}/{name}"]
-        worker = AdbCommandWorker(cmd, device, self)
-        def show(output):
-            GenericTextDialog("Properties", output, self).exec()
-        worker.finished_with_output.connect(show)
-        worker.start()
+        # The listing already carries the metadata, no device round trip needed.
+        entry = selected[0]
+        content = "\n".join([
+            f"Name: {entry.name}",
+            f"Path: {self.current_directory.rstrip('/')}/{entry.name}",
+            f"Type: {entry.type}",
+            f"Size: {format_size(entry.size)} ({entry.size} bytes)",
+            f"Mode: {stat.filemode(entry.mode)} ({entry.mode & 0o7777:o})",
+            f"Modified: {format_time(entry.mtime)}",
+        ])
+        GenericTextDialog("Properties", content, self).exec()
 
     def rename_file(self):
-        selected = self.tree.selectedItems()
+        selected = self.selected_entries()
         if len(selected) != 1:
             return
-        old_name = selected[0].text(0)
+        old_name = selected[0].name
         new_name, ok = QInputDialog.getText(self, "Rename", "New Name:", text=old_name)
         if ok and new_name:
              device = self.get_selected_device()
-             cmd = ["adb", "shell", "mv", f"{self.current_directory}/{old_name}", f"{self.current_directory}/{new_name}"]
+             old_path = f"{self.current_directory}/{old_name}"
+             cmd = ["adb", "shell", "mv", old_path, f"{self.current_directory}/{new_name}"]
              worker = AdbCommandWorker(cmd, device, self)
-             worker.finished_with_output.connect(self.list_files)
+             worker.finished_with_output.connect(lambda _, d=self.current_directory: self.on_remote_changed([d], [old_path]))
              worker.start()
 
     # --- Dialogs ---
@@ -493,15 +791,28 @@ class AdbFileBrowser(QWidget):
         WiFiConnectionDialog(self).exec()
 
     def open_settings(self):
-        dlg = SettingsDialog(self.auto_refresh_devices, self.device_refresh_interval, self)
+        limits = get_limits()
+        dlg = SettingsDialog(self.download_concurrency, self.listing_cache_ttl, self.max_transfers, self.max_transfers_per_device,
+                             limits.global_rate // 1024, limits.device_rate // 1024, self)
         if dlg.exec():
-            self.auto_refresh_devices, self.device_refresh_interval = dlg.result_settings
-            self.device_timer.setInterval(self.device_refresh_interval)
+            (self.download_concurrency, self.listing_cache_ttl, self.max_transfers, self.max_transfers_per_device,
+             global_limit, device_limit) = dlg.result_settings
+            self.listing_cache.ttl = self.listing_cache_ttl
+            self.scheduler.set_limits(self.max_transfers, self.max_transfers_per_device)
+            limits.set_global_rate(global_limit * 1024)
+            limits.set_device_rate(device_limit * 1024)
+            self.transfer_window.refresh_limits()
 
     def show_transfers(self):
         self.transfer_window.show()
         self.transfer_window.raise_()
 
+    def show_performance(self):
+        if self.performance_window is None:
+            self.performance_window = PerformanceWindow()
+        self.performance_window.show()
+        self.performance_window.raise_()
+
     def open_terminal(self):
         TerminalDialog(AdbManager, self.get_selected_device(), self).show()
         
@@ -514,12 +825,10 @@ class AdbFileBrowser(QWidget):
         worker.start()
 
     def view_log(self):
-        try:
-            with open("adb_file_browser.log", "r", encoding="utf-8") as f:
-                content = f.read()
-            GenericTextDialog("Log Viewer", content, self).exec()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not open log: {e}")
+        if not os.path.exists(LOG_FILE):
+            QMessageBox.critical(self, "Error", f"Could not open log: {LOG_FILE} does not exist yet")
+            return
+        LogViewerDialog(LOG_FILE, self).exec()
 
     def create_new_folder(self):
         folder_name, ok = QInputDialog.getText(self, "New Folder", "Name:")
@@ -527,22 +836,60 @@ class AdbFileBrowser(QWidget):
              device = self.get_selected_device()
              cmd = ["adb", "shell", "mkdir", f"{self.current_directory}/{folder_name}"]
              worker = AdbCommandWorker(cmd, device, self)
-             worker.finished_with_output.connect(self.list_files)
+             worker.finished_with_output.connect(lambda _, d=self.current_directory: self.on_remote_changed([d]))
              worker.start()
 
     def install_apk(self):
         path, _ = QFileDialog.getOpenFileName(self, "Select APK", filter="APK (*.apk)")
         if path:
-            transfer_id = f"install_{os.urandom(4).hex()}"
-            self.transfer_window.add_transfer(transfer_id, "Installing APK...")
             device = self.get_selected_device()
-            worker = AdbCommandWorker(["adb", "install", path], device, self)
-            worker.finished_with_output.connect(lambda: self.transfer_window.update_progress(transfer_id, 100))
-            worker.start()
+            worker = InstallWorker(path, device, self)
+            worker.errorOccurred.connect(lambda err: QMessageBox.critical(self, "Error", f"Install failed: {err}"))
+            # Installs are small and the user is usually waiting for them, so they skip ahead of bulk transfers.
+            self.queue_transfer(worker, f"Installing {os.path.basename(path)}", device, HIGH)
+
+    # --- Fan-out to several devices ---
+    def push_to_devices(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select Files to Push")
+        if paths:
+            self.start_fan_out(FanOutWorker.PUSH, paths, "Push to Devices", self.current_directory)
+
+    def install_on_devices(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select APKs", filter="APK (*.apk)")
+        if paths:
+            self.start_fan_out(FanOutWorker.INSTALL, paths, "Install on Devices")
+
+    def start_fan_out(self, mode, paths, title, remote_dir=None):
+        # Unauthorized and offline devices are listed for browsing feedback but would only fail here.
+        devices = [AdbManager.display_name(info) for info in self.device_infos if info.state == "device"]
+        if not devices:
+            QMessageBox.warning(self, "Warning", "No devices connected!")
+            return
+        dialog = DeviceSelectionDialog(devices, title, self.fan_out_concurrency, remote_dir, self)
+        if not dialog.exec():
+            return
+        self.fan_out_concurrency = dialog.concurrency
+        serials = dialog.selected_devices
+        worker = FanOutWorker(mode, paths, serials, dialog.remote_dir, dialog.concurrency, self)
+        names = [os.path.basename(path) for path in paths]
+        label = f"{title}: {names[0] if len(names) == 1 else f'{len(names)} files'} → {len(serials)} devices"
+        transfer_id = self.queue_transfer(worker, label, serials)
+        self.transfer_window.add_matrix(transfer_id, f"{mode.capitalize()} results", serials, names)
+        worker.deviceProgress.connect(
+            lambda serial, name, text, state, tid=transfer_id: self.transfer_window.update_matrix(tid, serial, name, text, state))
+        worker.finished_fanout.connect(lambda ok, failed: self.on_fan_out_finished(mode, dialog.remote_dir, serials, ok, failed))
+
+    def on_fan_out_finished(self, mode, remote_dir, serials, succeeded, failed):
+        if mode == FanOutWorker.PUSH:
+            for serial in serials:
+                self.listing_cache.invalidate(serial, remote_dir)
+            self.on_remote_changed([remote_dir])
+        if failed:
+            QMessageBox.warning(self, "Fan-out", f"{succeeded} succeeded, {failed} failed. See the transfer window for details.")
 
     def batch_rename(self):
-        selected_items = self.tree.selectedItems()
-        if not selected_items:
+        selected_entries = self.selected_entries()
+        if not selected_entries:
             QMessageBox.warning(self, "Warning", "Please select files to batch rename!")
             return
         
@@ -554,74 +901,124 @@ class AdbFileBrowser(QWidget):
         if not ok:
             return
             
-        device = self.get_selected_device()
+        operations = []
         counter = start_index
-        for item in selected_items:
-            old_name = item.text(0)
+        for entry in selected_entries:
+            old_name = entry.name
             ext = os.path.splitext(old_name)[1]
             new_name = f"{base_name}_{counter}{ext}"
-            
-            cmd = ["adb", "shell", "mv", f"{self.current_directory}/{old_name}", f"{self.current_directory}/{new_name}"]
-            worker = AdbCommandWorker(cmd, device, self)
-            worker.start()
+            operations.append(("mv", f"{self.current_directory}/{old_name}", f"{self.current_directory}/{new_name}"))
             counter += 1
-        
-        QTimer.singleShot(1000, self.list_files)
+
+        self.run_batch(operations, "Batch Rename")
 
     def export_file_list(self):
         save_path, _ = QFileDialog.getSaveFileName(self, "Export List", "files.csv")
         if save_path:
             with open(save_path, 'w', newline='') as f:
                 writer = csv.writer(f)
-                writer.writerow(["Name"])
-                for i in range(self.tree.topLevelItemCount()):
-                    writer.writerow([self.tree.topLevelItem(i).text(0)])
+                writer.writerow(["Name", "Size", "Modified"])
+                for entry in self.file_model.entries():
+                    writer.writerow([entry.display_name, entry.size, format_time(entry.mtime)])
 
     def file_details(self):
         self.show_properties()
 
     def checksum(self):
-        selected = self.tree.selectedItems()
-        if len(selected) != 1: return
-        name = selected[0].text(0)
-        device = self.get_selected_device()
-        worker = AdbCommandWorker(["adb", "shell", "md5sum", f"{self.current_directory}/{name}"], device, self)
-        worker.finished_with_output.connect(lambda out: QMessageBox.information(self, "MD5", out))
+        selected = self.selected_entries()
+        if not selected:
+            return
+        algorithm, ok = QInputDialog.getItem(self, "Checksum", "Algorithm:", list(ALGORITHMS), 0, False)
+        if not ok:
+            return
+        paths = [f"{self.current_directory.rstrip('/')}/{entry.name}" for entry in selected]
+        self.progress_bar.setVisible(True)
+        worker = ChecksumWorker(paths, self.get_selected_device(), algorithm, self)
+        worker.finished_with_results.connect(lambda digests: self.show_checksums(algorithm, digests))
+        worker.errorOccurred.connect(lambda err: QMessageBox.critical(self, "Error", f"Checksum failed: {err}"))
+        worker.finished.connect(lambda: self.progress_bar.setVisible(False))
+        self.checksum_worker = worker
         worker.start()
 
+    def show_checksums(self, algorithm, digests):
+        lines = [f"{digest}  {path}" for path, digest in sorted(digests.items())]
+        duplicates = find_duplicates(digests)
+        if duplicates:
+            lines += ["", f"{len(duplicates)} groups of identical files:"]
+            for group in duplicates:
+                lines += [""] + group
+        GenericTextDialog(f"{algorithm.upper()} checksums", "\n".join(lines) or "No files", self, 700, 400).exec()
+
     def sync_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Sync Dest")
-        if folder:
-             device = self.get_selected_device()
-             
-             transfer_id = f"sync_{os.urandom(4).hex()}"
-             self.transfer_window.add_transfer(transfer_id, "Syncing Folder...")
-             self.set_processing_style(True)
-             
-             from src.workers import AdbTransferWorker
-             worker = AdbTransferWorker(["adb", "pull", self.current_directory, folder], device, self)
-             
-             worker.progress_update.connect(lambda msg, pct, spd, eta, tid=transfer_id: self.transfer_window.update_progress(tid, pct, spd))
-             worker.finished_transfer.connect(lambda tid=transfer_id: self.on_transfer_finished(tid))
-             worker.error_occurred.connect(lambda err: QMessageBox.critical(self, "Error", f"Sync failed: {err}"))
-             worker.start()
+        if not folder:
+            return
+        options = SyncOptionsDialog(self.current_directory, folder, self)
+        if not options.exec():
+            return
+        direction, delete, checksum = options.result_options
+        self.progress_bar.setVisible(True)
+        self.sync_plan_worker = SyncPlanWorker(self.current_directory, folder, self.get_selected_device(),
+                                               direction, delete, checksum, self)
+        self.sync_plan_worker.planReady.connect(self.confirm_sync)
+        self.sync_plan_worker.errorOccurred.connect(lambda err: QMessageBox.critical(self, "Error", f"Sync failed: {err}"))
+        self.sync_plan_worker.finished.connect(lambda: self.progress_bar.setVisible(False))
+        self.sync_plan_worker.start()
+
+    def confirm_sync(self, plan):
+        # Nothing is touched until the user has seen the dry-run plan.
+        if not SyncPlanDialog(plan, self).exec():
+            return
+        worker = FolderSyncWorker(plan, self, self.download_concurrency)
+        def finished(failed):
+            if failed:
+                QMessageBox.warning(self, "Sync", f"{failed} of {len(plan.actions)} actions failed, see the log.")
+            if plan.count(PUSH) or plan.count(DELETE_REMOTE):
+                # Any folder below the synced one may have changed on the device.
+                self.on_remote_changed([plan.remote_root], [plan.remote_root])
+        worker.finished_sync.connect(finished)
+        self.sync_worker = worker
+        self.queue_transfer(worker, "Syncing Folder...", self.get_selected_device(), LOW)
 
     def copy_files(self):
-        selected = self.tree.selectedItems()
-        self.copied_items = [(self.current_directory, item.text(0)) for item in selected]
+        selected = self.selected_entries()
+        self.copied_items = [(self.current_directory, entry.display_name) for entry in selected]
         QMessageBox.information(self, "Copied", f"{len(self.copied_items)} files copied.")
 
     def paste_files(self):
         if not self.copied_items: return
-        device = self.get_selected_device()
+        operations = []
         for src_dir, name in self.copied_items:
-            src = f"{src_dir}/{name}"
-            dst = f"{self.current_directory}/{name}"
-            worker = AdbCommandWorker(["adb", "shell", "cp", "-r", src, dst], device, self)
-            worker.finished_with_output.connect(self.list_files)
-            worker.start()
+            name = name.rstrip("/")
+            operations.append(("cp", f"{src_dir}/{name}", f"{self.current_directory}/{name}"))
+        self.run_batch(operations, "Paste")
         self.copied_items = []
 
+    def run_batch(self, operations, title):
+        """Sends all operations to the device as one script and refreshes once when it is done."""
+        self.batch_worker = BatchOperationWorker(operations, self.get_selected_device(), self)
+        # Every operand may have been created, replaced or removed, and so may its parent folder.
+        touched = [path for operation in operations for path in operation[1:]]
+        parents = {posixpath.dirname(path.rstrip("/")) or "/" for path in touched}
+
+        def invalidate():
+            self.on_remote_changed(parents, touched)
+
+        def done(results):
+            failures = [r for r in results if r.exit_code != 0]
+            if failures:
+                details = "\n".join(f"{' '.join(r.operation[1:])}: {r.output or f'exit code {r.exit_code}'}" for r in failures[:20])
+                QMessageBox.warning(self, title, f"{len(failures)} of {len(results)} operations failed:\n{details}")
+            invalidate()
+
+        def failed(error):
+            QMessageBox.critical(self, "Error", f"{title} failed: {error}")
+            invalidate()
+
+        self.batch_worker.finished_with_results.connect(done)
+        self.batch_worker.errorOccurred.connect(failed)
+        self.batch_worker.start()
+
     def show_context_menu(self, pos):
         menu = QMenu()
         menu.addAction("Download", self.download_file)
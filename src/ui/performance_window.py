@@ -0,0 +1,112 @@
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QFileDialog, QMessageBox
+)
+from PyQt6.QtCore import Qt, QTimer
+
+from src.utils.formatting import format_size, format_speed
+from src.utils.metrics import get_metrics
+
+COLUMNS = ["Operation", "Device", "Count", "Errors", "p50", "p95", "p99", "Data", "Avg Speed"]
+
+
+def format_latency(seconds):
+    if seconds is None:
+        return ""
+    return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+
+class PerformanceWindow(QWidget):
+    """
+    Live view of the metrics registry: latency percentiles, errors and data
+    per operation and device, current throughput and queue depth. Refreshes
+    once a second while it is shown.
+    """
+
+    def __init__(self, metrics=None):
+        super().__init__()
+        self.metrics = metrics or get_metrics()
+        self.setWindowTitle("Performance")
+        self.resize(760, 420)
+
+        layout = QVBoxLayout()
+        self.live_label = QLabel()
+        self.live_label.setWordWrap(True)
+        layout.addWidget(self.live_label)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        json_btn = QPushButton("Export JSON")
+        json_btn.clicked.connect(lambda: self.export("JSON (*.json)", self.metrics.to_json))
+        btn_layout.addWidget(json_btn)
+        prometheus_btn = QPushButton("Export Prometheus")
+        prometheus_btn.clicked.connect(lambda: self.export("Prometheus text (*.prom *.txt)", self.metrics.to_prometheus))
+        btn_layout.addWidget(prometheus_btn)
+        btn_layout.addStretch()
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        btn_layout.addWidget(reset_btn)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+        live = [f"{device or 'default'}: {format_speed(rate)}" for device, rate in sorted(snapshot["throughput"].items())]
+        gauges = {(gauge["name"], gauge["device"]): gauge["value"] for gauge in snapshot["gauges"]}
+        links = [f"{device or 'default'}: {format_speed(value)}"
+                 for (name, device), value in sorted(gauges.items()) if name == "link_speed_bytes_per_second"]
+        queue = ", ".join(f"{gauges.get((f'transfers_{state}', ''), 0)} {state}" for state in ("running", "queued", "paused"))
+        text = f"<b>Throughput</b> {', '.join(live) or 'idle'} &nbsp; <b>Transfers</b> {queue}"
+        if links:
+            text += f" &nbsp; <b>Link</b> {', '.join(links)}"
+        self.live_label.setText(text)
+
+        operations = snapshot["operations"]
+        self.table.setRowCount(len(operations))
+        for row, op in enumerate(operations):
+            values = [
+                op["operation"], op["device"] or "-", str(op["count"]),
+                f"{op['errors']}" + (f" (+{op['cancelled']} cancelled)" if op["cancelled"] else ""),
+                format_latency(op["p50"]), format_latency(op["p95"]), format_latency(op["p99"]),
+                format_size(op["bytes"]) if op["bytes"] else "",
+                format_speed(op["throughput"]) if op["throughput"] else "",
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def export(self, file_filter, render):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "", file_filter)
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(render())
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not export metrics: {e}")
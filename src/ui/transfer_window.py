@@ -1,11 +1,20 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QProgressBar, QHBoxLayout, 
-    QListWidget, QListWidgetItem, QPushButton, QTabWidget
+    QListWidget, QListWidgetItem, QPushButton, QTabWidget, QSpinBox, QInputDialog,
+    QTableWidget, QTableWidgetItem
 )
 from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QColor
 from datetime import datetime
 
+from src.utils.scheduler import QUEUED, PAUSED
+from src.utils.throttle import get_limits
+
 class TransferItemWidget(QWidget):
+    pauseClicked = pyqtSignal()
+    cancelClicked = pyqtSignal()
+    limitClicked = pyqtSignal()
+
     def __init__(self, title, parent=None):
         super().__init__(parent)
         layout = QVBoxLayout()
@@ -19,6 +28,19 @@ class TransferItemWidget(QWidget):
         self.speed_label = QLabel("Waiting...")
         self.speed_label.setAlignment(Qt.AlignmentFlag.AlignRight)
         top_row.addWidget(self.speed_label)
+
+        self.limit_btn = QPushButton("Limit")
+        self.limit_btn.setFixedWidth(60)
+        self.limit_btn.clicked.connect(self.limitClicked)
+        top_row.addWidget(self.limit_btn)
+        self.pause_btn = QPushButton("Pause")
+        self.pause_btn.setFixedWidth(60)
+        self.pause_btn.clicked.connect(self.pauseClicked)
+        top_row.addWidget(self.pause_btn)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setFixedWidth(60)
+        self.cancel_btn.clicked.connect(self.cancelClicked)
+        top_row.addWidget(self.cancel_btn)
         layout.addLayout(top_row)
         
         self.progress_bar = QProgressBar()
@@ -38,6 +60,15 @@ class TransferItemWidget(QWidget):
             self.speed_label.setText(speed)
         if details:
             self.details_label.setText(details)
+
+    def set_state(self, state, position=None):
+        self.pause_btn.setText("Resume" if state == PAUSED else "Pause")
+        if state == PAUSED:
+            self.speed_label.setText("Paused")
+        elif state == QUEUED:
+            self.speed_label.setText(f"Queued #{position}" if position else "Queued")
+        elif self.speed_label.text().startswith(("Queued", "Paused", "Waiting")):
+            self.speed_label.setText("Starting...")
             
 class HistoryItemWidget(QWidget):
     def __init__(self, title, timestamp, parent=None):
@@ -58,8 +89,9 @@ class HistoryItemWidget(QWidget):
 class TransferWindow(QWidget):
     transfers_finished = pyqtSignal()
 
-    def __init__(self):
+    def __init__(self, scheduler=None):
         super().__init__()
+        self.scheduler = scheduler
         self.setWindowTitle("File Transfers")
         self.resize(500, 400)
         
@@ -75,8 +107,26 @@ class TransferWindow(QWidget):
         layout.addWidget(self.tabs)
         
         btn_layout = QHBoxLayout()
+        if scheduler is not None:
+            self.cancel_all_btn = QPushButton("Cancel All")
+            self.cancel_all_btn.clicked.connect(scheduler.cancel_all)
+            btn_layout.addWidget(self.cancel_all_btn)
+            scheduler.queueChanged.connect(self.refresh_queue)
+
+            # Shared limits, applied to running transfers immediately; 0 means unlimited.
+            limits_layout = QHBoxLayout()
+            limits_layout.addWidget(QLabel("Limit all (KB/s):"))
+            self.global_limit_spin = self._limit_spin()
+            self.global_limit_spin.valueChanged.connect(lambda kb: get_limits().set_global_rate(kb * 1024))
+            limits_layout.addWidget(self.global_limit_spin)
+            limits_layout.addWidget(QLabel("Per device (KB/s):"))
+            self.device_limit_spin = self._limit_spin()
+            self.device_limit_spin.valueChanged.connect(lambda kb: get_limits().set_device_rate(kb * 1024))
+            limits_layout.addWidget(self.device_limit_spin)
+            layout.addLayout(limits_layout)
+            self.refresh_limits()
         self.clear_history_btn = QPushButton("Clear History")
-        self.clear_history_btn.clicked.connect(self.history_list.clear)
+        self.clear_history_btn.clicked.connect(self.clear_history)
         btn_layout.addWidget(self.clear_history_btn)
         
         self.hide_btn = QPushButton("Hide")
@@ -87,6 +137,7 @@ class TransferWindow(QWidget):
         self.setLayout(layout)
         
         self.transfers = {} # id -> (item, widget) in active list
+        self.matrices = {} # id -> (table, {serial: row}, {file name: column}) for fan-out transfers
         self.active_count = 0
 
     def add_transfer(self, transfer_id, title):
@@ -99,6 +150,14 @@ class TransferWindow(QWidget):
         
         self.active_list.addItem(item)
         self.active_list.setItemWidget(item, widget)
+        if self.scheduler is not None:
+            widget.pauseClicked.connect(lambda tid=transfer_id: self.toggle_pause(tid))
+            widget.cancelClicked.connect(lambda tid=transfer_id: self.scheduler.cancel(tid))
+            widget.limitClicked.connect(lambda tid=transfer_id: self.edit_limit(tid))
+        else:
+            widget.limit_btn.hide()
+            widget.pause_btn.hide()
+            widget.cancel_btn.hide()
         
         self.transfers[transfer_id] = (item, widget)
         self.active_count += 1
@@ -106,19 +165,92 @@ class TransferWindow(QWidget):
         self.show()
         self.raise_()
 
+    MATRIX_COLORS = {"done": "#16a34a", "failed": "#dc2626"}
+
+    def add_matrix(self, transfer_id, title, serials, names):
+        """Result tab of a fan-out transfer: one row per device, one column per file."""
+        table = QTableWidget(len(serials), len(names))
+        table.setVerticalHeaderLabels(serials)
+        table.setHorizontalHeaderLabels(names)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for row in range(len(serials)):
+            for column in range(len(names)):
+                table.setItem(row, column, QTableWidgetItem("Waiting"))
+        table.resizeColumnsToContents()
+        self.matrices[transfer_id] = (table, {s: i for i, s in enumerate(serials)}, {n: i for i, n in enumerate(names)})
+        self.tabs.addTab(table, title)
+
+    def update_matrix(self, transfer_id, serial, name, text, state):
+        """An empty name applies to every file of the device (e.g. the source could not be read)."""
+        if transfer_id not in self.matrices:
+            return
+        table, rows, columns = self.matrices[transfer_id]
+        if serial not in rows:
+            return
+        for column in ([columns[name]] if name in columns else columns.values() if not name else []):
+            cell = table.item(rows[serial], column)
+            cell.setText(text)
+            cell.setToolTip(text)
+            if state in self.MATRIX_COLORS:
+                cell.setForeground(QColor(self.MATRIX_COLORS[state]))
+
+    def clear_history(self):
+        self.history_list.clear()
+        for transfer_id in [tid for tid in self.matrices if tid not in self.transfers]:
+            table = self.matrices.pop(transfer_id)[0]
+            self.tabs.removeTab(self.tabs.indexOf(table))
+            table.deleteLater()
+
+    def _limit_spin(self):
+        spin = QSpinBox()
+        spin.setRange(0, 10 * 1024 * 1024)
+        spin.setSingleStep(256)
+        spin.setSpecialValueText("Unlimited")
+        return spin
+
+    def refresh_limits(self):
+        """Shows the shared limits after they were changed elsewhere (Settings)."""
+        limits = get_limits()
+        for spin, rate in ((self.global_limit_spin, limits.global_rate), (self.device_limit_spin, limits.device_rate)):
+            spin.blockSignals(True)
+            spin.setValue(rate // 1024)
+            spin.blockSignals(False)
+
+    def edit_limit(self, transfer_id):
+        current = self.scheduler.rate_limit(transfer_id) // 1024
+        kb, ok = QInputDialog.getInt(self, "Speed Limit", "KB/s for this transfer (0 = unlimited):",
+                                     current, 0, 10 * 1024 * 1024)
+        if ok and transfer_id in self.transfers:
+            self.scheduler.set_rate_limit(transfer_id, kb * 1024)
+            self.transfers[transfer_id][1].details_label.setText(f"Limited to {kb} KB/s" if kb else "")
+
+    def toggle_pause(self, transfer_id):
+        if self.scheduler.state(transfer_id) == PAUSED:
+            self.scheduler.resume(transfer_id)
+        else:
+            self.scheduler.pause(transfer_id)
+
+    def refresh_queue(self):
+        """Shows each waiting transfer's place in the queue."""
+        positions = self.scheduler.positions()
+        for transfer_id, (item, widget) in self.transfers.items():
+            state = self.scheduler.state(transfer_id)
+            if state:
+                widget.set_state(state, positions.get(transfer_id))
+
     def update_progress(self, transfer_id, value, speed=""):
         if transfer_id in self.transfers:
             item, widget = self.transfers[transfer_id]
             # If we had bytes info we could pass it to details
             widget.set_progress(value, speed)
 
-    def mark_finished(self, transfer_id):
+    def mark_finished(self, transfer_id, status="Completed"):
         if transfer_id in self.transfers:
             item, widget = self.transfers[transfer_id]
-            widget.set_progress(100, "Completed")
+            widget.set_progress(100, status)
             
             # Move to history
-            title = widget.label.text()
+            title = widget.label.text() if status == "Completed" else f"{widget.label.text()} ({status})"
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             # Remove from active
@@ -134,10 +266,15 @@ class TransferWindow(QWidget):
             self.history_list.setItemWidget(h_item, h_widget)
             
             self.active_count -= 1
+            if transfer_id in self.matrices:
+                # Keep the window up so the per-device results can be read.
+                self.tabs.setCurrentWidget(self.matrices[transfer_id][0])
+                self.matrices[transfer_id][0].resizeColumnsToContents()
             if self.active_count <= 0:
                 self.active_count = 0
                 self.transfers_finished.emit()
-                self.hide()
+                if transfer_id not in self.matrices:
+                    self.hide()
 
     def closeEvent(self, event):
         self.hide()
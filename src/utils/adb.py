@@ -1,24 +1,20 @@
-import subprocess
-import logging
-
 class AdbManager:
     @staticmethod
-    def get_devices():
-        try:
-            output = subprocess.check_output(["adb", "devices"], universal_newlines=True, stderr=subprocess.PIPE)
-            lines = output.strip().splitlines()[1:]
-            devices = []
-            for line in lines:
-                if line.strip() and ("device" in line or "unauthorized" in line):
-                    parts = line.split()
-                    device_id = parts[0]
-                    # WiFi check logic can be added here if needed, but keeping it simple for now
-                    if ":" in device_id:
-                        device_id += " (WiFi)"
-                    devices.append(device_id)
-            return devices
-        except subprocess.CalledProcessError:
-            return []
+    def display_name(info):
+        """Device combo entry for a DeviceInfo; get_serial() turns it back into the serial."""
+        name = info.serial
+        if info.transport == "wifi":
+            name += " (WiFi)"
+        if info.state != "device":
+            name += f" ({info.state})"
+        return name
+
+    @staticmethod
+    def get_serial(device_id):
+        """Strips the display suffix from a device combo entry; None means 'any device'."""
+        if device_id and device_id != "No Device":
+            return device_id.split()[0]
+        return None
 
     @staticmethod
     def build_command(base_command, device_id=None):
@@ -0,0 +1,904 @@
+import os
+import socket
+import struct
+import select
+import shlex
+import stat
+import subprocess
+import threading
+import time
+import logging
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+from src.utils.metrics import get_metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+SYNC_DATA_MAX = 64 * 1024
+SHELL_PACKET_MAX = 32 * 1024  # stdin packet payload; well under the smallest shell v2 buffer of adbd
+
+# LIS2/STA2 records: error, dev, ino, mode, nlink, uid, gid, size, atime, mtime, ctime (+ namelen for dents)
+STAT_V2 = struct.Struct("<IQQIIIIQqqq")
+DENT_V2 = struct.Struct("<IQQIIIIQqqqI")
+
+ShellResult = namedtuple("ShellResult", ["exit_code", "stdout", "stderr"])
+
+# transport is "usb", "wifi" or "emulator"; model and transport_id are empty when the server does not report them.
+DeviceInfo = namedtuple("DeviceInfo", ["serial", "state", "transport", "model", "transport_id"])
+
+
+class FileEntry(namedtuple("FileEntry", ["name", "mode", "size", "mtime"])):
+    """A directory entry as reported by the sync service."""
+    __slots__ = ()
+
+    @property
+    def is_dir(self):
+        return stat.S_ISDIR(self.mode)
+
+    @property
+    def is_link(self):
+        return stat.S_ISLNK(self.mode)
+
+    @property
+    def type(self):
+        if stat.S_ISDIR(self.mode):
+            return "dir"
+        if stat.S_ISREG(self.mode):
+            return "file"
+        if stat.S_ISLNK(self.mode):
+            return "link"
+        return "other"
+
+    @property
+    def display_name(self):
+        # Same convention as `ls -p`: directories carry a trailing slash.
+        return self.name + "/" if self.is_dir else self.name
+
+
+class AdbError(Exception):
+    pass
+
+
+def quote_args(args):
+    """Joins an argument list into a single device shell command line."""
+    return " ".join(shlex.quote(str(arg)) for arg in args)
+
+
+def parse_devices_l(text):
+    """Parses `adb devices -l` style lines, which is also what host:track-devices-l sends, into DeviceInfo."""
+    devices = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or line.startswith("List of devices"):
+            continue
+        serial, state = parts[0], parts[1]
+        props = dict(part.split(":", 1) for part in parts[2:] if ":" in part)
+        if "usb" in props:
+            transport = "usb"
+        elif serial.startswith("emulator-"):
+            transport = "emulator"
+        elif ":" in serial or "._adb-tls-connect." in serial:
+            transport = "wifi"
+        else:
+            transport = "usb"
+        devices.append(DeviceInfo(serial, state, transport, props.get("model", "").replace("_", " "),
+                                  props.get("transport_id", "")))
+    return devices
+
+
+class AdbConnection:
+    """
+    A single TCP connection to the adb server speaking the smart-socket protocol.
+    Requests are sent as a 4 hex digit length followed by the service name and
+    answered with OKAY or FAIL.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def request(self, service):
+        payload = service.encode("utf-8")
+        self.sock.sendall(b"%04x" % len(payload) + payload)
+        self.read_status()
+
+    def read_status(self):
+        status = self.read_exactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.read_string())
+        raise AdbError(f"Unexpected adb server response: {status!r}")
+
+    def read_string(self):
+        length = int(self.read_exactly(4), 16)
+        return self.read_exactly(length).decode("utf-8", errors="replace")
+
+    def read_exactly(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:], size - received)
+            if not count:
+                raise AdbError("Connection closed by adb server")
+            received += count
+        return bytes(buffer)
+
+    def read_chunk(self, size=SYNC_DATA_MAX):
+        return self.sock.recv(size)
+
+    def read_all(self):
+        chunks = []
+        while True:
+            chunk = self.sock.recv(SYNC_DATA_MAX)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def is_alive(self):
+        # An idle connection should have nothing to read; readable means EOF or garbage.
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        # shutdown() first so a recv blocked in another thread returns instead of hanging on.
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SyncConnection:
+    """
+    A connection switched into the device's sync: service. Unlike shell/exec
+    streams it can serve any number of requests until QUIT, so it is pooled.
+    """
+
+    def __init__(self, conn, features=()):
+        self.conn = conn
+        self.stat_v2 = "stat_v2" in features
+        self.ls_v2 = "ls_v2" in features
+
+    def _send_request(self, cmd, path):
+        data = path.encode("utf-8")
+        self.conn.send(cmd + struct.pack("<I", len(data)) + data)
+
+    def _read_header(self):
+        header = self.conn.read_exactly(8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    def _raise_fail(self, length):
+        raise AdbError(self.conn.read_exactly(length).decode("utf-8", errors="replace"))
+
+    def stat(self, path, follow_links=True):
+        """Returns a FileEntry for path; its mode is 0 when the path does not exist."""
+        name = posix_basename(path)
+        if self.stat_v2:
+            cmd = b"STA2" if follow_links else b"LST2"
+            self._send_request(cmd, path)
+            reply = self.conn.read_exactly(4 + STAT_V2.size)
+            if reply[:4] != cmd:
+                raise AdbError(f"Unexpected sync response: {reply[:4]!r}")
+            error, _, _, mode, _, _, _, size, _, mtime, _ = STAT_V2.unpack_from(reply, 4)
+            if error:
+                return FileEntry(name, 0, 0, 0)
+            return FileEntry(name, mode, size, mtime)
+        self._send_request(b"STAT", path)
+        reply = self.conn.read_exactly(16)
+        if reply[:4] != b"STAT":
+            raise AdbError(f"Unexpected sync response: {reply[:4]!r}")
+        return FileEntry(name, *struct.unpack("<III", reply[4:]))
+
+    def list(self, path):
+        """
+        Streams FileEntry records for every entry of a device directory in a
+        single request (LIS2 when the device supports it, LIST otherwise).
+        """
+        if self.ls_v2:
+            self._send_request(b"LIS2", path)
+            header_size = 4 + DENT_V2.size
+        else:
+            self._send_request(b"LIST", path)
+            header_size = 20
+        while True:
+            header = self.conn.read_exactly(header_size)
+            if header[:4] == b"DONE":
+                return
+            if header[:4] == b"DNT2":
+                error, _, _, mode, _, _, _, size, _, mtime, _, namelen = DENT_V2.unpack_from(header, 4)
+            elif header[:4] == b"DENT":
+                mode, size, mtime, namelen = struct.unpack_from("<IIII", header, 4)
+                error = 0
+            else:
+                raise AdbError(f"Unexpected sync response: {header[:4]!r}")
+            name = self.conn.read_exactly(namelen).decode("utf-8", errors="replace")
+            if name not in (".", "..") and not error:
+                yield FileEntry(name, mode, size, mtime)
+
+    def pull(self, remote_path, fileobj, progress=None, total=0):
+        self._send_request(b"RECV", remote_path)
+        done = 0
+        while True:
+            cmd, length = self._read_header()
+            if cmd == b"DATA":
+                fileobj.write(self.conn.read_exactly(length))
+                done += length
+                if progress:
+                    progress(done, total)
+            elif cmd == b"DONE":
+                return done
+            elif cmd == b"FAIL":
+                self._raise_fail(length)
+            else:
+                raise AdbError(f"Unexpected sync response: {cmd!r}")
+
+    def push(self, fileobj, remote_path, mode, mtime, progress=None, total=0):
+        self._send_request(b"SEND", f"{remote_path},{mode}")
+        done = 0
+        while True:
+            data = fileobj.read(SYNC_DATA_MAX)
+            if not data:
+                break
+            self.conn.send(b"DATA" + struct.pack("<I", len(data)) + data)
+            done += len(data)
+            if progress:
+                progress(done, total)
+        self.conn.send(b"DONE" + struct.pack("<I", int(mtime)))
+        cmd, length = self._read_header()
+        if cmd == b"FAIL":
+            self._raise_fail(length)
+        if cmd != b"OKAY":
+            raise AdbError(f"Unexpected sync response: {cmd!r}")
+        return done
+
+    def quit(self):
+        try:
+            self.conn.send(b"QUIT" + struct.pack("<I", 0))
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class ShellSession:
+    """
+    A long-lived device shell that runs short commands one after another.
+    Each command is framed with a unique sentinel so stdout, stderr and the
+    exit code can be split back out of the shared stream. Commands run in a
+    subshell so `cd`/`exit` cannot leak into the next one.
+    """
+
+    def __init__(self, client, serial):
+        self.client = client
+        self.serial = serial
+        self.conn = None
+        self.v2 = False
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.close()
+        self.v2 = "shell_v2" in self.client.features(self.serial)
+        # Both services read commands from stdin without a pty, so nothing is echoed back.
+        service = "shell,v2,raw:" if self.v2 else "exec:sh"
+        self.conn = self.client.open_service(self.serial, service)
+        logging.debug(f"Shell session started for {self.serial or 'default device'}")
+
+    def run(self, command):
+        with self.lock:
+            if self.conn is None or not self.conn.is_alive():
+                self._start()
+            self.counter += 1
+            token = f"\x1eADB{os.getpid()}_{self.counter}"
+            try:
+                return self._run_v2(command, token) if self.v2 else self._run_v1(command, token)
+            except (AdbError, OSError):
+                # The shell died (device gone, killed by the command, ...); the next call restarts it.
+                self.close()
+                raise
+
+    def _run_v2(self, command, token):
+        script = f'( {command}\n) </dev/null; echo "{token}:$?"; echo "{token}" >&2\n'.encode("utf-8")
+        # Big batch scripts go out as several stdin packets, the same way ShellStream.write splits its data.
+        self.conn.send(b"".join(b"\x00" + struct.pack("<I", len(chunk)) + chunk
+                                for chunk in (script[start:start + SHELL_PACKET_MAX]
+                                              for start in range(0, len(script), SHELL_PACKET_MAX))))
+        out_marker = f"{token}:".encode("utf-8")
+        err_marker = f"{token}\n".encode("utf-8")
+        stdout, stderr = bytearray(), bytearray()
+        out_done = err_done = False
+        while not (out_done and err_done):
+            header = self.conn.read_exactly(5)
+            length = struct.unpack("<I", header[1:])[0]
+            data = self.conn.read_exactly(length) if length else b""
+            if header[0] == 1:
+                stdout += data
+                tail = stdout[-(len(out_marker) + 8):]
+                out_done = out_marker in tail and tail.endswith(b"\n")
+            elif header[0] == 2:
+                stderr += data
+                err_done = stderr.endswith(err_marker)
+            elif header[0] == 3:
+                raise AdbError("Shell session exited")
+        index = stdout.rfind(out_marker)
+        exit_code = int(stdout[index + len(out_marker):].strip() or -1)
+        return ShellResult(exit_code, bytes(stdout[:index]), bytes(stderr[:-len(err_marker)]))
+
+    def _run_v1(self, command, token):
+        # exec: only carries stdout, so stderr is folded into it.
+        script = f'( {command}\n) </dev/null 2>&1; echo "{token}:$?"\n'.encode("utf-8")
+        self.conn.send(script)
+        out_marker = f"{token}:".encode("utf-8")
+        stdout = bytearray()
+        while True:
+            data = self.conn.read_chunk()
+            if not data:
+                raise AdbError("Shell session exited")
+            stdout += data
+            index = stdout.rfind(out_marker)
+            if index != -1 and stdout.endswith(b"\n"):
+                break
+        exit_code = int(stdout[index + len(out_marker):].strip() or -1)
+        return ShellResult(exit_code, bytes(stdout[:index]), b"")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class ShellStream:
+    """
+    One shell v2 command with both directions streamed. write() feeds its
+    stdin and close_stdin() sends EOF, which exec: cannot do; read() returns
+    stdout as it arrives and b"" once the command has exited. stderr is
+    collected on the side and exit_code is set at the end.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.stderr = bytearray()
+        self.exit_code = None
+        self._buffer = b""
+
+    def write(self, data):
+        view = memoryview(data)
+        for start in range(0, len(view), SHELL_PACKET_MAX):
+            chunk = view[start:start + SHELL_PACKET_MAX]
+            self.conn.send(b"\x00" + struct.pack("<I", len(chunk)) + chunk)
+        return len(data)
+
+    def close_stdin(self):
+        self.conn.send(b"\x03" + struct.pack("<I", 0))
+
+    def read(self, size=-1):
+        while not self._buffer and self.exit_code is None:
+            self._read_packet()
+        if size is None or size < 0 or size >= len(self._buffer):
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def _read_packet(self):
+        try:
+            header = self.conn.read_exactly(5)
+        except AdbError:
+            self.exit_code = -1 if self.exit_code is None else self.exit_code
+            return
+        length = struct.unpack("<I", header[1:])[0]
+        data = self.conn.read_exactly(length) if length else b""
+        if header[0] == 1:
+            self._buffer += data
+        elif header[0] == 2:
+            self.stderr += data
+        elif header[0] == 3:
+            self.exit_code = data[0] if data else 0
+
+    def wait(self):
+        """Drops any unread stdout and returns the exit code."""
+        while self.exit_code is None:
+            self._read_packet()
+        self._buffer = b""
+        return self.exit_code
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AdbClient:
+    """
+    In-process adb client. Talks to the adb server directly instead of forking
+    an `adb` process for every operation. Sync connections are pooled per
+    device serial; shell/exec services consume their socket, so those open a
+    fresh (cheap, local) connection each time.
+    """
+
+    def __init__(self, host=None, port=None, pool_size=4, timeout=10):
+        self.host = host or DEFAULT_HOST
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool = {}  # serial -> [SyncConnection]
+        self._features = {}  # serial -> set of feature names
+        self._sessions = {}  # serial -> ShellSession
+        self._lock = threading.Lock()
+        self._server_started = False
+
+    # --- Connections ---
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except ConnectionRefusedError:
+            if self._server_started:
+                raise AdbError(f"adb server is not reachable on {self.host}:{self.port}")
+            self._start_server()
+            return self.connect()
+        except OSError as e:
+            raise AdbError(f"adb server is not reachable on {self.host}:{self.port}: {e}")
+        # Time to reach the local server; if this is slow the host, not the device, is the bottleneck.
+        get_metrics().observe("connect", None, time.perf_counter() - start)
+        # Only the connect is bounded; transfers and long shell commands may stay silent for a while.
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return AdbConnection(sock)
+
+    def _start_server(self):
+        self._server_started = True
+        logging.info("Starting adb server")
+        try:
+            subprocess.run(["adb", "-P", str(self.port), "start-server"], capture_output=True, timeout=30)
+        except (OSError, subprocess.SubprocessError) as e:
+            raise AdbError(f"Could not start adb server: {e}")
+
+    def transport(self, serial=None):
+        """Returns a connection already switched to the given device (or the only one)."""
+        conn = self.connect()
+        try:
+            conn.request(f"host:transport:{serial}" if serial else "host:transport-any")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def open_service(self, serial, service):
+        conn = self.transport(serial)
+        try:
+            conn.request(service)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    # --- Host services ---
+    def host_command(self, service):
+        with self.connect() as conn:
+            conn.request(service)
+            return conn.read_string()
+
+    def version(self):
+        return int(self.host_command("host:version"), 16)
+
+    def devices(self):
+        """Returns a list of (serial, state) tuples."""
+        devices = []
+        for line in self.host_command("host:devices").splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                devices.append((parts[0], parts[1]))
+        return devices
+
+    def track_devices(self):
+        """
+        Subscribes to host:track-devices-l. The server sends the full device
+        list right away and again after every change; read each one with
+        parse_devices_l(conn.read_string()). Caller must close the connection.
+        """
+        conn = self.connect()
+        try:
+            conn.request("host:track-devices-l")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def forget_device(self, serial):
+        """Drops pooled connections, the shell session and cached features of a device that went away."""
+        with self._lock:
+            idle = self._pool.pop(serial, [])
+            session = self._sessions.pop(serial, None)
+            self._features.pop(serial or "", None)
+        for sync in idle:
+            sync.conn.close()
+        if session is not None:
+            session.close()
+
+    def features(self, serial=None):
+        key = serial or ""
+        if key not in self._features:
+            service = f"host-serial:{serial}:features" if serial else "host:features"
+            try:
+                self._features[key] = set(self.host_command(service).split(","))
+            except AdbError:
+                self._features[key] = set()
+        return self._features[key]
+
+    # --- Device services ---
+    def shell(self, serial, command):
+        """
+        Runs a command in a device shell and returns a ShellResult.
+        Uses the shell v2 protocol when available to get separate stderr and the exit code.
+        """
+        if "shell_v2" in self.features(serial):
+            return self._shell_v2(serial, command)
+        return self._shell_v1(serial, command)
+
+    def _shell_v2(self, serial, command):
+        stdout, stderr = [], []
+        exit_code = None
+        with self.open_service(serial, f"shell,v2,raw:{command}") as conn:
+            while exit_code is None:
+                try:
+                    header = conn.read_exactly(5)
+                except AdbError:
+                    break
+                packet_id, length = header[0], struct.unpack("<I", header[1:])[0]
+                data = conn.read_exactly(length) if length else b""
+                if packet_id == 1:
+                    stdout.append(data)
+                elif packet_id == 2:
+                    stderr.append(data)
+                elif packet_id == 3:
+                    exit_code = data[0] if data else 0
+        return ShellResult(exit_code if exit_code is not None else -1, b"".join(stdout), b"".join(stderr))
+
+    def _shell_v1(self, serial, command):
+        # The legacy service merges the streams and drops the exit code, so append a marker to recover it.
+        marker = b"\x1fADBEXIT:"
+        with self.open_service(serial, f"shell:{command}; echo \"\x1fADBEXIT:$?\"") as conn:
+            output = conn.read_all().replace(b"\r\n", b"\n")
+        exit_code = -1
+        index = output.rfind(marker)
+        if index != -1:
+            try:
+                exit_code = int(output[index + len(marker):].strip())
+            except ValueError:
+                pass
+            output = output[:index]
+        return ShellResult(exit_code, output, b"")
+
+    def run_command(self, serial, command):
+        """Runs a short command on the device's persistent shell session."""
+        with self._lock:
+            session = self._sessions.get(serial)
+            if session is None:
+                session = self._sessions[serial] = ShellSession(self, serial)
+        return session.run(command)
+
+    def shell_stream(self, serial, command):
+        """Starts a command with streamed stdin/stdout (see ShellStream). Needs shell v2."""
+        if "shell_v2" not in self.features(serial):
+            raise AdbError("Device does not support the shell v2 protocol")
+        return ShellStream(self.open_service(serial, f"shell,v2,raw:{command}"))
+
+    def exec_out(self, serial, command):
+        """Opens a raw exec: stream (stdout only, binary-safe). Caller must close it."""
+        return self.open_service(serial, f"exec:{command}")
+
+    @contextmanager
+    def sync(self, serial=None):
+        """Borrows a pooled sync connection for the device; broken connections are discarded."""
+        session = None
+        with self._lock:
+            idle = self._pool.get(serial, [])
+            while idle and session is None:
+                candidate = idle.pop()
+                if candidate.conn.is_alive():
+                    session = candidate
+                else:
+                    candidate.conn.close()
+        if session is None:
+            session = SyncConnection(self.open_service(serial, "sync:"), self.features(serial))
+        try:
+            yield session
+        except BaseException:
+            session.conn.close()
+            raise
+        with self._lock:
+            idle = self._pool.setdefault(serial, [])
+            if len(idle) < self.pool_size:
+                idle.append(session)
+                session = None
+        if session is not None:
+            session.quit()
+
+    def close(self):
+        with self._lock:
+            pools, self._pool = self._pool, {}
+            sessions, self._sessions = self._sessions, {}
+        for idle in pools.values():
+            for session in idle:
+                session.quit()
+        for session in sessions.values():
+            session.close()
+
+    # --- Listing ---
+    def list_dir(self, serial, path):
+        """
+        Lists a device directory with full metadata in one sync round trip.
+        Symlinks are resolved so links to directories are browsable.
+        """
+        entries = [entry for batch in self.iter_dir(serial, path) for entry in batch]
+        entries.sort(key=lambda entry: entry.name)
+        return entries
+
+    def iter_dir(self, serial, path, batch_size=500, interval=0.05):
+        """
+        Yields a device directory listing in unsorted batches as it streams in:
+        a batch is handed out after batch_size entries or interval seconds,
+        whichever comes first. Closing the generator early abandons the listing.
+        """
+        base = path.rstrip('/')
+        with ExitStack() as stack:
+            sync = stack.enter_context(self.sync(serial))
+            # The listing occupies its connection until DONE, so symlinks are stat'ed on a second one.
+            stat_sync = None
+            batch, started, seen = [], 0.0, False
+            for entry in sync.list(path):
+                seen = True
+                if entry.is_link:
+                    if stat_sync is None:
+                        stat_sync = stack.enter_context(self.sync(serial))
+                    target = stat_sync.stat(f"{base}/{entry.name}")
+                    if target.mode:
+                        entry = target._replace(name=entry.name)
+                if not batch:
+                    started = time.monotonic()
+                batch.append(entry)
+                if len(batch) >= batch_size or time.monotonic() - started >= interval:
+                    yield batch
+                    batch = []
+            if not seen and not sync.stat(path).is_dir:
+                # LIST answers an empty DONE for missing paths, so tell that apart from an empty directory.
+                raise AdbError(f"{path}: No such directory")
+            if batch:
+                yield batch
+
+    def stat(self, serial, path):
+        with self.sync(serial) as sync:
+            return sync.stat(path)
+
+    # --- File transfer ---
+    def pull(self, serial, remote_path, local_path, progress=None):
+        """
+        Pulls a file or directory like `adb pull`. If local_path is an existing
+        directory the item is placed inside it.
+        progress is called with (bytes_done, bytes_total) for the whole transfer.
+        """
+        files = self.plan_pull(serial, remote_path, local_path)
+        total = sum(item[2] for item in files)
+        with self.sync(serial) as sync:
+            base = 0
+            for remote, local, file_size, file_mtime in files:
+                reporter = None
+                if progress:
+                    reporter = lambda done, _total, base=base: progress(base + done, total)
+                self._pull_one(sync, remote, local, file_mtime, reporter)
+                base += file_size
+        return total
+
+    def walk(self, serial, remote_path, skipped=None):
+        """
+        Lists every file under remote_path as (remote, relative_path, size, mtime).
+        relative_path starts with the basename of remote_path and uses '/' separators.
+        Symlinks to files count as files; links to folders are not followed and,
+        like dangling links, are appended to skipped as relative paths.
+        """
+        with self.sync(serial) as sync:
+            entry = sync.stat(remote_path)
+            if entry.mode == 0:
+                raise AdbError(f"remote object '{remote_path}' does not exist")
+            name = posix_basename(remote_path)
+            if entry.is_dir:
+                return list(self._walk_remote(sync, remote_path, name, skipped))
+            return [(remote_path, name, entry.size, entry.mtime)]
+
+    def plan_pull(self, serial, remote_path, local_path):
+        """Expands a pull into (remote, local, size, mtime) per file and creates the local folders."""
+        with self.sync(serial) as sync:
+            entry = sync.stat(remote_path)
+            if entry.mode == 0:
+                raise AdbError(f"remote object '{remote_path}' does not exist")
+            if os.path.isdir(local_path):
+                local_path = os.path.join(local_path, posix_basename(remote_path))
+            if not entry.is_dir:
+                return [(remote_path, local_path, entry.size, entry.mtime)]
+            files = list(self._walk_remote(sync, remote_path, ""))
+        os.makedirs(local_path, exist_ok=True)
+        return [(remote, os.path.join(local_path, *rel.split("/")), size, mtime) for remote, rel, size, mtime in files]
+
+    def pull_file(self, serial, remote_path, local_path, mtime=None, progress=None):
+        """Pulls a single planned file on its own pooled sync connection."""
+        with self.sync(serial) as sync:
+            return self._pull_one(sync, remote_path, local_path, mtime, progress)
+
+    def pull_to(self, serial, remote_path, fileobj, progress=None):
+        """Streams a device file into any writable object without touching the disk."""
+        with self.sync(serial) as sync:
+            return sync.pull(remote_path, fileobj, progress)
+
+    def pull_range(self, serial, remote_path, fileobj, offset=0, progress=None, total=0):
+        """
+        Streams a device file from a byte offset on; sync RECV always starts at
+        zero, so this reads through an exec: stream instead. progress gets
+        (offset + bytes_done, total). Returns the number of bytes written.
+        """
+        done = 0
+        with self.exec_out(serial, f"tail -c +{offset + 1} {quote_args([remote_path])} 2>/dev/null") as conn:
+            while True:
+                chunk = conn.read_chunk()
+                if not chunk:
+                    break
+                fileobj.write(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(offset + done, total)
+        return done
+
+    def _pull_one(self, sync, remote_path, local_path, mtime, progress):
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        with open(local_path, "wb") as f:
+            done = sync.pull(remote_path, f, progress)
+        if mtime:
+            try:
+                os.utime(local_path, (mtime, mtime))
+            except OSError:
+                pass
+        return done
+
+    def _walk_remote(self, sync, remote_dir, rel_dir, skipped=None):
+        for entry in list(sync.list(remote_dir)):
+            remote = f"{remote_dir.rstrip('/')}/{entry.name}"
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_link:
+                # The listing reports the link itself; the listing is drained, so stat the target on the same connection.
+                target = sync.stat(remote)
+                if target.type != "file":
+                    if skipped is not None:
+                        skipped.append(rel)
+                    continue
+                entry = target
+            if entry.is_dir:
+                yield from self._walk_remote(sync, remote, rel, skipped)
+            elif entry.type == "file":
+                yield remote, rel, entry.size, entry.mtime
+
+    def plan_push(self, serial, local_path, remote_path):
+        """Expands a push into (local, remote, size, mtime) per file, like plan_pull."""
+        with self.sync(serial) as sync:
+            if sync.stat(remote_path).is_dir:
+                remote_path = f"{remote_path.rstrip('/')}/{os.path.basename(local_path.rstrip(os.sep))}"
+        if os.path.isdir(local_path):
+            files = []
+            for root, _, names in os.walk(local_path):
+                rel_root = os.path.relpath(root, local_path).replace(os.sep, "/")
+                for name in names:
+                    rel = name if rel_root == "." else f"{rel_root}/{name}"
+                    files.append((os.path.join(root, name), f"{remote_path}/{rel}"))
+        else:
+            files = [(local_path, remote_path)]
+        planned = []
+        for local, remote in files:
+            st = os.stat(local)
+            planned.append((local, remote, st.st_size, int(st.st_mtime)))
+        return planned
+
+    def push(self, serial, local_path, remote_path, progress=None):
+        """
+        Pushes a file or directory like `adb push`. If remote_path is an existing
+        directory the item is placed inside it.
+        """
+        files = self.plan_push(serial, local_path, remote_path)
+        total = sum(item[2] for item in files)
+        with self.sync(serial) as sync:
+            base = 0
+            for local, remote, size, mtime in files:
+                reporter = None
+                if progress:
+                    reporter = lambda done, _total, base=base: progress(base + done, total)
+                with open(local, "rb") as f:
+                    sync.push(f, remote, stat.S_IFREG | (os.stat(local).st_mode & 0o777), mtime, reporter, total)
+                base += size
+            return total
+
+    def push_range(self, serial, fileobj, remote_path, offset, size, progress=None):
+        """
+        Cuts a device file back to offset and appends fileobj's bytes from there
+        up to size. sync SEND can only write (and on failure deletes) whole
+        files, so this goes through an exec: stream. Returns the device file's
+        size afterwards.
+        """
+        path = quote_args([remote_path])
+        directory = quote_args([remote_path.rsplit("/", 1)[0] or "/"])
+        command = (f"mkdir -p {directory} && truncate -s {offset} {path} && head -c {size - offset} >> {path}; "
+                   f"stat -c %s {path}")
+        fileobj.seek(offset)
+        done = offset
+        with self.exec_out(serial, command) as conn:
+            while done < size:
+                data = fileobj.read(min(SYNC_DATA_MAX, size - done))
+                if not data:
+                    break
+                conn.send(data)
+                done += len(data)
+                if progress:
+                    progress(done, size)
+            output = conn.read_all().decode("utf-8", errors="replace").strip()
+        try:
+            return int(output.split()[-1])
+        except (ValueError, IndexError):
+            raise AdbError(output or f"Writing {remote_path} failed")
+
+    def install(self, serial, apk_path, progress=None):
+        """Streams an APK to the package manager without staging it on the device."""
+        with open(apk_path, "rb") as f:
+            return self.install_stream(serial, f, os.path.getsize(apk_path), progress)
+
+    def install_stream(self, serial, fileobj, size, progress=None):
+        """Installs size bytes of APK read from fileobj, for callers that feed several devices from one read."""
+        with self.exec_out(serial, f"cmd package install -S {size}") as conn:
+            done = 0
+            while True:
+                data = fileobj.read(SYNC_DATA_MAX)
+                if not data:
+                    break
+                conn.send(data)
+                done += len(data)
+                if progress:
+                    progress(done, size)
+            output = conn.read_all().decode("utf-8", errors="replace")
+        if "Success" not in output:
+            raise AdbError(output.strip() or "Install failed")
+        return output
+
+
+def posix_basename(path):
+    return path.rstrip("/").rsplit("/", 1)[-1]
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide client shared by all workers."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = AdbClient()
+        return _default_client
@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+from src.utils.adb_client import AdbError, get_client, quote_args
+
+# Device-side command for each supported operation; operands are appended quoted.
+BATCH_COMMANDS = {
+    "rm": ["rm", "-rf"],
+    "mv": ["mv"],
+    "cp": ["cp", "-r"],
+    "mkdir": ["mkdir", "-p"],
+}
+
+BatchResult = namedtuple("BatchResult", ["operation", "exit_code", "output"])
+
+_BEGIN = "\x1eB"
+_END = "\x1eE"
+
+
+def compile_script(operations):
+    """
+    Turns [("rm", path), ("mv", src, dst), ...] into one shell script. Every
+    operation is bracketed by marker lines so its output and exit code can be
+    matched back to it.
+    """
+    lines = []
+    for index, operation in enumerate(operations):
+        op, *operands = operation
+        if op not in BATCH_COMMANDS:
+            raise ValueError(f"Unsupported batch operation: {op}")
+        command = quote_args(BATCH_COMMANDS[op] + list(operands))
+        lines.append(f'echo "{_BEGIN}{index}"; {command} 2>&1; echo "{_END}{index}:$?"')
+    return "\n".join(lines)
+
+
+def parse_results(output, operations):
+    results = []
+    current, captured = None, []
+    # Not splitlines(): it treats the \x1e marker byte as a line break too.
+    for line in output.split("\n"):
+        if line.startswith(_BEGIN):
+            current, captured = int(line[len(_BEGIN):]), []
+        elif _END in line and current is not None:
+            # Output without a trailing newline shares its last line with the end marker.
+            text, _, marker = line.partition(_END)
+            if text:
+                captured.append(text)
+            index, _, code = marker.partition(":")
+            results.append(BatchResult(operations[int(index)], int(code or -1), "\n".join(captured)))
+            current = None
+        elif current is not None:
+            captured.append(line)
+    if len(results) != len(operations):
+        raise AdbError(f"Batch stopped after {len(results)} of {len(operations)} operations")
+    return results
+
+
+def run_batch(serial, operations):
+    """Runs all operations in a single device round trip and returns a BatchResult per item."""
+    if not operations:
+        return []
+    result = get_client().run_command(serial, compile_script(operations))
+    return parse_results(result.stdout.decode("utf-8", errors="replace"), operations)
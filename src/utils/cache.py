@@ -0,0 +1,87 @@
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_path(path):
+    """Canonical form used for cache keys: no duplicate or trailing slashes."""
+    normalized = posixpath.normpath(path or "/")
+    return "/" + normalized.lstrip("/") if normalized.startswith("/") else normalized
+
+
+class ListingCache:
+    """
+    LRU cache of directory listings keyed by (device serial, path).
+    Entries younger than ttl are fresh; older ones are still returned so the
+    UI can show them immediately while it revalidates in the background.
+    A listing taken while the directory was invalidated is stale on arrival:
+    read generation() before listing and pass it to put(), which then drops
+    the listing if an invalidation happened in between.
+    """
+
+    def __init__(self, ttl=30, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (serial, path) -> (timestamp, entries)
+        self._generations = {}  # (serial, path) -> invalidations of that path
+        self._device_generations = {}  # serial -> recursive and whole-device invalidations
+        self._epoch = 0  # clear() calls
+        self._lock = threading.Lock()
+
+    def generation(self, serial, path):
+        key = (serial, normalize_path(path))
+        with self._lock:
+            return self._epoch, self._device_generations.get(serial, 0), self._generations.get(key, 0)
+
+    def get(self, serial, path):
+        """Returns (entries, is_fresh) or None when the directory is not cached."""
+        key = (serial, normalize_path(path))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            self._entries.move_to_end(key)
+            timestamp, entries = cached
+            return entries, time.monotonic() - timestamp < self.ttl
+
+    def put(self, serial, path, entries, generation=None):
+        key = (serial, normalize_path(path))
+        with self._lock:
+            if generation is not None and generation != (
+                    self._epoch, self._device_generations.get(serial, 0), self._generations.get(key, 0)):
+                return
+            self._entries[key] = (time.monotonic(), entries)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, serial, path, recursive=False):
+        path = normalize_path(path)
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            if recursive:
+                self._device_generations[serial] = self._device_generations.get(serial, 0) + 1
+            else:
+                self._generations[(serial, path)] = self._generations.get((serial, path), 0) + 1
+            for key in list(self._entries):
+                if key[0] != serial:
+                    continue
+                if key[1] == path or (recursive and key[1].startswith(prefix)):
+                    del self._entries[key]
+
+    def invalidate_device(self, serial):
+        with self._lock:
+            self._device_generations[serial] = self._device_generations.get(serial, 0) + 1
+            for key in [key for key in self._entries if key[0] == serial]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def __contains__(self, key):
+        serial, path = key
+        with self._lock:
+            return (serial, normalize_path(path)) in self._entries
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from src.utils.adb_client import get_client, quote_args
+from src.utils.file_index import DATA_DIR
+
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, "checksums.sqlite3")
+
+# Device tool per algorithm; toybox ships all three.
+ALGORITHMS = {"md5": "md5sum", "sha1": "sha1sum", "sha256": "sha256sum"}
+
+CHUNK_FILES = 64   # files per hashing process
+DEFAULT_JOBS = 4   # hashing processes running at once on the device
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checksums (
+    serial TEXT NOT NULL,
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (serial, path, algorithm)
+);
+"""
+
+
+class ChecksumCache:
+    """
+    Persistent digests keyed by (device, path, algorithm). A cached digest is
+    only returned while the file's size and mtime still match, so changed
+    files are hashed again and unchanged ones never are.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get_many(self, serial, algorithm, files):
+        """files is [(path, size, mtime)]; returns {path: digest} for the still valid entries."""
+        found = {}
+        db = self._db()
+        files = list(files)
+        for start in range(0, len(files), 500):
+            chunk = files[start:start + 500]
+            wanted = {path: (size, mtime) for path, size, mtime in chunk}
+            rows = db.execute(
+                "SELECT path, size, mtime, digest FROM checksums WHERE serial = ? AND algorithm = ? "
+                f"AND path IN ({','.join('?' * len(chunk))})",
+                [serial, algorithm] + [path for path, _, _ in chunk],
+            )
+            found.update((path, digest) for path, size, mtime, digest in rows if wanted.get(path) == (size, mtime))
+        return found
+
+    def put_many(self, serial, algorithm, rows):
+        """rows is [(path, size, mtime, digest)]."""
+        db = self._db()
+        db.executemany(
+            "INSERT OR REPLACE INTO checksums (serial, path, algorithm, size, mtime, digest) VALUES (?, ?, ?, ?, ?, ?)",
+            ((serial, path, algorithm, size, mtime, digest) for path, size, mtime, digest in rows),
+        )
+        db.commit()
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def build_script(paths, algorithm="md5", jobs=DEFAULT_JOBS):
+    """
+    One shell script that hashes every path: CHUNK_FILES files per process,
+    jobs processes at a time. Each process writes to its own temp file so
+    parallel output never interleaves mid-line.
+    """
+    tool = ALGORITHMS[algorithm]
+    lines = ['d="${TMPDIR:-/data/local/tmp}/.adb_sums.$$"', 'mkdir -p "$d"']
+    for number, start in enumerate(range(0, len(paths), CHUNK_FILES)):
+        lines.append(f'{tool} -- {quote_args(paths[start:start + CHUNK_FILES])} > "$d/{number}" 2>/dev/null &')
+        if (number + 1) % jobs == 0:
+            lines.append("wait")
+    lines += ["wait", 'cat "$d"/* 2>/dev/null', 'rm -rf "$d"']
+    return "\n".join(lines)
+
+
+def parse_output(output):
+    digests = {}
+    for line in output.splitlines():
+        digest, _, path = line.partition("  ")
+        if path:
+            digests[path] = digest
+    return digests
+
+
+def checksum_files(serial, files, algorithm="md5", cache=None, jobs=DEFAULT_JOBS):
+    """
+    Returns {path: digest} for [(path, size, mtime)] device files. Cached
+    digests are reused; all other files are hashed in a single shell round
+    trip. Files that could not be read are missing from the result.
+    """
+    files = list(files)
+    digests = cache.get_many(serial, algorithm, files) if cache else {}
+    missing = [item for item in files if item[0] not in digests]
+    if missing:
+        result = get_client().run_command(serial, build_script([path for path, _, _ in missing], algorithm, jobs))
+        hashed = parse_output(result.stdout.decode("utf-8", errors="replace"))
+        digests.update(hashed)
+        if cache:
+            cache.put_many(serial, algorithm, [(path, size, mtime, hashed[path])
+                                               for path, size, mtime in missing if path in hashed])
+    return digests
+
+
+def local_checksum(path, algorithm="md5"):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_duplicates(digests):
+    """Groups paths sharing a digest: [[path, ...], ...] for every digest seen more than once."""
+    groups = {}
+    for path, digest in digests.items():
+        groups.setdefault(digest, []).append(path)
+    return [sorted(paths) for paths in groups.values() if len(paths) > 1]
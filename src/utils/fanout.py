@@ -0,0 +1,86 @@
+import logging
+import os
+import queue
+import threading
+
+from src.utils.adb_client import SYNC_DATA_MAX, AdbError
+
+QUEUE_CHUNKS = 64        # chunks buffered per device, so one slow phone does not stall the rest immediately
+DEFAULT_CONCURRENCY = 8  # devices written to at once
+_CANCELLED = object()
+
+
+class _ChunkReader:
+    """File-like view of one device's copy of the broadcast; read() hands out the chunks in order."""
+
+    def __init__(self):
+        self.chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self.eof = False
+
+    def read(self, size=-1):
+        if self.eof:
+            return b""
+        chunk = self.chunks.get()
+        if chunk is _CANCELLED:
+            # Raising instead of returning EOF keeps a cancelled push from being finished as a short file.
+            raise AdbError("Transfer cancelled")
+        if chunk is None:
+            self.eof = True
+            return b""
+        return chunk
+
+
+def fan_out(local_path, serials, deliver, concurrency=DEFAULT_CONCURRENCY, cancelled=None):
+    """
+    Streams one host file to many devices. Up to concurrency devices are
+    served at once; for each such group the file is read a single time and
+    every chunk is handed to all of them. deliver(serial, fileobj, size) runs
+    on its own thread per device, reads the file from fileobj and returns a
+    result message or raises. Returns {serial: (ok, message)}.
+    """
+    size = os.path.getsize(local_path)
+    results = {}
+    for start in range(0, len(serials), max(1, concurrency)):
+        group = serials[start:start + max(1, concurrency)]
+        readers = {serial: _ChunkReader() for serial in group}
+
+        def run(serial):
+            try:
+                results[serial] = (True, deliver(serial, readers[serial], size) or "Done")
+            except Exception as e:
+                if not (cancelled and cancelled()):
+                    logging.error(f"Fan-out of {local_path} to {serial} failed: {e}")
+                results[serial] = (False, str(e))
+
+        threads = {serial: threading.Thread(target=run, args=(serial,), daemon=True) for serial in group}
+        for thread in threads.values():
+            thread.start()
+        live = set(group)
+        with open(local_path, "rb") as f:
+            while live:
+                if cancelled and cancelled():
+                    for serial in live:
+                        _offer(readers[serial], threads[serial], _CANCELLED)
+                    break
+                chunk = f.read(SYNC_DATA_MAX)
+                for serial in list(live):
+                    if not _offer(readers[serial], threads[serial], chunk or None):
+                        live.discard(serial)
+                if not chunk:
+                    break
+        for thread in threads.values():
+            thread.join()
+        if cancelled and cancelled():
+            break
+    return results
+
+
+def _offer(reader, thread, chunk):
+    """Queues a chunk for one device; False once that device's thread has given up."""
+    while True:
+        try:
+            reader.chunks.put(chunk, timeout=0.2)
+            return True
+        except queue.Full:
+            if not thread.is_alive():
+                return False
@@ -0,0 +1,244 @@
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+from src.utils.adb_client import AdbError, FileEntry, get_client
+from src.utils.cache import normalize_path
+
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".adb_file_browser")
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "index.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    mode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    UNIQUE (serial, path)
+);
+CREATE INDEX IF NOT EXISTS files_parent ON files (serial, parent);
+CREATE INDEX IF NOT EXISTS files_name ON files (serial, name);
+-- mtime each directory had when its children were last written, for incremental rescans
+CREATE TABLE IF NOT EXISTS dirs (
+    serial TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+    PRIMARY KEY (serial, path)
+);
+CREATE TABLE IF NOT EXISTS devices (
+    serial TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+"""
+
+# Trigram full-text index over names, kept in step with files by triggers.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    name, content='files', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+
+COMMIT_EVERY = 200  # directories per transaction while scanning
+
+
+def _subtree_bounds(path):
+    # Every descendant path sorts between "path/" and "path0" ('0' follows '/').
+    base = path.rstrip("/")
+    return base + "/", base + "0"
+
+
+class FileIndex:
+    """
+    Persistent per-device index of every file below a root directory, kept in
+    SQLite so searches stay instant and the last scan can still be browsed
+    while the device is disconnected.
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.has_fts = True
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        db = self._db()
+        db.executescript(SCHEMA)
+        try:
+            db.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5/trigram: substring search falls back to LIKE scans.
+            self.has_fts = False
+
+    def _db(self):
+        # sqlite3 connections are per thread; the scanner and the UI each get their own.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # --- Scanning ---
+    def update(self, serial, root="/sdcard", progress=None, cancelled=None):
+        """
+        Brings the index for serial up to date with the device. Directories
+        whose mtime is unchanged since the last scan are not listed again;
+        only their subdirectories are stat'ed. progress is called with the
+        number of directories visited after each commit. Returns the number of directories listed.
+        """
+        root = normalize_path(root)
+        db = self._db()
+        known = dict(db.execute("SELECT path, mtime FROM dirs WHERE serial = ?", (serial,)))
+        visited = listed = 0
+        with get_client().sync(serial) as sync:
+            target = sync.stat(root)
+            if not target.is_dir:
+                raise AdbError(f"{root}: No such directory")
+            stack = [(root, target.mtime)]
+            while stack:
+                if cancelled and cancelled():
+                    break
+                path, mtime = stack.pop()
+                if known.get(path) == mtime:
+                    for child in self._child_dirs(db, serial, path):
+                        child_stat = sync.stat(child)
+                        if child_stat.is_dir:
+                            stack.append((child, child_stat.mtime))
+                else:
+                    entries = list(sync.list(path))
+                    self._replace_children(db, serial, path, mtime, entries)
+                    base = path.rstrip("/")
+                    stack.extend((f"{base}/{entry.name}", entry.mtime) for entry in entries if entry.is_dir)
+                    listed += 1
+                visited += 1
+                if visited % COMMIT_EVERY == 0:
+                    db.commit()
+                    if progress:
+                        progress(visited)
+            else:
+                db.execute(
+                    "INSERT OR REPLACE INTO devices (serial, root, indexed_at) VALUES (?, ?, ?)",
+                    (serial, root, time.time()),
+                )
+        db.commit()
+        return listed
+
+    def _child_dirs(self, db, serial, path):
+        rows = db.execute("SELECT path, mode FROM files WHERE serial = ? AND parent = ?", (serial, path))
+        return [child for child, mode in rows if stat.S_ISDIR(mode)]
+
+    def _replace_children(self, db, serial, path, mtime, entries):
+        names = {entry.name for entry in entries}
+        base = path.rstrip("/")
+        for child, mode in db.execute(
+            "SELECT path, mode FROM files WHERE serial = ? AND parent = ?", (serial, path)
+        ).fetchall():
+            if stat.S_ISDIR(mode) and child[len(base) + 1:] not in names:
+                self._remove_subtree(db, serial, child)
+        db.execute("DELETE FROM files WHERE serial = ? AND parent = ?", (serial, path))
+        db.executemany(
+            "INSERT INTO files (serial, path, parent, name, mode, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((serial, f"{base}/{entry.name}", path, entry.name, entry.mode, entry.size, entry.mtime)
+             for entry in entries),
+        )
+        db.execute("INSERT OR REPLACE INTO dirs (serial, path, mtime) VALUES (?, ?, ?)", (serial, path, mtime))
+
+    def _remove_subtree(self, db, serial, path):
+        low, high = _subtree_bounds(path)
+        db.execute("DELETE FROM files WHERE serial = ? AND path >= ? AND path < ?", (serial, low, high))
+        db.execute("DELETE FROM dirs WHERE serial = ? AND (path = ? OR (path >= ? AND path < ?))",
+                   (serial, path, low, high))
+
+    def forget(self, serial):
+        db = self._db()
+        db.execute("DELETE FROM files WHERE serial = ?", (serial,))
+        db.execute("DELETE FROM dirs WHERE serial = ?", (serial,))
+        db.execute("DELETE FROM devices WHERE serial = ?", (serial,))
+        db.commit()
+
+    # --- Queries ---
+    def devices(self):
+        """(serial, root, indexed_at) for every indexed device, most recent first."""
+        return self._db().execute("SELECT serial, root, indexed_at FROM devices ORDER BY indexed_at DESC").fetchall()
+
+    def count(self, serial):
+        return self._db().execute("SELECT COUNT(*) FROM files WHERE serial = ?", (serial,)).fetchone()[0]
+
+    def paths(self, serial):
+        return [row[0] for row in self._db().execute("SELECT path FROM files WHERE serial = ?", (serial,))]
+
+    def lookup(self, serial, paths):
+        """Maps each of the given device paths that is indexed to its FileEntry (named by full path)."""
+        found = {}
+        paths = list(paths)
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            rows = self._db().execute(
+                f"SELECT path, mode, size, mtime FROM files WHERE serial = ? AND path IN ({','.join('?' * len(chunk))})",
+                [serial] + chunk,
+            )
+            found.update((row[0], FileEntry(*row)) for row in rows)
+        return found
+
+    def list_dir(self, serial, path):
+        """The indexed listing of path sorted by name, or None if it was never scanned."""
+        path = normalize_path(path)
+        db = self._db()
+        if db.execute("SELECT 1 FROM dirs WHERE serial = ? AND path = ?", (serial, path)).fetchone() is None:
+            return None
+        rows = db.execute(
+            "SELECT name, mode, size, mtime FROM files WHERE serial = ? AND parent = ? ORDER BY name COLLATE BINARY",
+            (serial, path),
+        )
+        return [FileEntry(*row) for row in rows]
+
+    def search(self, serial, text, prefix=False, limit=500):
+        """
+        Case-insensitive name search across the whole device. Returns
+        FileEntry records whose name is the full device path.
+        """
+        if not text:
+            return []
+        db = self._db()
+        columns = "files.path, files.mode, files.size, files.mtime"
+        if prefix:
+            # Range scan on the NOCASE name index.
+            rows = db.execute(
+                f"SELECT {columns} FROM files WHERE serial = ? AND name >= ? AND name < ? LIMIT ?",
+                (serial, text, text + "\uffff", limit),
+            )
+        elif self.has_fts and len(text) >= 3:
+            rows = db.execute(
+                # CROSS JOIN pins the trigram match as the outer loop; otherwise SQLite may walk
+                # every file of the device and probe the FTS table per row.
+                f"SELECT {columns} FROM files_fts CROSS JOIN files ON files.id = files_fts.rowid "
+                "WHERE files_fts MATCH ? AND files.serial = ? LIMIT ?",
+                ('"' + text.replace('"', '""') + '"', serial, limit),
+            )
+        else:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = db.execute(
+                f"SELECT {columns} FROM files WHERE serial = ? AND name LIKE ? ESCAPE '\\' LIMIT ?",
+                (serial, pattern, limit),
+            )
+        results = [FileEntry(*row) for row in rows]
+        results.sort(key=lambda entry: entry.name)
+        return results
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+from collections import namedtuple
+
+from src.utils.adb_client import AdbError, get_client, posix_basename
+from src.utils.checksums import checksum_files, local_checksum
+from src.utils.cache import normalize_path
+
+STATE_FILE = ".adb_sync.json"
+MTIME_SLACK = 2  # FAT/exFAT storage keeps mtimes in 2 second steps
+
+PULL, PUSH, DELETE_LOCAL, DELETE_REMOTE, TOUCH_LOCAL = "pull", "push", "delete local", "delete remote", "touch local"
+
+# size/mtime are the values the destination ends up with.
+SyncAction = namedtuple("SyncAction", ["op", "path", "size", "mtime"])
+
+
+class SyncPlan:
+    """The actions needed to bring a device folder and a local folder in line, computed before anything runs."""
+
+    def __init__(self, serial, remote_root, local_root, direction, actions, state, skipped=()):
+        self.serial = serial
+        self.remote_root = remote_root.rstrip("/") or "/"
+        self.local_root = local_root
+        self.direction = direction
+        self.actions = actions
+        self.state = state  # manifest both sides share once every action succeeded
+        self.skipped = list(skipped)  # device symlinks to folders (or nowhere), left alone on both sides
+
+    def remote_path(self, rel):
+        return f"{self.remote_root.rstrip('/')}/{rel}"
+
+    def local_path(self, rel):
+        return os.path.join(self.local_root, *rel.split("/"))
+
+    def count(self, op):
+        return sum(1 for action in self.actions if action.op == op)
+
+    def transfer_bytes(self):
+        return sum(action.size for action in self.actions if action.op in (PULL, PUSH))
+
+    def summary(self):
+        lines = [f"{self.remote_root} <-> {self.local_root} ({self.direction})"]
+        for op in (PULL, PUSH, DELETE_LOCAL, DELETE_REMOTE, TOUCH_LOCAL):
+            count = self.count(op)
+            if count:
+                lines.append(f"{op}: {count}")
+        if self.skipped:
+            lines.append(f"skipped links: {len(self.skipped)}")
+        if not self.actions:
+            lines.append("Everything is up to date.")
+        lines.append("")
+        lines.extend(f"{action.op:14s} {action.path}" for action in self.actions)
+        lines.extend(f"{'skip link':14s} {path}" for path in self.skipped)
+        return "\n".join(lines)
+
+
+# --- Manifests ---
+def local_manifest(root):
+    """rel path -> (size, mtime) for every regular file below root."""
+    manifest = {}
+    stack = [("", root)]
+    while stack:
+        rel_dir, directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((rel, entry.path))
+                elif entry.is_file() and rel != STATE_FILE:
+                    st = entry.stat()
+                    manifest[rel] = (st.st_size, int(st.st_mtime))
+    return manifest
+
+
+def remote_manifest(serial, remote_root, skipped=None):
+    """
+    rel path -> (size, mtime) for every file below a device folder, from one
+    sync walk. Symlinks to files count with their target's size and mtime;
+    links to folders are not followed and go into skipped.
+    """
+    client = get_client()
+    remote_root = remote_root.rstrip("/") or "/"
+    if not client.stat(serial, remote_root).is_dir:
+        return {}
+    # walk() puts the folder's own name in front of every path, except for / which has none.
+    prefix = "" if remote_root == "/" else posix_basename(remote_root) + "/"
+    links = []
+    manifest = {rel[len(prefix):]: (size, mtime) for _, rel, size, mtime in client.walk(serial, remote_root, links)}
+    if skipped is not None:
+        skipped.extend(rel[len(prefix):] for rel in links)
+    return manifest
+
+
+def outside(manifest, paths):
+    """manifest without the entries at or below any of paths."""
+    if not paths:
+        return manifest
+    prefixes = tuple(f"{path}/" for path in paths)
+    return {rel: value for rel, value in manifest.items() if rel not in paths and not rel.startswith(prefixes)}
+
+
+def load_state(local_root, serial, remote_root):
+    """Manifest recorded after the last two-way sync of this folder pair, or {}."""
+    try:
+        with open(os.path.join(local_root, STATE_FILE), "r", encoding="utf-8") as f:
+            pairs = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {rel: tuple(value) for rel, value in pairs.get(f"{serial}:{remote_root}", {}).items()}
+
+
+def prune_empty_dirs(root, path):
+    """Removes the now empty parent folders of a deleted file, stopping at root."""
+    root = os.path.abspath(root)
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory != root and directory.startswith(root + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+def save_state(local_root, serial, remote_root, state):
+    path = os.path.join(local_root, STATE_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            pairs = json.load(f)
+    except (OSError, ValueError):
+        pairs = {}
+    pairs[f"{serial}:{remote_root}"] = state
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(pairs, f)
+    os.replace(path + ".tmp", path)
+
+
+# --- Diff ---
+def same_file(a, b):
+    return a[0] == b[0] and abs(a[1] - b[1]) <= MTIME_SLACK
+
+
+def diff_manifests(remote, local, direction="pull", delete=False, base=None):
+    """
+    Returns (actions, state). direction is "pull" (device to computer),
+    "push" (computer to device) or "both". One-way syncs copy new and changed
+    files and, with delete, remove files missing on the source. Two-way syncs
+    use base, the manifest of the previous sync, to tell a deletion on one
+    side from a new file on the other; when both sides changed a file, the
+    newer one wins.
+    """
+    actions, state = [], {}
+    base = base or {}
+    for rel in sorted(set(remote) | set(local)):
+        r, l = remote.get(rel), local.get(rel)
+        if r and l and same_file(r, l):
+            state[rel] = l
+            continue
+        if direction == "pull":
+            if r:
+                actions.append(SyncAction(PULL, rel, *r))
+                state[rel] = r
+            elif delete:
+                actions.append(SyncAction(DELETE_LOCAL, rel, 0, 0))
+        elif direction == "push":
+            if l:
+                actions.append(SyncAction(PUSH, rel, *l))
+                state[rel] = l
+            elif delete:
+                actions.append(SyncAction(DELETE_REMOTE, rel, 0, 0))
+        elif r and l:
+            # Only one side moved away from the last sync: that side wins. Otherwise the newer file does.
+            if rel in base and same_file(base[rel], r):
+                pull = False
+            elif rel in base and same_file(base[rel], l):
+                pull = True
+            else:
+                pull = r[1] > l[1]
+            if pull:
+                actions.append(SyncAction(PULL, rel, *r))
+                state[rel] = r
+            else:
+                actions.append(SyncAction(PUSH, rel, *l))
+                state[rel] = l
+        elif r:
+            # Synced before and now gone locally: the local side deleted it.
+            if rel in base and same_file(base[rel], r) and delete:
+                actions.append(SyncAction(DELETE_REMOTE, rel, 0, 0))
+            else:
+                actions.append(SyncAction(PULL, rel, *r))
+                state[rel] = r
+        else:
+            if rel in base and same_file(base[rel], l) and delete:
+                actions.append(SyncAction(DELETE_LOCAL, rel, 0, 0))
+            else:
+                actions.append(SyncAction(PUSH, rel, *l))
+                state[rel] = l
+    return actions, state
+
+
+def drop_identical(plan, remote, local, cache=None):
+    """
+    Files whose size matches but whose mtime differs are compared by MD5;
+    identical ones are not transferred again. Pulls and two-way syncs fix
+    their local mtime instead; a push leaves the local side untouched.
+    """
+    suspects = [action for action in plan.actions
+                if action.op in (PULL, PUSH) and action.path in remote and action.path in local
+                and remote[action.path][0] == local[action.path][0]]
+    if not suspects:
+        return
+    digests = checksum_files(plan.serial, [(plan.remote_path(action.path), *remote[action.path]) for action in suspects],
+                             "md5", cache)
+    identical = {}
+    for action in suspects:
+        try:
+            if digests.get(plan.remote_path(action.path)) == local_checksum(plan.local_path(action.path), "md5"):
+                identical[action.path] = remote[action.path]
+        except OSError:
+            continue
+    if plan.direction == PUSH:
+        plan.actions = [action for action in plan.actions if action.path not in identical]
+    else:
+        plan.actions = [SyncAction(TOUCH_LOCAL, action.path, *identical[action.path]) if action.path in identical else action
+                        for action in plan.actions]
+    plan.state.update(identical)
+
+
+def plan_sync(serial, remote_root, local_root, direction="pull", delete=False, checksum=False, cache=None):
+    """Builds both manifests and diffs them into a SyncPlan; nothing is changed yet."""
+    remote_root = normalize_path(remote_root)
+    skipped = []
+    remote = remote_manifest(serial, remote_root, skipped)
+    os.makedirs(local_root, exist_ok=True)
+    # Whatever sits locally where the device has a skipped link is not compared, so it is neither pushed nor deleted.
+    local = outside(local_manifest(local_root), skipped)
+    base = outside(load_state(local_root, serial, remote_root), skipped) if direction == "both" else None
+    actions, state = diff_manifests(remote, local, direction, delete, base)
+    plan = SyncPlan(serial, remote_root, local_root, direction, actions, state, skipped)
+    if checksum:
+        try:
+            drop_identical(plan, remote, local, cache)
+        except AdbError as e:
+            logging.warning(f"Checksum comparison skipped: {e}")
+    return plan
@@ -0,0 +1,172 @@
+import heapq
+import re
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+SEPARATORS = frozenset("/_-. ")
+MAX_POSTINGS = 100000   # postings counted per query; rarer trigrams are counted first
+MAX_CANDIDATES = 3000   # trigram candidates scored per query
+SCAN_FACTOR = 10        # linear scans stop after limit * SCAN_FACTOR hits
+SEARCH_BUDGET = 0.015   # seconds after which a limited search stops scanning
+SCAN_CHUNK = 1 << 18    # characters scanned between deadline/cancellation checks
+_EMPTY = array("I")
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def score_match(query, text):
+    """
+    Scores a lower-cased text against a lower-cased query: substrings rank
+    above fzf-style subsequences, and both prefer early, word-start and
+    tight matches in short texts. Returns None when neither matches.
+    """
+    position = text.find(query)
+    if position >= 0:
+        score = 1000 - position - (len(text) - len(query))
+        if position == 0 or text[position - 1] in SEPARATORS:
+            score += 200
+        return score
+    positions = []
+    start = 0
+    for char in query:
+        start = text.find(char, start)
+        if start < 0:
+            return None
+        positions.append(start)
+        start += 1
+    gaps = positions[-1] - positions[0] + 1 - len(query)
+    boundaries = sum(1 for p in positions if p == 0 or text[p - 1] in SEPARATORS)
+    return 500 - 5 * gaps + 30 * boundaries - len(text)
+
+
+class FuzzyIndex:
+    """
+    In-memory ranked search over a list of items (file names or paths).
+    Trigram postings find candidates, including near misses one typo away,
+    without touching every item; short or pure subsequence queries fall
+    back to a time-boxed scan over one joined string.
+    key extracts the searchable text from an item, as with sorted().
+    """
+
+    def __init__(self, items=(), key=None):
+        self.key = key
+        self.items = []
+        self._texts = []
+        self._postings = defaultdict(lambda: array("I"))
+        self._blob = None
+        self.extend(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def extend(self, items):
+        postings = self._postings
+        for item in items:
+            index = len(self.items)
+            text = (self.key(item) if self.key else item).lower()
+            self.items.append(item)
+            self._texts.append(text)
+            for gram in trigrams(text):
+                postings[gram].append(index)
+        self._blob = None
+        self._joined()
+
+    def search(self, query, limit=100, cancelled=None):
+        """
+        Returns up to limit (item, score) pairs, best first. A limited search
+        stops scanning after SEARCH_BUDGET, so rare subsequence hits in huge
+        indexes may be missed; limit=None scans everything and returns every
+        match. cancelled is polled between scan chunks, and a cancelled search
+        returns an empty list.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        deadline = None if limit is None else time.monotonic() + SEARCH_BUDGET
+        scored = {}
+        grams = trigrams(query)
+        if grams:
+            self._score_candidates(query, grams, scored)
+        if limit is None or len(scored) < limit:
+            if not self._scan(query, scored, limit, cancelled, deadline):
+                return []
+        if limit is None:
+            best = sorted(scored.items(), key=itemgetter(1), reverse=True)
+        else:
+            best = heapq.nlargest(limit, scored.items(), key=itemgetter(1))
+        return [(self.items[index], score) for index, score in best]
+
+    def _score_candidates(self, query, grams, scored):
+        lists = sorted((self._postings.get(gram, _EMPTY) for gram in grams), key=len)
+        if len(lists[0]) > MAX_POSTINGS:
+            return
+        counts = Counter()
+        counted = used = 0
+        for postings in lists:
+            if counted + len(postings) > MAX_POSTINGS:
+                break
+            counts.update(postings)
+            counted += len(postings)
+            used += 1
+        # One typo changes at most three trigrams; common trigrams left uncounted are assumed present.
+        misses = 3 if len(grams) >= 4 else 0
+        need = max(1, len(grams) - misses - (len(lists) - used))
+        candidates = [index for index, count in counts.items() if count >= need]
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = heapq.nlargest(MAX_CANDIDATES, candidates, key=counts.__getitem__)
+        for index in candidates:
+            text = self._texts[index]
+            score = score_match(query, text)
+            if score is None:
+                score = 100 * counts[index] // len(grams) - abs(len(text) - len(query))
+            scored[index] = score
+
+    def _joined(self):
+        if self._blob is None:
+            # One newline-separated string so str.find and re can scan every text at C speed.
+            starts = array("I")
+            offset = 0
+            for text in self._texts:
+                starts.append(offset)
+                offset += len(text) + 1
+            self._blob = ("\n".join(text.replace("\n", " ") for text in self._texts), starts)
+        return self._blob
+
+    def _scan(self, query, scored, limit, cancelled, deadline):
+        """Adds substring, then subsequence, hits from a linear scan. Returns False if cancelled."""
+        blob, starts = self._joined()
+        cap = None if limit is None else limit * SCAN_FACTOR
+        position = blob.find(query)
+        while position >= 0 and (cap is None or len(scored) < cap):
+            index = bisect_right(starts, position) - 1
+            if index not in scored:
+                scored[index] = score_match(query, self._texts[index])
+            next_start = starts[index + 1] if index + 1 < len(starts) else len(blob)
+            position = blob.find(query, next_start)
+        if len(query) < 2:
+            return True
+        # "a[^b\n]*b[^c\n]*c": each gap stops at the next wanted char, so the match never backtracks.
+        pattern = re.compile(re.escape(query[0]) + "".join(
+            f"[^{re.escape(char)}\n]*{re.escape(char)}" for char in query[1:]))
+        chunk_start = 0
+        while chunk_start < len(blob):
+            if cap is not None and len(scored) >= cap:
+                break
+            if cancelled and cancelled():
+                return False
+            if deadline and time.monotonic() > deadline:
+                break
+            # Chunks end on a line boundary so no match is split between two of them.
+            chunk_end = blob.find("\n", chunk_start + SCAN_CHUNK)
+            chunk_end = len(blob) if chunk_end < 0 else chunk_end
+            for match in pattern.finditer(blob, chunk_start, chunk_end):
+                index = bisect_right(starts, match.start()) - 1
+                if index not in scored:
+                    scored[index] = score_match(query, self._texts[index])
+            chunk_start = chunk_end + 1
+        return True
@@ -1,7 +1,10 @@
+from functools import lru_cache
 from PyQt6.QtGui import QIcon, QPixmap, QPainter, QColor
 from PyQt6.QtCore import Qt
 
+@lru_cache(maxsize=None)
 def create_icon(icon_type):
+    # Painted once per type; QIcon is implicitly shared so every caller can reuse it.
     pixmap = QPixmap(32, 32)
     pixmap.fill(Qt.GlobalColor.transparent)
     painter = QPainter(pixmap)
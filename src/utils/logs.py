@@ -0,0 +1,160 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+LOG_FILE = "adb_file_browser.log"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+# "INFO" or "INFO,workers=DEBUG,adb_client=WARNING": a default level plus levels per source module.
+LEVELS_ENV = "ADB_FILE_BROWSER_LOG"
+PAGE_BYTES = 256 * 1024
+
+
+def parse_levels(text):
+    """Returns (default level, {module: level}) for a LEVELS_ENV style string."""
+    default = logging.DEBUG
+    modules = {}
+    for part in (text or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        module, _, name = part.rpartition("=")
+        level = logging.getLevelName(name.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log level: {name}")
+        if module:
+            modules[module] = level
+        else:
+            default = level
+    return default, modules
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Per-module levels. The code logs through the root logger, so modules are
+    told apart by the file a record comes from (record.module); a named
+    logger matches by its name as well.
+    """
+
+    def __init__(self, default, modules):
+        super().__init__()
+        self.default = default
+        self.modules = modules
+
+    def filter(self, record):
+        level = self.modules.get(record.module, self.modules.get(record.name, self.default))
+        return record.levelno >= level
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The code logs finished f-strings; only records with args or a traceback need formatting before
+        # they cross threads, everything else skips the copy and is formatted by the writer.
+        if record.args or record.exc_info:
+            return super().prepare(record)
+        return record
+
+
+def _stop(listener):
+    if listener._thread is not None:
+        listener.stop()
+
+
+def setup_logging(path=LOG_FILE, levels=None, max_bytes=MAX_BYTES, backups=BACKUP_COUNT):
+    """
+    Routes all logging through a queue to a rotating file written by a
+    background thread, so logging never waits on the disk. levels defaults
+    to the LEVELS_ENV environment variable. Returns the QueueListener; it is
+    stopped, flushing what is still queued, at exit.
+    """
+    default, modules = parse_levels(levels if levels is not None else os.environ.get(LEVELS_ENV, ""))
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                        encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    queue_handler = _QueueHandler(records)
+    # Filtering before the queue keeps dropped records from costing the writer anything.
+    queue_handler.addFilter(ModuleLevelFilter(default, modules))
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(min([default, *modules.values()]))
+
+    listener = logging.handlers.QueueListener(records, file_handler)
+    listener.start()
+    atexit.register(_stop, listener)
+    return listener
+
+
+class LogThrottle:
+    """
+    Logs at most one message per interval for chatty sources such as
+    progress lines; the number of skipped messages goes with the next one.
+    """
+
+    def __init__(self, interval=1.0, level=logging.DEBUG):
+        self.interval = interval
+        self.level = level
+        self.last = 0.0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        if not logging.getLogger().isEnabledFor(self.level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self.last < self.interval:
+                self.skipped += 1
+                return
+            self.last = now
+            skipped, self.skipped = self.skipped, 0
+        logging.log(self.level, f"{message} ({skipped} similar skipped)" if skipped else message)
+
+
+def log_files(path=LOG_FILE):
+    """The log and its rotated backups that exist, newest first."""
+    candidates = [path] + [f"{path}.{index}" for index in range(1, BACKUP_COUNT + 1)]
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+
+def read_page(path, end=None, size=PAGE_BYTES):
+    """
+    Reads at most size bytes of a log ending at byte offset end (default:
+    the end of the file), trimmed to whole lines. Returns (text, start, end)
+    so the caller can page further back from start or forward from end.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        end = file_size if end is None else min(end, file_size)
+        start = max(0, end - size)
+        f.seek(start)
+        data = f.read(end - start)
+    if start > 0:
+        # Drop the partial first line, unless the page is one huge line.
+        newline = data.find(b"\n")
+        if 0 <= newline < len(data) - 1:
+            start += newline + 1
+            data = data[newline + 1:]
+    return data.decode("utf-8", errors="replace"), start, end
+
+
+def read_from(path, start, size=PAGE_BYTES):
+    """Reads whole lines from byte offset start onwards, at most about size bytes. Returns (text, end)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(size)
+    # A line still being written is left for the next read, unless a single line fills the whole page.
+    newline = data.rfind(b"\n")
+    if newline >= 0:
+        data = data[:newline + 1]
+    elif len(data) < size:
+        data = b""
+    return data.decode("utf-8", errors="replace"), start + len(data)
@@ -0,0 +1,235 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds; everything slower lands in +Inf.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+RECENT_SAMPLES = 1024  # latencies kept per series for exact percentiles
+RATE_WINDOW = 5        # seconds live throughput is averaged over
+
+OK, ERROR, CANCELLED = "ok", "error", "cancelled"
+
+
+class _Series:
+    """Latency histogram and counters for one (operation, device) pair."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self.cancelled = 0
+        self.bytes = 0
+        self.transfer_seconds = 0.0  # time spent by the operations that moved bytes
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds, outcome, nbytes):
+        if outcome == CANCELLED:
+            # A cancel says nothing about how fast the operation was.
+            self.cancelled += 1
+            self.bytes += nbytes
+            return
+        self.count += 1
+        self.seconds += seconds
+        self.errors += outcome == ERROR
+        self.bytes += nbytes
+        if nbytes:
+            self.transfer_seconds += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        samples = sorted(self.recent)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def as_dict(self, operation, device):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(BUCKETS) + ["+Inf"], self.buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "operation": operation, "device": device, "count": self.count, "errors": self.errors,
+            "cancelled": self.cancelled, "seconds": self.seconds, "bytes": self.bytes,
+            "p50": self.percentile(0.5), "p95": self.percentile(0.95), "p99": self.percentile(0.99),
+            "throughput": self.bytes / self.transfer_seconds if self.transfer_seconds else None,
+            "buckets": buckets,
+        }
+
+
+class _Rate:
+    """Bytes per second over the last RATE_WINDOW seconds, kept in one-second slots."""
+
+    def __init__(self):
+        self.slots = deque()  # (second, bytes)
+
+    def add(self, nbytes, now):
+        second = int(now)
+        if self.slots and self.slots[-1][0] == second:
+            self.slots[-1] = (second, self.slots[-1][1] + nbytes)
+        else:
+            self.slots.append((second, nbytes))
+        self._prune(now)
+
+    def rate(self, now):
+        self._prune(now)
+        # The current second is still filling up, so the window ends at the last complete one.
+        second = int(now)
+        return sum(nbytes for slot, nbytes in self.slots if slot < second) / RATE_WINDOW
+
+    def _prune(self, now):
+        while self.slots and self.slots[0][0] < int(now) - RATE_WINDOW:
+            self.slots.popleft()
+
+
+class _Timing:
+    def __init__(self):
+        self.bytes = 0
+        self.outcome = OK
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of what the app spends its time on: a latency histogram
+    with error and byte counts per operation and device, live throughput per
+    device and a few gauges (queue depth, link speed). Device-bound
+    operations (listing, shell) show device round trips, live throughput and
+    the link speed gauge show the link, and connect and queue_wait show time
+    spent on the host before the device is even asked.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}  # (operation, device) -> _Series
+        self._rates = {}  # device -> _Rate
+        self._gauges = {}  # (name, device) -> value
+        self.started = time.time()
+
+    def observe(self, operation, serial, seconds, outcome=OK, nbytes=0):
+        with self._lock:
+            series = self._series.get((operation, serial or ""))
+            if series is None:
+                series = self._series[(operation, serial or "")] = _Series()
+            series.observe(seconds, outcome, nbytes)
+
+    @contextmanager
+    def timer(self, operation, serial=None, ignore=()):
+        """
+        Times the with block as one operation. An exception counts as an
+        error, except for the ignore types, which count as cancelled; the
+        block can also set outcome and bytes on the yielded timing itself.
+        """
+        timing = _Timing()
+        start = time.perf_counter()
+        try:
+            yield timing
+        except ignore:
+            timing.outcome = CANCELLED
+            raise
+        except BaseException:
+            timing.outcome = ERROR
+            raise
+        finally:
+            self.observe(operation, serial, time.perf_counter() - start, timing.outcome, timing.bytes)
+
+    def add_bytes(self, serial, nbytes):
+        """Feeds the live throughput of a device as data moves."""
+        now = time.monotonic()
+        with self._lock:
+            rate = self._rates.get(serial or "")
+            if rate is None:
+                rate = self._rates[serial or ""] = _Rate()
+            rate.add(nbytes, now)
+
+    def set_gauge(self, name, value, serial=None):
+        with self._lock:
+            self._gauges[(name, serial or "")] = value
+
+    def throughput(self):
+        """device -> bytes per second right now, for devices that moved data recently."""
+        now = time.monotonic()
+        with self._lock:
+            rates = {device: rate.rate(now) for device, rate in self._rates.items()}
+        return {device: rate for device, rate in rates.items() if rate}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._rates.clear()
+            self.started = time.time()
+
+    # --- Export ---
+    def snapshot(self):
+        throughput = self.throughput()
+        with self._lock:
+            operations = [series.as_dict(operation, device)
+                          for (operation, device), series in sorted(self._series.items())]
+            gauges = [{"name": name, "device": device, "value": value}
+                      for (name, device), value in sorted(self._gauges.items())]
+        return {
+            "started": self.started,
+            "uptime": time.time() - self.started,
+            "operations": operations,
+            "throughput": throughput,
+            "gauges": gauges,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("adb_operation_seconds", "histogram", "Duration of finished operations.")
+        for op in snapshot["operations"]:
+            labels = _labels(operation=op["operation"], device=op["device"])
+            for bound, count in op["buckets"].items():
+                lines.append(f"adb_operation_seconds_bucket{{{labels},le=\"{bound}\"}} {count}")
+            lines.append(f"adb_operation_seconds_sum{{{labels}}} {op['seconds']:.6f}")
+            lines.append(f"adb_operation_seconds_count{{{labels}}} {op['count']}")
+        for name, key, help_text in (("adb_operation_errors_total", "errors", "Operations that failed."),
+                                     ("adb_operation_cancelled_total", "cancelled", "Operations cancelled by the user."),
+                                     ("adb_bytes_total", "bytes", "Bytes moved by operations.")):
+            family(name, "counter", help_text)
+            for op in snapshot["operations"]:
+                lines.append(f"{name}{{{_labels(operation=op['operation'], device=op['device'])}}} {op[key]}")
+        family("adb_throughput_bytes_per_second", "gauge", f"Data moved per device over the last {RATE_WINDOW}s.")
+        for device, rate in sorted(snapshot["throughput"].items()):
+            lines.append(f"adb_throughput_bytes_per_second{{{_labels(device=device)}}} {rate:.1f}")
+        seen = set()
+        for gauge in snapshot["gauges"]:
+            name = f"adb_{gauge['name']}"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            labels = _labels(device=gauge["device"]) if gauge["device"] else ""
+            lines.append(f"{name}{{{labels}}} {gauge['value']}" if labels else f"{name} {gauge['value']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return ",".join(f"{key}=\"{escape(value)}\"" for key, value in labels.items())
+
+
+_default_metrics = MetricsRegistry()
+
+
+def get_metrics():
+    """Returns the process-wide registry every worker reports to."""
+    return _default_metrics
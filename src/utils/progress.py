@@ -0,0 +1,96 @@
+import os
+import re
+import time
+from collections import deque, namedtuple
+
+from src.utils.formatting import format_speed, format_eta
+
+# adb -p output: "[ 42%] /sdcard/x.mp4" while running, then
+# "/sdcard/x.mp4: 1 file pulled, 0 skipped. 35.2 MB/s (123456 bytes in 0.003s)"
+PERCENT_RE = re.compile(rb"\[\s*(\d+)%\]")
+SPEED_RE = re.compile(rb"(\d+(?:\.\d+)?\s*[KMG]?B/s)")
+BYTES_RE = re.compile(rb"\((\d+) bytes in")
+LINE_BREAK_RE = re.compile(rb"[\r\n]")
+
+ProgressLine = namedtuple("ProgressLine", ["text", "percent", "speed", "bytes"])
+
+
+class AdbProgressParser:
+    """
+    Incremental parser for adb's progress output. Takes raw bytes in whatever
+    chunks the pipe delivers and returns one ProgressLine per complete line;
+    adb redraws progress with '\r', so both '\r' and '\n' end a line.
+    """
+
+    def __init__(self):
+        self.pending = b""
+
+    def feed(self, data):
+        parts = LINE_BREAK_RE.split(self.pending + data)
+        self.pending = parts.pop()
+        return [self._parse(part) for part in parts if part.strip()]
+
+    def flush(self):
+        pending, self.pending = self.pending, b""
+        return [self._parse(pending)] if pending.strip() else []
+
+    def _parse(self, raw):
+        line = raw.strip()
+        percent = PERCENT_RE.search(line)
+        speed = SPEED_RE.search(line)
+        transferred = BYTES_RE.search(line)
+        return ProgressLine(
+            line.decode("utf-8", errors="replace"),
+            int(percent.group(1)) if percent else None,
+            speed.group(1).decode("ascii") if speed else "",
+            int(transferred.group(1)) if transferred else None,
+        )
+
+
+def read_progress(stream, parser=None, chunk_size=64 * 1024):
+    """Yields ProgressLine records from a binary pipe using buffered reads."""
+    parser = parser or AdbProgressParser()
+    fd = stream.fileno()
+    while True:
+        data = os.read(fd, chunk_size)
+        if not data:
+            break
+        yield from parser.feed(data)
+    yield from parser.flush()
+
+
+class TransferProgress:
+    """
+    Turns a running byte count into (percent, speed, eta) strings for the
+    progress_update signals, at most once per interval unless the percentage
+    changed. base is the part already done before this run (a resumed
+    transfer); it counts towards the percentage but not the speed. Speed is
+    measured over the last window seconds, so it follows a changed rate
+    limit instead of averaging over the whole transfer.
+    """
+
+    def __init__(self, total, interval=0.25, base=0, window=3.0):
+        self.total = total
+        self.base = base
+        self.interval = interval
+        self.window = window
+        self.start_time = time.time()
+        self.last_emit = 0.0
+        self.last_percent = -1
+        self.samples = deque([(self.start_time, base)])
+
+    def update(self, done, force=False):
+        """Returns (percent, speed, eta) when the UI should be refreshed, otherwise None."""
+        now = time.time()
+        percent = min(int(done * 100 / self.total), 100) if self.total else 100
+        if not force and percent == self.last_percent and now - self.last_emit < self.interval:
+            return None
+        self.last_emit, self.last_percent = now, percent
+        samples = self.samples
+        while len(samples) > 1 and now - samples[1][0] >= self.window:
+            samples.popleft()
+        since, done_then = samples[0]
+        rate = max(done - done_then, 0) / max(now - since, 1e-6)
+        samples.append((now, done))
+        eta = format_eta((self.total - done) / rate) if rate and self.total > done else ""
+        return percent, format_speed(rate), eta
@@ -0,0 +1,205 @@
+import itertools
+import logging
+import time
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from src.utils.adb import AdbManager
+from src.utils.metrics import get_metrics
+
+HIGH, NORMAL, LOW = 0, 1, 2
+
+QUEUED, RUNNING, PAUSED = "queued", "running", "paused"
+# How a transfer ended, as reported by transferFinished.
+COMPLETED, CANCELLED, FAILED = "completed", "cancelled", "failed"
+
+
+class _Transfer:
+    def __init__(self, transfer_id, worker, serials, priority, sequence):
+        self.id = transfer_id
+        self.worker = worker
+        self.serials = serials  # every device the transfer holds a slot on while running
+        self.priority = priority
+        self.sequence = sequence
+        self.state = QUEUED
+        self.started = False
+        self.cancelled = False
+        self.error = False
+        self.submitted = time.monotonic()
+
+
+class TransferScheduler(QObject):
+    """
+    Queue every upload, download, sync and install goes through. At most
+    max_active transfers run at once and at most per_device on one device;
+    a transfer serving several devices (a fan-out) takes a slot on each of
+    them and counts once against max_active. Waiting transfers start by
+    priority, then round robin across devices, then in the order they were
+    submitted.
+
+    Workers are TransferWorker threads: pausing one blocks its stream and
+    frees its slot, resuming it waits for a slot like a queued transfer.
+    """
+    queueChanged = pyqtSignal()
+    transferFinished = pyqtSignal(str, str)  # transfer id, COMPLETED/CANCELLED/FAILED
+
+    def __init__(self, max_active=3, per_device=2, parent=None):
+        super().__init__(parent)
+        self.max_active = max(1, max_active)
+        self.per_device = max(1, per_device)
+        self._transfers = {}
+        self._sequence = itertools.count()
+        self._turn = itertools.count()
+        self._served = {}  # serial -> turn of its last start, so the device served longest ago goes next
+
+    def submit(self, transfer_id, worker, device=None, priority=NORMAL):
+        """device is one device, a list of them for a fan-out, or None for the default device."""
+        devices = device if isinstance(device, (list, tuple)) else [device]
+        serials = tuple(sorted({AdbManager.get_serial(device) or "" for device in devices})) or ("",)
+        transfer = _Transfer(transfer_id, worker, serials, priority, next(self._sequence))
+        self._transfers[transfer_id] = transfer
+        worker.finished.connect(lambda: self._on_finished(transfer_id))
+        # Workers report errors under either spelling; a worker that reported one still ends with finished.
+        for name in ("error_occurred", "errorOccurred"):
+            signal = getattr(worker, name, None)
+            if signal is not None:
+                signal.connect(lambda *_: self._on_error(transfer_id))
+        self._dispatch()
+        return transfer_id
+
+    def set_limits(self, max_active, per_device):
+        self.max_active = max(1, max_active)
+        self.per_device = max(1, per_device)
+        self._dispatch()
+
+    # --- Control ---
+    def pause(self, transfer_id):
+        transfer = self._transfers.get(transfer_id)
+        if transfer is None or transfer.state == PAUSED or transfer.cancelled:
+            return
+        if transfer.state == RUNNING:
+            transfer.worker.pause()
+        transfer.state = PAUSED
+        self._dispatch()
+
+    def resume(self, transfer_id):
+        transfer = self._transfers.get(transfer_id)
+        if transfer is None or transfer.state != PAUSED:
+            return
+        # A started worker stays blocked until _dispatch hands it a slot again.
+        transfer.state = QUEUED
+        self._dispatch()
+
+    def cancel(self, transfer_id):
+        transfer = self._transfers.get(transfer_id)
+        if transfer is None or transfer.cancelled:
+            return
+        transfer.cancelled = True
+        if transfer.started:
+            # The worker unwinds and closes its stream; _on_finished cleans up.
+            transfer.state = RUNNING
+            transfer.worker.cancel()
+            self.queueChanged.emit()
+        else:
+            del self._transfers[transfer_id]
+            self.transferFinished.emit(transfer_id, CANCELLED)
+            self._dispatch()
+
+    def cancel_all(self):
+        for transfer_id in list(self._transfers):
+            self.cancel(transfer_id)
+
+    def set_rate_limit(self, transfer_id, rate):
+        """Bytes per second for one transfer, queued or running; 0 lifts the limit."""
+        transfer = self._transfers.get(transfer_id)
+        if transfer is not None:
+            transfer.worker.set_rate_limit(rate)
+
+    def rate_limit(self, transfer_id):
+        transfer = self._transfers.get(transfer_id)
+        return transfer.worker.bucket.rate if transfer else 0
+
+    # --- State ---
+    def state(self, transfer_id):
+        transfer = self._transfers.get(transfer_id)
+        return transfer.state if transfer else None
+
+    def positions(self):
+        """transfer id -> 1-based place in the start order, for every waiting transfer."""
+        return {transfer.id: position for position, transfer in enumerate(self._waiting_order(), 1)}
+
+    def active_count(self):
+        return sum(1 for transfer in self._transfers.values() if transfer.state == RUNNING)
+
+    def __len__(self):
+        return len(self._transfers)
+
+    # --- Internals ---
+    def _waiting_order(self):
+        """Waiting transfers in the order they would start if slots were free."""
+        by_priority = {}
+        for transfer in self._transfers.values():
+            if transfer.state == QUEUED:
+                by_priority.setdefault(transfer.priority, {}).setdefault(transfer.serials, []).append(transfer)
+        order = []
+        for priority in sorted(by_priority):
+            # A fan-out takes its turn after the most recently served of its devices.
+            devices = sorted(by_priority[priority].items(),
+                             key=lambda item: max(self._served.get(serial, -1) for serial in item[0]))
+            queues = [sorted(transfers, key=lambda t: t.sequence) for _, transfers in devices]
+            # One transfer per device per round keeps a big batch on one device from starving the others.
+            for round_items in itertools.zip_longest(*queues):
+                order.extend(transfer for transfer in round_items if transfer is not None)
+        return order
+
+    def _dispatch(self):
+        per_device = {}
+        active = 0
+        for transfer in self._transfers.values():
+            if transfer.state == RUNNING:
+                active += 1
+                for serial in transfer.serials:
+                    per_device[serial] = per_device.get(serial, 0) + 1
+        for transfer in self._waiting_order():
+            if active >= self.max_active:
+                break
+            if any(per_device.get(serial, 0) >= self.per_device for serial in transfer.serials):
+                continue
+            if transfer.started:
+                transfer.worker.resume()
+            else:
+                transfer.started = True
+                waited = time.monotonic() - transfer.submitted
+                for serial in transfer.serials:
+                    get_metrics().observe("queue_wait", serial, waited)
+                transfer.worker.start()
+            transfer.state = RUNNING
+            turn = next(self._turn)
+            for serial in transfer.serials:
+                self._served[serial] = turn
+                per_device[serial] = per_device.get(serial, 0) + 1
+            active += 1
+        metrics = get_metrics()
+        for state in (QUEUED, RUNNING, PAUSED):
+            metrics.set_gauge(f"transfers_{state}", sum(1 for transfer in self._transfers.values() if transfer.state == state))
+        self.queueChanged.emit()
+
+    def _on_error(self, transfer_id):
+        transfer = self._transfers.get(transfer_id)
+        if transfer is not None:
+            transfer.error = True
+
+    def _on_finished(self, transfer_id):
+        transfer = self._transfers.pop(transfer_id, None)
+        if transfer is None:
+            return
+        # Workers that carry on past single files count them in failed instead of giving up with an error.
+        if transfer.cancelled:
+            outcome = CANCELLED
+        elif transfer.error or getattr(transfer.worker, "failed", 0):
+            outcome = FAILED
+        else:
+            outcome = COMPLETED
+        logging.debug(f"Transfer {transfer_id} {outcome}, {len(self._transfers)} left")
+        self.transferFinished.emit(transfer_id, outcome)
+        self._dispatch()
@@ -0,0 +1,227 @@
+import gzip
+import logging
+import os
+import posixpath
+import tarfile
+import threading
+import time
+import uuid
+
+from src.utils.adb_client import SYNC_DATA_MAX, AdbError, get_client, quote_args
+from src.utils.metrics import get_metrics
+from src.utils.transfer_journal import PART_SUFFIX
+
+TAR_MIN_FILES = 16              # below this the per-file requests are not worth avoiding
+TAR_MAX_AVERAGE = 256 * 1024    # average file size under which one tar stream beats per-file sync
+TAR_MAX_FILE = 8 * 1024 * 1024  # larger files stay out of the archive so they can be resumed
+COMPRESS_BELOW = 8 * 1024 * 1024  # links slower than this (bytes/s) are worth gzip's CPU time
+PROBE_BYTES = 2 * 1024 * 1024
+LINK_SPEED_TTL = 600
+
+_link_speeds = {}  # serial -> (bytes per second, measured at)
+_link_lock = threading.Lock()
+
+
+def link_speed(serial):
+    """Raw device-to-host throughput in bytes/s, measured once and then cached for LINK_SPEED_TTL."""
+    with _link_lock:
+        cached = _link_speeds.get(serial or "")
+    if cached and time.monotonic() - cached[1] < LINK_SPEED_TTL:
+        return cached[0]
+    start = time.monotonic()
+    received = 0
+    with get_client().exec_out(serial, f"head -c {PROBE_BYTES} /dev/zero") as conn:
+        while True:
+            chunk = conn.read_chunk()
+            if not chunk:
+                break
+            received += len(chunk)
+    speed = received / max(time.monotonic() - start, 1e-6)
+    logging.debug(f"Link to {serial or 'default device'}: {speed / 1024 / 1024:.1f} MB/s")
+    with _link_lock:
+        _link_speeds[serial or ""] = (speed, time.monotonic())
+    get_metrics().set_gauge("link_speed_bytes_per_second", round(speed), serial)
+    return speed
+
+
+def should_compress(serial):
+    try:
+        return link_speed(serial) < COMPRESS_BELOW
+    except (AdbError, OSError):
+        return False
+
+
+def select_bulk(serial, items, sizes):
+    """
+    The items worth sending as one tar stream instead of one sync request
+    each: all of them below TAR_MAX_FILE when there are enough and they are
+    small on average, otherwise none. Bigger files keep their own resumable
+    transfer. sizes runs parallel to items.
+    """
+    small = [(item, size) for item, size in zip(items, sizes) if size < TAR_MAX_FILE]
+    if len(small) < TAR_MIN_FILES or sum(size for _, size in small) / len(small) >= TAR_MAX_AVERAGE:
+        return []
+    if "shell_v2" not in get_client().features(serial):
+        return []
+    return [item for item, _ in small]
+
+
+def _split_root(paths):
+    """Common parent folder of device paths and each path relative to it."""
+    root = posixpath.commonpath([posixpath.dirname(path) for path in paths]) or "/"
+    prefix = root.rstrip("/") + "/"
+    return root, [path[len(prefix):] for path in paths]
+
+
+def pull_tar(serial, files, progress=None, total=0, compress=None):
+    """
+    Pulls many device files through a single `tar c` stream that is unpacked
+    as it arrives. files is [(remote, local)]. Each file is written to
+    local + PART_SUFFIX and only replaces local once it is complete. Returns
+    the remote paths that were written; anything missing from the archive is
+    left to the caller.
+    compress=None gzips the stream when the link is slow.
+    progress gets (bytes_done, total).
+    """
+    if compress is None:
+        compress = should_compress(serial)
+    # tar -T reads one name per line, so names containing a newline go the per-file way.
+    files = [(remote, local) for remote, local in files if "\n" not in remote]
+    if not files:
+        return []
+    root, names = _split_root([remote for remote, _ in files])
+    targets = dict(zip(names, files))
+    listing = "".join(f"./{name}\n" for name in names).encode("utf-8")
+    command = f"tar -c{'z' if compress else ''}f - -C {quote_args([root])} -T -"
+
+    received = []
+    done = 0
+    with get_client().shell_stream(serial, command) as stream:
+        # The name list goes in from its own thread so a large list cannot deadlock against tar's output.
+        def feed():
+            try:
+                stream.write(listing)
+                stream.close_stdin()
+            except (AdbError, OSError):
+                pass
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        source = gzip.GzipFile(fileobj=stream, mode="rb") if compress else stream
+        try:
+            with tarfile.open(fileobj=source, mode="r|") as archive:
+                for member in archive:
+                    name = member.name[2:] if member.name.startswith("./") else member.name
+                    if not member.isfile() or name not in targets:
+                        continue
+                    remote, local = targets[name]
+                    os.makedirs(os.path.dirname(local) or ".", exist_ok=True)
+                    data = archive.extractfile(member)
+                    part = local + PART_SUFFIX
+                    try:
+                        with open(part, "wb") as f:
+                            while True:
+                                chunk = data.read(SYNC_DATA_MAX)
+                                if not chunk:
+                                    break
+                                f.write(chunk)
+                                done += len(chunk)
+                                if progress:
+                                    progress(done, total)
+                        try:
+                            os.utime(part, (member.mtime, member.mtime))
+                        except OSError:
+                            pass
+                        os.replace(part, local)
+                    except BaseException:
+                        # An existing copy under the real name stays untouched; only the partial file goes.
+                        try:
+                            os.remove(part)
+                        except OSError:
+                            pass
+                        raise
+                    received.append(remote)
+        except (tarfile.TarError, EOFError, gzip.BadGzipFile) as e:
+            raise AdbError(f"Broken tar stream from {serial or 'device'}: {e}")
+        feeder.join()
+        exit_code = stream.wait()
+    if exit_code:
+        logging.warning(f"tar on {serial} exited with {exit_code}: "
+                        f"{stream.stderr.decode('utf-8', errors='replace').strip()}")
+    return received
+
+
+class _ProgressReader:
+    def __init__(self, f, on_read):
+        self.f = f
+        self.on_read = on_read
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.on_read(len(data))
+        return data
+
+
+def push_tar(serial, files, progress=None, total=0, compress=None):
+    """
+    Pushes many host files as one tar stream unpacked by `tar x` into a
+    staging folder on the device; the files are moved into place only after
+    tar succeeded, so an interrupted stream never leaves a truncated file
+    under a real name. files is [(local, remote)]; modification times come
+    along in the archive. Raises AdbError if the device side fails, in which
+    case any of the files may be missing. Returns the number of bytes sent.
+    """
+    if compress is None:
+        compress = should_compress(serial)
+    root, names = _split_root([remote for _, remote in files])
+    # Next to the targets, so the final moves are renames within one file system.
+    staging = posixpath.join(root, f".{uuid.uuid4().hex}{PART_SUFFIX}")
+    quoted = quote_args([staging])
+    command = f"mkdir -p {quoted} && tar -x{'z' if compress else ''}f - -C {quoted}"
+
+    done = [0]
+    def on_read(count):
+        done[0] += count
+        if progress and count:
+            progress(done[0], total)
+
+    sent = []
+    try:
+        with get_client().shell_stream(serial, command) as stream:
+            sink = gzip.GzipFile(fileobj=stream, mode="wb", compresslevel=1) if compress else stream
+            # GNU headers: long names without PAX records, which every device tar understands.
+            with tarfile.open(fileobj=sink, mode="w|", format=tarfile.GNU_FORMAT, encoding="utf-8") as archive:
+                for (local, _), name in zip(files, names):
+                    info = archive.gettarinfo(local, arcname=name)
+                    if not info.isfile():
+                        continue
+                    info.mtime = int(info.mtime)
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ""
+                    with open(local, "rb") as f:
+                        archive.addfile(info, _ProgressReader(f, on_read))
+                    sent.append(name)
+            if compress:
+                sink.close()
+            stream.close_stdin()
+            exit_code = stream.wait()
+        if exit_code:
+            raise AdbError(stream.stderr.decode("utf-8", errors="replace").strip() or f"tar exited with {exit_code}")
+        _move_staged(serial, staging, root, sent)
+    finally:
+        try:
+            get_client().run_command(serial, f"rm -rf {quoted}")
+        except (AdbError, OSError) as e:
+            logging.warning(f"Could not remove {staging} on {serial}: {e}")
+    return done[0]
+
+
+def _move_staged(serial, staging, root, names):
+    """Moves the unpacked names from staging to the same place under root."""
+    if not names:
+        return
+    folders = sorted({posixpath.dirname(posixpath.join(root, name)) for name in names})
+    steps = [f"mkdir -p {quote_args(folders)}"]
+    steps += [f"mv -f {quote_args([posixpath.join(staging, name), posixpath.join(root, name)])}" for name in names]
+    result = get_client().run_command(serial, " && ".join(steps))
+    if result.exit_code != 0:
+        raise AdbError(result.stderr.decode("utf-8", errors="replace").strip() or f"Moving files into {root} failed")
@@ -0,0 +1,88 @@
+import threading
+import time
+
+MIN_BURST = 64 * 1024  # one sync DATA chunk always fits
+MAX_SLEEP = 0.1        # rate changes and cancellation are noticed at least this often
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket in bytes per second; a rate of 0 means unlimited.
+    Tokens refill continuously up to a quarter second's worth. A chunk larger
+    than what is available is let through on credit and the debt is paid off
+    before the next one, so the long-run rate holds for any chunk size.
+    """
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.capacity = MIN_BURST
+        self.tokens = MIN_BURST
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(0, int(rate or 0))
+            self.capacity = max(self.rate // 4, MIN_BURST)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        else:
+            self.tokens = self.capacity
+        self.updated = now
+
+    def consume(self, amount, interrupted=None):
+        """Blocks until amount bytes may pass, the rate is lifted or interrupted() returns True."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if not self.rate or self.tokens > 0:
+                    self.tokens -= amount
+                    return
+                wait = -self.tokens / self.rate
+            if interrupted and interrupted():
+                return
+            time.sleep(min(wait + 0.001, MAX_SLEEP))
+
+
+class BandwidthLimits:
+    """The global bucket plus one bucket per device, shared by every running transfer."""
+
+    def __init__(self, global_rate=0, device_rate=0):
+        self._lock = threading.Lock()
+        self.global_bucket = TokenBucket(global_rate)
+        self.device_rate = device_rate
+        self._devices = {}
+
+    @property
+    def global_rate(self):
+        return self.global_bucket.rate
+
+    def set_global_rate(self, rate):
+        self.global_bucket.set_rate(rate)
+
+    def set_device_rate(self, rate):
+        with self._lock:
+            self.device_rate = max(0, int(rate or 0))
+            buckets = list(self._devices.values())
+        for bucket in buckets:
+            bucket.set_rate(self.device_rate)
+
+    def device(self, serial):
+        with self._lock:
+            bucket = self._devices.get(serial or "")
+            if bucket is None:
+                bucket = self._devices[serial or ""] = TokenBucket(self.device_rate)
+            return bucket
+
+
+_default_limits = BandwidthLimits()
+
+
+def get_limits():
+    """Returns the process-wide limits all transfer workers draw from."""
+    return _default_limits
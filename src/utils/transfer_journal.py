@@ -0,0 +1,273 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from src.utils.adb_client import AdbError, get_client, quote_args
+from src.utils.file_index import DATA_DIR
+
+DEFAULT_JOURNAL_PATH = os.path.join(DATA_DIR, "transfers.sqlite3")
+
+PART_SUFFIX = ".adbpart"
+CHECKPOINT_BYTES = 8 * 1024 * 1024  # partial data is flushed and its offset journaled this often
+VERIFY_BYTES = 64 * 1024             # bytes before the resume offset compared on both sides
+RANGED_PUSH_MIN = 16 * 1024 * 1024   # smaller pushes just start over after a disconnect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    title TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    job INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    offset INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job, source)
+);
+"""
+
+Job = namedtuple("Job", ["id", "serial", "direction", "title", "created", "files", "remaining_bytes"])
+JournalFile = namedtuple("JournalFile", ["source", "destination", "size", "mtime", "offset", "done"])
+
+
+class TransferJournal:
+    """
+    On-disk record of running transfers: every file of a job with the byte
+    offset that is known to be safely written at the destination. Offsets
+    are committed only after the data behind them was flushed, so a crash or
+    a dropped device never leaves the journal ahead of the partial file.
+    Jobs are removed once all of their files are done.
+    """
+
+    def __init__(self, db_path=DEFAULT_JOURNAL_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    def create_job(self, serial, direction, title, files):
+        """files is [(source, destination, size, mtime)]; returns the job id."""
+        db = self._db()
+        with db:
+            job = db.execute("INSERT INTO jobs (serial, direction, title, created) VALUES (?, ?, ?, ?)",
+                             (serial or "", direction, title, time.time())).lastrowid
+            db.executemany("INSERT OR IGNORE INTO files (job, source, destination, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                           ((job, source, destination, size, int(mtime)) for source, destination, size, mtime in files))
+        return job
+
+    def job(self, job):
+        for found in self.jobs(job):
+            return found
+        return None
+
+    def jobs(self, job=None):
+        """Unfinished jobs, oldest first."""
+        query = ("SELECT j.id, j.serial, j.direction, j.title, j.created, COUNT(f.source), "
+                 "COALESCE(SUM(f.size - f.offset), 0) FROM jobs j LEFT JOIN files f ON f.job = j.id AND NOT f.done")
+        if job is not None:
+            rows = self._db().execute(query + " WHERE j.id = ? GROUP BY j.id", (job,))
+        else:
+            rows = self._db().execute(query + " GROUP BY j.id ORDER BY j.created")
+        return [Job(*row) for row in rows]
+
+    def files(self, job, pending_only=True):
+        query = "SELECT source, destination, size, mtime, offset, done FROM files WHERE job = ?"
+        if pending_only:
+            query += " AND NOT done"
+        return [JournalFile(*row) for row in self._db().execute(query + " ORDER BY rowid", (job,))]
+
+    def checkpoint(self, job, source, offset):
+        db = self._db()
+        with db:
+            db.execute("UPDATE files SET offset = ? WHERE job = ? AND source = ?", (offset, job, source))
+
+    def restart(self, job, source, size, mtime):
+        """The source changed since the job was planned: start the file over with its new size."""
+        db = self._db()
+        with db:
+            db.execute("UPDATE files SET offset = 0, size = ?, mtime = ? WHERE job = ? AND source = ?",
+                       (size, int(mtime), job, source))
+
+    def complete(self, job, source):
+        db = self._db()
+        with db:
+            db.execute("UPDATE files SET done = 1, offset = size WHERE job = ? AND source = ?", (job, source))
+
+    def finish(self, job):
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM jobs WHERE id = ?", (job,))
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class _CheckpointWriter:
+    """File wrapper that flushes to disk and journals the offset every CHECKPOINT_BYTES."""
+
+    def __init__(self, f, journal, job, source):
+        self.f = f
+        self.journal = journal
+        self.job = job
+        self.source = source
+        self.position = self.saved = f.tell()
+
+    def write(self, data):
+        self.f.write(data)
+        self.position += len(data)
+        if self.position - self.saved >= CHECKPOINT_BYTES:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.journal.checkpoint(self.job, self.source, self.position)
+        self.saved = self.position
+
+
+def _window_matches(serial, remote_path, local_path, offset):
+    """Compares the VERIFY_BYTES before offset on the device and locally, so a resume never splices mismatched data."""
+    start = max(0, offset - VERIFY_BYTES)
+    with open(local_path, "rb") as f:
+        f.seek(start)
+        local = hashlib.md5(f.read(offset - start)).hexdigest()
+    result = get_client().run_command(
+        serial, f"tail -c +{start + 1} {quote_args([remote_path])} | head -c {offset - start} | md5sum")
+    return result.stdout.decode("utf-8", errors="replace").split()[:1] == [local]
+
+
+def pull_resumable(serial, journal, job, item, progress=None):
+    """
+    Pulls one journaled file into destination + PART_SUFFIX and renames it
+    when complete. A part left by an earlier attempt is continued from its
+    journaled offset when the device file is unchanged and the bytes before
+    that offset still match; otherwise the file starts over.
+    progress gets (bytes_done, size) including the resumed part.
+    """
+    client = get_client()
+    part = item.destination + PART_SUFFIX
+    entry = client.stat(serial, item.source)
+    if entry.mode == 0:
+        raise AdbError(f"remote object '{item.source}' does not exist")
+    offset = 0
+    if (entry.size, entry.mtime) != (item.size, item.mtime):
+        journal.restart(job, item.source, entry.size, entry.mtime)
+    elif item.offset and os.path.exists(part):
+        offset = min(item.offset, os.path.getsize(part), entry.size)
+        if offset and not _window_matches(serial, item.source, part, offset):
+            logging.info(f"Partial download of {item.source} does not match the device, starting over")
+            offset = 0
+    if offset:
+        logging.info(f"Resuming download of {item.source} at {offset} of {entry.size} bytes")
+
+    os.makedirs(os.path.dirname(part) or ".", exist_ok=True)
+    reporter = None
+    if progress:
+        reporter = lambda done, _total: progress(done, entry.size)
+    with open(part, "r+b" if offset else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        writer = _CheckpointWriter(f, journal, job, item.source)
+        if offset:
+            client.pull_range(serial, item.source, writer, offset, reporter, entry.size)
+        else:
+            with client.sync(serial) as sync:
+                sync.pull(item.source, writer, reporter)
+        f.flush()
+        os.fsync(f.fileno())
+        received = f.tell()
+    if received != entry.size:
+        journal.checkpoint(job, item.source, min(received, entry.size))
+        raise AdbError(f"{item.source}: received {received} of {entry.size} bytes")
+    os.replace(part, item.destination)
+    try:
+        os.utime(item.destination, (entry.mtime, entry.mtime))
+    except OSError:
+        pass
+    journal.complete(job, item.source)
+    return received
+
+
+def push_resumable(serial, journal, job, item, progress=None):
+    """
+    Pushes one journaled file. Large files are appended to destination +
+    PART_SUFFIX on the device and moved into place when complete, so a push
+    that was cut off continues from the bytes the device already has.
+    Small files go through a plain sync push.
+    """
+    client = get_client()
+    st = os.stat(item.source)
+    size, mtime = st.st_size, int(st.st_mtime)
+    if (size, mtime) != (item.size, item.mtime):
+        journal.restart(job, item.source, size, mtime)
+        item = item._replace(size=size, mtime=mtime, offset=0)
+    reporter = None
+    if progress:
+        reporter = lambda done, _total: progress(done, size)
+
+    if size < RANGED_PUSH_MIN:
+        with open(item.source, "rb") as f, client.sync(serial) as sync:
+            sync.push(f, item.destination, 0o100000 | (st.st_mode & 0o777), mtime, reporter, size)
+        journal.complete(job, item.source)
+        return size
+
+    part = item.destination + PART_SUFFIX
+    offset = min(client.stat(serial, part).size, size)
+    if offset and not _window_matches(serial, part, item.source, offset):
+        logging.info(f"Partial upload of {item.source} does not match, starting over")
+        offset = 0
+    if offset:
+        logging.info(f"Resuming upload of {item.source} at {offset} of {size} bytes")
+
+    # The device reports what it has when the stream ends; the journal only tracks how far the upload got.
+    saved = [offset]
+    def on_progress(done, total):
+        if done - saved[0] >= CHECKPOINT_BYTES:
+            journal.checkpoint(job, item.source, done)
+            saved[0] = done
+        if reporter:
+            reporter(done, total)
+    with open(item.source, "rb") as f:
+        written = client.push_range(serial, f, part, offset, size, on_progress)
+    if written != size:
+        raise AdbError(f"{item.destination}: device has {written} of {size} bytes")
+    result = client.run_command(serial, f"mv -f {quote_args([part, item.destination])} && "
+                                        f"(touch -m -d @{mtime} {quote_args([item.destination])} 2>/dev/null; true)")
+    if result.exit_code != 0:
+        raise AdbError(result.stderr.decode("utf-8", errors="replace").strip() or f"Finishing {item.destination} failed")
+    journal.complete(job, item.source)
+    return size
+
+
+def discard_job(journal, job):
+    """Drops a job and deletes the local partial files it left behind."""
+    record = journal.job(job)
+    if record and record.direction == "pull":
+        for item in journal.files(job):
+            try:
+                os.remove(item.destination + PART_SUFFIX)
+            except OSError:
+                pass
+    journal.finish(job)
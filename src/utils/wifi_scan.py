@@ -0,0 +1,249 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import struct
+import time
+from collections import namedtuple
+
+PROBE_TIMEOUT = 0.4       # seconds per connect and per handshake reply
+DEFAULT_CONCURRENCY = 512  # open probes at once; stays under the usual 1024 descriptor limit
+MDNS_SECONDS = 2.0        # how long to listen for announcements
+MDNS_ADDR = "224.0.0.251"
+MDNS_PORT = 5353
+ADB_SERVICES = ("_adb-tls-connect._tcp.local", "_adb._tcp.local")
+
+# source is "scan" or the mDNS service the device announced itself with.
+WifiDevice = namedtuple("WifiDevice", ["host", "port", "name", "source"])
+
+# CNXN from a host; adbd answers with CNXN, AUTH or (wireless debugging) STLS.
+_CNXN_DATA = b"host::\x00"
+_CNXN = struct.pack("<6I", 0x4E584E43, 0x01000001, 256 * 1024, len(_CNXN_DATA), sum(_CNXN_DATA),
+                    0x4E584E43 ^ 0xFFFFFFFF) + _CNXN_DATA
+_ADB_REPLIES = (b"CNXN", b"AUTH", b"STLS")
+
+
+def parse_hosts(text):
+    """'192.168.1.7', '192.168.1.0/24' or '192.168.1.10-40', comma separated, into a list of addresses."""
+    hosts = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "/" in part:
+            network = ipaddress.ip_network(part, strict=False)
+            hosts.extend(str(host) for host in (network.hosts() if network.num_addresses > 1 else [network.network_address]))
+        elif "-" in part:
+            first, last = part.split("-", 1)
+            start = ipaddress.ip_address(first)
+            end = ipaddress.ip_address(last) if "." in last else ipaddress.ip_address(first.rsplit(".", 1)[0] + "." + last)
+            hosts.extend(str(ipaddress.ip_address(value)) for value in range(int(start), int(end) + 1))
+        else:
+            hosts.append(str(ipaddress.ip_address(part)))
+    return hosts
+
+
+def parse_ports(text):
+    """'5555', '5555-5585' or a comma separated mix of both."""
+    ports = []
+    for part in text.replace(" ", "").split(","):
+        if "-" in part:
+            first, last = part.split("-", 1)
+            ports.extend(range(int(first), int(last) + 1))
+        elif part:
+            ports.append(int(part))
+    if any(not 0 < port < 65536 for port in ports):
+        raise ValueError("Ports must be between 1 and 65535")
+    return ports
+
+
+def local_network():
+    """The /24 around this machine's LAN address, or "" if there is none."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect(("10.255.255.255", 1))  # picks the outgoing interface, sends nothing
+        address = sock.getsockname()[0]
+    except OSError:
+        return ""
+    finally:
+        sock.close()
+    if address.startswith("127."):
+        return ""
+    return str(ipaddress.ip_network(f"{address}/24", strict=False))
+
+
+async def probe_adb(host, port, timeout=PROBE_TIMEOUT):
+    """True if an adb daemon answers a CNXN on host:port. Nothing is authenticated, so no prompt shows on the device."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(_CNXN)
+        return await asyncio.wait_for(reader.readexactly(4), timeout) in _ADB_REPLIES
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return False
+    finally:
+        writer.close()
+
+
+async def scan(hosts, ports, on_found, on_progress=None, concurrency=DEFAULT_CONCURRENCY,
+               timeout=PROBE_TIMEOUT, mdns_seconds=MDNS_SECONDS, cancelled=None):
+    """
+    Probes every host/port pair with at most concurrency connections in
+    flight while listening for adb mDNS announcements. on_found(WifiDevice)
+    is called for each device as soon as it turns up; on_progress gets
+    (probes_done, probes_total). Returns every device found.
+    """
+    found = {}
+    def report(device):
+        if (device.host, device.port) not in found:
+            found[(device.host, device.port)] = device
+            on_found(device)
+
+    targets = [(host, port) for host in hosts for port in ports]
+    position = iter(targets)
+    done = [0]
+    async def prober():
+        for host, port in position:
+            if cancelled and cancelled():
+                return
+            if await probe_adb(host, port, timeout):
+                report(WifiDevice(host, port, "", "scan"))
+            done[0] += 1
+            if on_progress and (done[0] % 64 == 0 or done[0] == len(targets)):
+                on_progress(done[0], len(targets))
+
+    start = time.monotonic()
+    tasks = [asyncio.ensure_future(prober()) for _ in range(min(concurrency, len(targets)))]
+    if mdns_seconds:
+        tasks.append(asyncio.ensure_future(browse_mdns(report, mdns_seconds, cancelled)))
+    await asyncio.gather(*tasks)
+    logging.debug(f"WiFi scan of {len(targets)} probes found {len(found)} devices in {time.monotonic() - start:.2f}s")
+    return list(found.values())
+
+
+def run_scan(hosts, ports, on_found, **kwargs):
+    """Runs scan() to completion on a fresh event loop (for worker threads)."""
+    return asyncio.run(scan(hosts, ports, on_found, **kwargs))
+
+
+# --- mDNS ---
+def _encode_name(name):
+    return b"".join(bytes([len(label)]) + label for label in (part.encode("utf-8") for part in name.split("."))) + b"\x00"
+
+
+def _mdns_query():
+    # QU questions ask for unicast replies, which also reach a socket that could not bind port 5353.
+    header = struct.pack(">6H", 0, 0, len(ADB_SERVICES), 0, 0, 0)
+    return header + b"".join(_encode_name(service) + struct.pack(">HH", 12, 0x8001) for service in ADB_SERVICES)
+
+
+def _read_name(data, offset):
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return ".".join(labels), end if end is not None else offset
+        labels.append(data[offset:offset + length].decode("utf-8", errors="replace"))
+        offset += length
+    raise ValueError("DNS name loop")
+
+
+def parse_dns_records(data):
+    """(name, type, value) for the PTR, SRV and A records of a DNS message; SRV values are (port, target)."""
+    _, _, questions, answers, authority, additional = struct.unpack(">6H", data[:12])
+    offset = 12
+    for _ in range(questions):
+        _, offset = _read_name(data, offset)
+        offset += 4
+    records = []
+    for _ in range(answers + authority + additional):
+        name, offset = _read_name(data, offset)
+        rtype, _, _, length = struct.unpack(">HHIH", data[offset:offset + 10])
+        offset += 10
+        if rtype == 12:
+            records.append((name, rtype, _read_name(data, offset)[0]))
+        elif rtype == 33:
+            port = struct.unpack(">H", data[offset + 4:offset + 6])[0]
+            records.append((name, rtype, (port, _read_name(data, offset + 6)[0])))
+        elif rtype == 1 and length == 4:
+            records.append((name, rtype, socket.inet_ntoa(data[offset:offset + 4])))
+        offset += length
+    return records
+
+
+class _MdnsListener(asyncio.DatagramProtocol):
+    """Collects SRV and A records across packets and reports every adb service instance it hears about."""
+
+    def __init__(self, report):
+        self.report = report
+        self.services = {}  # instance -> (port, target, sender address)
+        self.addresses = {}  # host name -> IPv4
+
+    def datagram_received(self, data, addr):
+        try:
+            records = parse_dns_records(data)
+        except (IndexError, ValueError, struct.error, OSError):
+            return
+        for name, rtype, value in records:
+            if rtype == 33 and name.lower().endswith(ADB_SERVICES):
+                self.services[name] = (value[0], value[1].lower(), addr[0])
+            elif rtype == 1:
+                self.addresses[name.lower()] = value
+        for instance, (port, target, sender) in self.services.items():
+            service = next(service for service in ADB_SERVICES if instance.lower().endswith(service))
+            # The responder is nearly always the device itself, so its address stands in for a missing A record.
+            self.report(WifiDevice(self.addresses.get(target, sender), port,
+                                   instance[:-len(service) - 1], service.split(".")[0].lstrip("_")))
+
+
+def _mdns_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except OSError:
+            pass
+    try:
+        # Bound to 5353 in the group, unsolicited announcements are heard too.
+        sock.bind(("", MDNS_PORT))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                        struct.pack("4s4s", socket.inet_aton(MDNS_ADDR), socket.inet_aton("0.0.0.0")))
+    except OSError:
+        sock.close()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.bind(("", 0))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
+    sock.setblocking(False)
+    return sock
+
+
+async def browse_mdns(report, seconds=MDNS_SECONDS, cancelled=None):
+    """Asks for adb services over mDNS and reports what answers or announces itself for the given time."""
+    loop = asyncio.get_running_loop()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(lambda: _MdnsListener(report), sock=_mdns_socket())
+    except OSError as e:
+        logging.debug(f"mDNS browsing unavailable: {e}")
+        return
+    try:
+        deadline = loop.time() + seconds
+        next_query = 0.0
+        while loop.time() < deadline and not (cancelled and cancelled()):
+            if loop.time() >= next_query:
+                try:
+                    transport.sendto(_mdns_query(), (MDNS_ADDR, MDNS_PORT))
+                except OSError as e:
+                    logging.debug(f"mDNS query failed: {e}")
+                next_query = loop.time() + 1.0
+            await asyncio.sleep(0.1)
+    finally:
+        transport.close()
@@ -1,113 +1,317 @@
 import subprocess
 import logging
 import os
+import stat
 import zipfile
-import tempfile
-import re
+import queue
+import sqlite3
 import time
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtCore import QThread, pyqtSignal
 
-class AdbTransferWorker(QThread):
+from src.utils.adb import AdbManager
+from src.utils.adb_client import AdbError, get_client, parse_devices_l, quote_args
+from src.utils.progress import TransferProgress, read_progress
+from src.utils.batch import run_batch
+from src.utils.checksums import ChecksumCache, checksum_files
+from src.utils.folder_sync import (
+    PULL, PUSH, DELETE_LOCAL, DELETE_REMOTE, TOUCH_LOCAL, plan_sync, prune_empty_dirs, save_state
+)
+from src.utils.throttle import MIN_BURST, TokenBucket, get_limits
+from src.utils.fanout import DEFAULT_CONCURRENCY as FANOUT_CONCURRENCY, fan_out
+from src.utils.metrics import CANCELLED, ERROR, OK, get_metrics
+from src.utils.logs import LogThrottle
+from src.utils.tar_stream import pull_tar, push_tar, select_bulk
+from src.utils.wifi_scan import run_scan
+from src.utils.transfer_journal import TransferJournal, discard_job, pull_resumable, push_resumable
+
+class TransferCancelled(AdbError):
+    pass
+
+_foreground_lock = threading.Lock()
+_foreground_count = 0
+
+def foreground_operation(run):
+    """Marks a worker's run() as user-initiated so background prefetching backs off while it runs."""
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        global _foreground_count
+        with _foreground_lock:
+            _foreground_count += 1
+        try:
+            return run(self, *args, **kwargs)
+        finally:
+            with _foreground_lock:
+                _foreground_count -= 1
+    return wrapper
+
+def foreground_busy():
+    with _foreground_lock:
+        return _foreground_count > 0
+
+class TransferWorker(QThread):
+    """
+    Base for the workers the TransferScheduler runs. Their streams report
+    progress through file_progress(), which blocks while paused, so nothing
+    more is read from or written to the adb stream, raises TransferCancelled
+    after cancel(), which closes the stream, and holds the stream to this
+    transfer's own rate limit and to the device and global limits.
+    """
+
+    def __init__(self, device=None, parent=None):
+        super().__init__(parent)
+        self.device = device
+        self.is_running = True
+        self.failed = 0  # files or devices that failed without ending the whole transfer
+        self.bucket = TokenBucket()
+        self._unpaused = threading.Event()
+        self._unpaused.set()
+
+    def set_rate_limit(self, rate):
+        """Bytes per second for this transfer alone; 0 lifts the limit. Applies to running streams at once."""
+        self.bucket.set_rate(rate)
+
+    def throttle(self, amount, serial=None):
+        limits = get_limits()
+        stopped = lambda: not self.is_running
+        serial = serial or AdbManager.get_serial(self.device)
+        for bucket in (self.bucket, limits.device(serial), limits.global_bucket):
+            bucket.consume(amount, stopped)
+        get_metrics().add_bytes(serial, amount)
+
+    def measure(self, operation, serial=None):
+        """Times an operation for the metrics registry; a cancelled transfer counts as cancelled, not failed."""
+        return get_metrics().timer(operation, serial or AdbManager.get_serial(self.device), ignore=(TransferCancelled,))
+
+    def file_progress(self, callback=None, serial=None):
+        """
+        Progress callback for one file's stream: honours pause/cancel and
+        throttles by the bytes that arrived since the previous call, then
+        passes (done, total) on to callback.
+        """
+        last = [None]
+        def on_progress(done, total):
+            self.checkpoint()
+            # A resumed stream starts counting at its offset, so the first call only pays for one chunk.
+            delta = done - last[0] if last[0] is not None else min(done, MIN_BURST)
+            last[0] = done
+            if delta > 0:
+                self.throttle(delta, serial)
+            if callback:
+                callback(done, total)
+        return on_progress
+
+    def pause(self):
+        self._unpaused.clear()
+
+    def resume(self):
+        self._unpaused.set()
+
+    def cancel(self):
+        self.is_running = False
+        self._unpaused.set()
+
+    def wait_if_paused(self):
+        self._unpaused.wait()
+
+    def checkpoint(self):
+        self._unpaused.wait()
+        if not self.is_running:
+            raise TransferCancelled("Transfer cancelled")
+
+    def transfer_bulk(self, serial, direction, files, callback=None):
+        """
+        Moves many small files through one tar stream instead of one sync
+        request each. files is [(source, destination, size)]. Returns the
+        sources that arrived; the caller sends the rest file by file. Only
+        cancelling raises.
+        """
+        pairs = [(source, destination) for source, destination, _ in files]
+        total = sum(size for _, _, size in files)
+        start_time = time.time()
+        try:
+            with self.measure(f"bulk_{direction}", serial) as timing:
+                if direction == PUSH:
+                    push_tar(serial, pairs, self.file_progress(callback, serial), total)
+                    arrived = [source for source, _ in pairs]
+                else:
+                    arrived = pull_tar(serial, pairs, self.file_progress(callback, serial), total)
+                received = set(arrived)
+                timing.bytes = sum(size for source, _, size in files if source in received)
+        except TransferCancelled:
+            raise
+        except (AdbError, OSError) as e:
+            logging.warning(f"Bulk {direction} of {len(files)} files failed, sending them one by one: {e}")
+            return []
+        logging.debug(f"Bulk {direction} of {len(arrived)}/{len(files)} files ({total} bytes) "
+                      f"in {time.time() - start_time:.2f}s")
+        return arrived
+
+class AdbTransferWorker(TransferWorker):
     # active_file, progress_percent, speed_str, eta_str
     progress_update = pyqtSignal(str, int, str, str)
     finished_transfer = pyqtSignal()
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, command, device=None, parent=None):
-        super().__init__(parent)
+    def __init__(self, command, device=None, parent=None, job=None):
+        super().__init__(device, parent)
         self.command = command
-        self.device = device
-        self.is_running = True
+        self.job = job  # journal id of an interrupted transfer to resume instead of command
 
+    @foreground_operation
     def run(self):
+        # push/pull go through the in-process client; anything else still runs the adb binary.
+        args = [part for part in (self.command or [])[1:] if part != "-p"]
+        if self.job is not None:
+            self.run_job(TransferJournal())
+        elif args and args[0] in ("push", "pull") and len(args) == 3:
+            self.run_native(*args)
+        else:
+            self.run_cli()
+
+    def run_native(self, direction, source, destination):
+        serial = AdbManager.get_serial(self.device)
+        try:
+            if direction == "push":
+                files = get_client().plan_push(serial, source, destination)
+            else:
+                files = get_client().plan_pull(serial, source, destination)
+        except (AdbError, OSError) as e:
+            self.error_occurred.emit(str(e))
+            return
+        journal = TransferJournal()
+        self.job = journal.create_job(serial, direction, f"{direction.capitalize()} {source}", files)
+        self.run_job(journal)
+
+    def run_job(self, journal):
+        """Transfers the job's unfinished files one by one; whatever fails stays in the journal for a later resume."""
+        record = journal.job(self.job)
+        if record is None:
+            self.finished_transfer.emit()
+            return
+        serial = record.serial or None
+        transfer = push_resumable if record.direction == "push" else pull_resumable
+        files = journal.files(self.job)
+        base = sum(item.offset for item in files)
+        tracker = TransferProgress(sum(item.size for item in files) or 1, base=base)
+        start_time = time.time()
+
+        try:
+            done_before = 0
+            fresh = [item for item in files if not item.offset]
+            fresh = select_bulk(serial, fresh, [item.size for item in fresh])
+            if fresh:
+                def on_bulk_progress(done, _total):
+                    update = tracker.update(base + done)
+                    if update:
+                        self.progress_update.emit("Transferring...", *update)
+                arrived = set(self.transfer_bulk(serial, record.direction,
+                                                 [(item.source, item.destination, item.size) for item in fresh],
+                                                 on_bulk_progress))
+                for item in fresh:
+                    if item.source in arrived:
+                        journal.complete(self.job, item.source)
+                        done_before += item.size
+                files = [item for item in files if item.source not in arrived]
+            for item in files:
+                def on_progress(done, _total, done_before=done_before):
+                    update = tracker.update(done_before + done)
+                    if update:
+                        self.progress_update.emit("Transferring...", *update)
+                with self.measure(record.direction, serial) as timing:
+                    transfer(serial, journal, self.job, item, self.file_progress(on_progress))
+                    timing.bytes = item.size - item.offset
+                done_before += item.size
+            journal.finish(self.job)
+            logging.debug(f"ADB {record.title} done in {time.time() - start_time:.2f}s")
+            self.finished_transfer.emit()
+        except TransferCancelled:
+            discard_job(journal, self.job)
+            logging.debug(f"ADB {record.title} cancelled")
+        except (AdbError, OSError) as e:
+            logging.warning(f"ADB {record.title} interrupted, kept for resume: {e}")
+            self.error_occurred.emit(str(e))
+        finally:
+            journal.close()
+
+    def run_cli(self):
+        start_time = time.perf_counter()
+        outcome = ERROR
         try:
             cmd = self.command
             if self.device and self.device != "No Device":
                 serial = self.device.split()[0]
                 if cmd[0] == "adb":
                     cmd = ["adb", "-s", serial] + cmd[1:]
-            
-            # Ensure -p is present for push/pull commands for progress
-            if "push" in cmd or "pull" in cmd:
-                 pass
-                 # Actually, it's safer to always insert -p after push/pull if not present
-                 # But we need to find index.
-            
-            # Simple injection:
-            new_cmd = []
-            for part in cmd:
-                new_cmd.append(part)
-                if part in ["push", "pull"] and "-p" not in cmd:
-                    new_cmd.append("-p")
-            cmd = new_cmd
-
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT, 
-                universal_newlines=True,
-                bufsize=1
-            )
-            
-            start_time = time.time()
-            
-            # Instead of simple 'for line in process.stdout', we read chunks to catch \r
-            buffer = ""
-            while True:
-                char = process.stdout.read(1)
-                if not char and process.poll() is not None:
-                    break
-                
+
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            progress_log = LogThrottle()
+
+            # Buffered binary reads; the parser splits on \r as well since adb redraws progress in place.
+            for line in read_progress(process.stdout):
+                # Not reading the pipe while paused blocks adb on its next progress write.
+                self.wait_if_paused()
                 if not self.is_running:
                     process.terminate()
                     break
-                
-                if char in ['\r', '\n']:
-                    if buffer:
-                        line = buffer.strip()
-                        # Parse logic
-                        match = re.search(r'\[\s*(\d+)%\]', line)
-                        if match:
-                            percent = int(match.group(1))
-                            speed_match = re.search(r'(\d+\.?\d+\s*[KMG]?B/s)', line)
-                            speed = speed_match.group(1) if speed_match else ""
-                            self.progress_update.emit("Transferring...", percent, speed, "")
-                        
-                        logging.debug(f"ADB Transfer: {line}")
-                        buffer = ""
+                if line.percent is not None:
+                    self.progress_update.emit("Transferring...", line.percent, line.speed, "")
+                    progress_log.log(f"ADB Transfer: {line.text}")
                 else:
-                    buffer += char
+                    # Summaries and errors are rare and worth keeping in full.
+                    logging.debug(f"ADB Transfer: {line.text}")
 
             process.wait()
             if process.returncode == 0:
+                outcome = OK
                 self.finished_transfer.emit()
             else:
+                outcome = ERROR if self.is_running else CANCELLED
                 self.error_occurred.emit(f"Transfer failed with code {process.returncode}")
 
         except Exception as e:
             self.error_occurred.emit(str(e))
+        finally:
+            get_metrics().observe("adb_cli", AdbManager.get_serial(self.device), time.perf_counter() - start_time, outcome)
 
 class FileListWorker(QThread):
+    entriesBatch = pyqtSignal(list)
     filesListed = pyqtSignal(list)
     errorOccurred = pyqtSignal(str)
 
-    def __init__(self, directory, device=None, parent=None):
+    def __init__(self, directory, device=None, parent=None, streaming=False):
         super().__init__(parent)
         self.directory = directory
         self.device = device
+        self.streaming = streaming
+        self.is_running = True
+
+    def cancel(self):
+        self.is_running = False
 
+    @foreground_operation
     def run(self):
+        serial = AdbManager.get_serial(self.device)
         try:
-            cmd = ["adb", "shell", "ls", "-p", self.directory]
-            if self.device and self.device != "No Device":
-                serial = self.device.split()[0]
-                cmd = ["adb", "-s", serial, "shell", "ls", "-p", self.directory]
-            
-            result = subprocess.check_output(cmd, universal_newlines=True, stderr=subprocess.PIPE)
-            lines = result.splitlines()
-            files = [line for line in lines if line.strip()]
-            self.filesListed.emit(files)
-        except subprocess.CalledProcessError as e:
+            # One sync LIS2 request returns names together with type, size, mtime and mode.
+            with get_metrics().timer("list", serial) as timing:
+                entries = []
+                batches = get_client().iter_dir(serial, self.directory)
+                try:
+                    for batch in batches:
+                        if not self.is_running:
+                            timing.outcome = CANCELLED
+                            return
+                        entries.extend(batch)
+                        if self.streaming:
+                            self.entriesBatch.emit(batch)
+                finally:
+                    batches.close()
+            entries.sort(key=lambda entry: entry.name)
+            self.filesListed.emit(entries)
+        except (AdbError, OSError) as e:
             self.errorOccurred.emit(str(e))
 
 class AdbCommandWorker(QThread):
@@ -119,139 +323,824 @@ class AdbCommandWorker(QThread):
         self.command = command
         self.device = device
 
+    @foreground_operation
     def run(self):
         try:
+            serial = AdbManager.get_serial(self.device)
             cmd = self.command
-            if self.device and self.device != "No Device":
-                serial = self.device.split()[0]
-                if cmd[0] == "adb":
+            if cmd[:2] == ["adb", "shell"]:
+                # Reuses the device's long-lived shell instead of setting up a new one per command.
+                with get_metrics().timer("shell", serial):
+                    result = get_client().run_command(serial, quote_args(cmd[2:]))
+                if result.exit_code != 0:
+                    stderr = result.stderr.decode("utf-8", errors="replace").strip()
+                    raise AdbError(f"Command '{' '.join(cmd)}' returned non-zero exit status {result.exit_code}. {stderr}".strip())
+                self.finished_with_output.emit(result.stdout.decode("utf-8", errors="replace"))
+            elif cmd[:2] == ["adb", "install"]:
+                with get_metrics().timer("install", serial) as timing:
+                    output = get_client().install(serial, cmd[-1])
+                    timing.bytes = os.path.getsize(cmd[-1])
+                self.finished_with_output.emit(output)
+            else:
+                if serial and cmd[0] == "adb":
                     cmd = ["adb", "-s", serial] + cmd[1:]
-            
-            output = subprocess.check_output(cmd, universal_newlines=True, stderr=subprocess.PIPE)
-            self.finished_with_output.emit(output)
+                with get_metrics().timer("adb_cli", serial):
+                    output = subprocess.check_output(cmd, universal_newlines=True, stderr=subprocess.PIPE)
+                self.finished_with_output.emit(output)
+        except (AdbError, OSError) as e:
+            self.errorOccurred.emit(str(e))
         except subprocess.CalledProcessError as e:
             self.errorOccurred.emit(str(e))
 
-class ZipWorker(QThread):
-    # Update signals to match expectation
+class InstallWorker(TransferWorker):
     progress_update = pyqtSignal(str, int, str, str)
-    finished = pyqtSignal()
-    
-    def __init__(self, items, current_directory, save_path, device=None, parent=None):
+    finished_with_output = pyqtSignal(str)
+    errorOccurred = pyqtSignal(str)
+
+    def __init__(self, apk_path, device=None, parent=None):
+        super().__init__(device, parent)
+        self.apk_path = apk_path
+
+    @foreground_operation
+    def run(self):
+        tracker = TransferProgress(0)
+
+        def on_progress(done, total):
+            tracker.total = total
+            update = tracker.update(done)
+            if update:
+                # The last percent is left for the package manager's verification.
+                percent, speed, eta = update
+                self.progress_update.emit("Installing...", min(percent, 99), speed, eta)
+
+        try:
+            with self.measure("install") as timing:
+                output = get_client().install(AdbManager.get_serial(self.device), self.apk_path, self.file_progress(on_progress))
+                timing.bytes = os.path.getsize(self.apk_path)
+            self.progress_update.emit("Installed", 100, "", "")
+            self.finished_with_output.emit(output)
+        except TransferCancelled:
+            logging.debug(f"Install of {self.apk_path} cancelled")
+        except (AdbError, OSError) as e:
+            self.errorOccurred.emit(str(e))
+
+class FanOutWorker(TransferWorker):
+    """
+    Pushes files to, or installs APKs on, many devices at once. Each file is
+    read once per group of concurrently served devices and streamed to all
+    of them; every device's outcome per file goes out through deviceProgress.
+    """
+    PUSH, INSTALL = "push", "install"
+    DEFAULT_CONCURRENCY = FANOUT_CONCURRENCY
+
+    progress_update = pyqtSignal(str, int, str, str)
+    deviceProgress = pyqtSignal(str, str, str, str)  # serial, file name, status text, "running"/"done"/"failed"
+    finished_fanout = pyqtSignal(int, int)  # succeeded, failed (device x file)
+
+    def __init__(self, mode, paths, serials, remote_dir=None, concurrency=FANOUT_CONCURRENCY, parent=None):
+        super().__init__(None, parent)
+        self.mode = mode
+        self.paths = paths
+        self.serials = serials
+        self.remote_dir = remote_dir
+        self.concurrency = max(1, concurrency)
+
+    @foreground_operation
+    def run(self):
+        client = get_client()
+        try:
+            sizes = {path: os.path.getsize(path) for path in self.paths}
+        except OSError as e:
+            for serial in self.serials:
+                self.deviceProgress.emit(serial, "", str(e), "failed")
+            self.finished_fanout.emit(0, len(self.serials))
+            return
+        tracker = TransferProgress(sum(sizes.values()) * len(self.serials) or 1)
+        lock = threading.Lock()
+        sent = {}  # (serial, path) -> bytes
+        succeeded = failed = 0
+        start_time = time.time()
+
+        for path in self.paths:
+            name = os.path.basename(path)
+            mode = stat.S_IFREG | (os.stat(path).st_mode & 0o777)
+            mtime = os.path.getmtime(path)
+
+            def deliver(serial, fileobj, size, path=path, name=name, mode=mode, mtime=mtime):
+                percent = [-1]
+                def on_progress(done, _total):
+                    with lock:
+                        sent[(serial, path)] = done
+                        update = tracker.update(sum(sent.values()))
+                    if update:
+                        self.progress_update.emit(f"{self.mode.capitalize()} {name}", *update)
+                    if size and done * 100 // size != percent[0]:
+                        percent[0] = done * 100 // size
+                        self.deviceProgress.emit(serial, name, f"{percent[0]}%", "running")
+                progress = self.file_progress(on_progress, serial)
+                with self.measure(f"fanout_{self.mode}", serial) as timing:
+                    if self.mode == self.INSTALL:
+                        client.install_stream(serial, fileobj, size, progress)
+                    else:
+                        with client.sync(serial) as sync:
+                            sync.push(fileobj, f"{self.remote_dir.rstrip('/')}/{name}", mode, mtime, progress, size)
+                    timing.bytes = size
+                return "Installed" if self.mode == self.INSTALL else "Pushed"
+
+            results = fan_out(path, self.serials, deliver, self.concurrency, lambda: not self.is_running)
+            for serial in self.serials:
+                ok, message = results.get(serial, (False, "Cancelled"))
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+                lines = message.strip().splitlines() or ["Failed"]
+                self.deviceProgress.emit(serial, name, lines[-1], "done" if ok else "failed")
+            if not self.is_running:
+                break
+
+        logging.debug(f"Fan-out {self.mode} of {len(self.paths)} files to {len(self.serials)} devices: "
+                      f"{succeeded} ok, {failed} failed in {time.time() - start_time:.2f}s")
+        self.failed = failed
+        self.progress_update.emit("Finished", 100, "", "")
+        self.finished_fanout.emit(succeeded, failed)
+
+class BatchOperationWorker(QThread):
+    # list of BatchResult, one per operation
+    finished_with_results = pyqtSignal(list)
+    errorOccurred = pyqtSignal(str)
+
+    def __init__(self, operations, device=None, parent=None):
         super().__init__(parent)
-        self.items = items 
-        self.current_directory = current_directory
-        self.save_path = save_path
+        self.operations = operations
         self.device = device
+
+    @foreground_operation
+    def run(self):
+        try:
+            start_time = time.time()
+            serial = AdbManager.get_serial(self.device)
+            with get_metrics().timer("batch", serial):
+                results = run_batch(serial, self.operations)
+            logging.debug(f"Batch of {len(self.operations)} operations finished in {time.time() - start_time:.2f}s")
+            self.finished_with_results.emit(results)
+        except (AdbError, ValueError) as e:
+            self.errorOccurred.emit(str(e))
+
+class WifiScanWorker(QThread):
+    """Probes hosts and ports for adb daemons while browsing mDNS; devices are emitted as they are found."""
+    deviceFound = pyqtSignal(object)  # WifiDevice
+    progress = pyqtSignal(int, int)  # probes done, probes total
+    finished_scan = pyqtSignal(int)  # devices found
+
+    def __init__(self, hosts, ports, parent=None):
+        super().__init__(parent)
+        self.hosts = hosts
+        self.ports = ports
+        self.is_running = True
+
+    def cancel(self):
+        self.is_running = False
+
+    def run(self):
+        try:
+            with get_metrics().timer("wifi_scan") as timing:
+                found = run_scan(self.hosts, self.ports, self.deviceFound.emit, on_progress=self.progress.emit,
+                                 cancelled=lambda: not self.is_running)
+                if not self.is_running:
+                    timing.outcome = CANCELLED
+        except OSError as e:
+            logging.error(f"WiFi scan failed: {e}")
+            found = []
+        self.finished_scan.emit(len(found))
+
+class DeviceTracker(QThread):
+    """
+    Follows the adb server's host:track-devices-l stream and keeps the device
+    table (serial -> DeviceInfo) up to date. The server pushes a new list on
+    every change, so nothing is polled, and signals go out only when the
+    table actually changed. If the server goes away all devices count as
+    gone and the subscription is retried with a growing delay.
+    """
+    devicesChanged = pyqtSignal(list)  # DeviceInfo of every device, in the server's order
+    deviceAdded = pyqtSignal(object)  # DeviceInfo
+    deviceRemoved = pyqtSignal(str)  # serial
+    deviceStateChanged = pyqtSignal(object)  # DeviceInfo with the new state
+
+    RETRY_MIN = 1.0
+    RETRY_MAX = 10.0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
         self.is_running = True
+        self.devices = {}
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def stop(self):
+        self.is_running = False
+        self._wake.set()
+        with self._lock:
+            conn = self._conn
+        if conn is not None:
+            conn.close()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.devices.values())
 
     def run(self):
-        with tempfile.TemporaryDirectory() as temp_dir:
-            files_to_download = [f for f in self.items if not f.endswith("/")]
-            total_files = len(files_to_download)
-            if total_files == 0:
-                self.progress_update.emit("Finished", 100, "", "")
-                self.finished.emit()
+        client = get_client()
+        delay = self.RETRY_MIN
+        while self.is_running:
+            try:
+                conn = client.track_devices()
+                with self._lock:
+                    self._conn = conn
+                if not self.is_running:
+                    break
+                delay = self.RETRY_MIN
+                while self.is_running:
+                    self._apply(parse_devices_l(conn.read_string()))
+            except (AdbError, OSError, ValueError) as e:
+                if self.is_running:
+                    logging.debug(f"Device tracking interrupted: {e}")
+            finally:
+                with self._lock:
+                    conn, self._conn = self._conn, None
+                if conn is not None:
+                    conn.close()
+            if not self.is_running:
+                break
+            self._apply([])
+            self._wake.wait(delay)
+            delay = min(delay * 2, self.RETRY_MAX)
+
+    def _apply(self, devices):
+        table = {info.serial: info for info in devices}
+        with self._lock:
+            if table == self.devices:
                 return
+            old, self.devices = self.devices, table
+        client = get_client()
+        for serial in old.keys() - table.keys():
+            client.forget_device(serial)
+            self.deviceRemoved.emit(serial)
+        for serial, info in table.items():
+            if serial not in old:
+                self.deviceAdded.emit(info)
+            elif old[serial].state != info.state:
+                if info.state != "device":
+                    client.forget_device(serial)
+                self.deviceStateChanged.emit(info)
+        logging.debug(f"Devices: {', '.join(f'{info.serial} ({info.state})' for info in table.values()) or 'none'}")
+        get_metrics().set_gauge("devices", sum(1 for info in table.values() if info.state == "device"))
+        self.devicesChanged.emit(list(table.values()))
+
+class PrefetchWorker(QThread):
+    """
+    Lists likely-next directories into the listing cache at low priority.
+    Gives up as soon as any foreground operation starts.
+    """
+
+    def __init__(self, directories, cache, device=None, parent=None):
+        super().__init__(parent)
+        self.directories = directories
+        self.cache = cache
+        self.device = device
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+
+    def run(self):
+        serial = AdbManager.get_serial(self.device)
+        client = get_client()
+        for directory in self.directories:
+            if not self.is_running or foreground_busy():
+                break
+            cached = self.cache.get(serial, directory)
+            if cached and cached[1]:
+                continue
+            generation = self.cache.generation(serial, directory)
+            try:
+                with get_metrics().timer("prefetch", serial):
+                    entries = client.list_dir(serial, directory)
+                self.cache.put(serial, directory, entries, generation)
+            except AdbError as e:
+                logging.debug(f"Prefetch of {directory} skipped: {e}")
+
+class IndexWorker(QThread):
+    """Scans a device into the persistent file index, re-listing only changed directories."""
+    progress = pyqtSignal(int)
+    finished_indexing = pyqtSignal(int)
+    errorOccurred = pyqtSignal(str)
+
+    def __init__(self, index, serial, root="/sdcard", parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.serial = serial
+        self.root = root
+        self.is_running = True
+
+    def stop(self):
+        """Abandons the scan at the next folder; what was indexed so far is kept."""
+        self.is_running = False
+
+    def run(self):
+        try:
+            with get_metrics().timer("index", self.serial) as timing:
+                listed = self.index.update(self.serial, self.root, self.progress.emit, lambda: not self.is_running)
+                if not self.is_running:
+                    timing.outcome = CANCELLED
+            self.finished_indexing.emit(listed)
+        except (AdbError, sqlite3.Error) as e:
+            self.errorOccurred.emit(str(e))
+        finally:
+            self.index.close()
+
+class ChecksumWorker(QThread):
+    """
+    Hashes device files and folders (expanded recursively) in one shell
+    round trip; digests of files unchanged since an earlier run come from
+    the persistent cache.
+    """
+    finished_with_results = pyqtSignal(dict) # path -> digest
+    errorOccurred = pyqtSignal(str)
+
+    def __init__(self, paths, device=None, algorithm="md5", parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.device = device
+        self.algorithm = algorithm
+
+    @foreground_operation
+    def run(self):
+        serial = AdbManager.get_serial(self.device)
+        client = get_client()
+        cache = ChecksumCache()
+        try:
+            with get_metrics().timer("checksum", serial):
+                files = []
+                for path in self.paths:
+                    files.extend((remote, size, mtime) for remote, _, size, mtime in client.walk(serial, path))
+                digests = checksum_files(serial, files, self.algorithm, cache)
+            self.finished_with_results.emit(digests)
+        except (AdbError, sqlite3.Error) as e:
+            self.errorOccurred.emit(str(e))
+        finally:
+            cache.close()
+
+class SearchWorker(QThread):
+    """
+    Answers fuzzy search queries off the GUI thread. Only the newest query
+    matters: submitting one makes any running query stale, and a stale query
+    is abandoned at its next cancellation check instead of emitting results.
+    index_factory builds the FuzzyIndex on first use, inside this thread.
+    """
+    resultsReady = pyqtSignal(int, list)  # query id, [(item, score)]
+
+    def __init__(self, index_factory, limit=100, parent=None):
+        super().__init__(parent)
+        self.index_factory = index_factory
+        self.limit = limit
+        self.index = None
+        self._condition = threading.Condition()
+        self._pending = None
+        self._query_id = 0
+        self.is_running = True
+
+    def submit(self, query):
+        with self._condition:
+            self._query_id += 1
+            self._pending = (self._query_id, query)
+            self._condition.notify()
+            return self._query_id
+
+    def stop(self):
+        with self._condition:
+            self.is_running = False
+            self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self.is_running and self._pending is None:
+                    self._condition.wait()
+                if not self.is_running:
+                    return
+                query_id, query = self._pending
+                self._pending = None
+            if self.index is None:
+                self.index = self.index_factory()
+            stale = lambda: not self.is_running or self._query_id != query_id
+            results = self.index.search(query, self.limit, stale)
+            if not stale():
+                self.resultsReady.emit(query_id, results)
+
+class _QueueWriter:
+    """File-like sink that hands chunks to the zip writer thread; raises TransferCancelled once stopped() is true."""
+
+    def __init__(self, chunks, stopped):
+        self.chunks = chunks
+        self.stopped = stopped
+
+    def write(self, data):
+        # Raising mid-file makes pull_to drop the sync connection instead of reading the rest of the file.
+        if self.stopped():
+            raise TransferCancelled("Transfer cancelled")
+        self.chunks.put(data)
+        return len(data)
+
+class ZipWorker(TransferWorker):
+    progress_update = pyqtSignal(str, int, str, str)
+    error_occurred = pyqtSignal(str)
+
+    # Already-compressed formats are stored as-is, deflating them only burns CPU.
+    STORED_EXTENSIONS = {
+        ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif",
+        ".mp4", ".mkv", ".mov", ".3gp", ".webm", ".avi",
+        ".mp3", ".aac", ".m4a", ".ogg", ".opus", ".flac",
+        ".apk", ".apks", ".aab", ".jar", ".zip", ".gz", ".tgz", ".xz", ".bz2", ".7z", ".rar", ".zst",
+    }
+    QUEUE_CHUNKS = 64
+
+    def __init__(self, items, current_directory, save_path, device=None, parent=None):
+        super().__init__(device, parent)
+        self.items = items
+        self.current_directory = current_directory
+        self.save_path = save_path
+
+    @foreground_operation
+    def run(self):
+        serial = AdbManager.get_serial(self.device)
+        client = get_client()
 
-            completed_files = 0
-            serial = self.device.split()[0] if (self.device and self.device != "No Device") else None
-
-            for file_name in files_to_download:
-                if not self.is_running: break
-                
-                cmd = ["adb", "pull", "-p", f"{self.current_directory}/{file_name}", temp_dir]
-                if serial:
-                    cmd = ["adb", "-s", serial, "pull", "-p", f"{self.current_directory}/{file_name}", temp_dir]
-                
-                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-                buffer = ""
+        files = []
+        errors = []  # names of what is missing from the archive or only partly in it
+        for name in self.items:
+            try:
+                files.extend(client.walk(serial, f"{self.current_directory}/{name.rstrip('/')}"))
+            except (AdbError, OSError) as e:
+                logging.error(f"Zip download of {name} failed: {e}")
+                errors.append(name)
+        if not files:
+            if errors:
+                self.failed = len(errors)
+                self.error_occurred.emit(f"Could not read {', '.join(errors)}")
+            self.progress_update.emit("Finished", 100, "", "")
+            return
+
+        total_bytes = sum(item[2] for item in files) or 1
+        # Device reads run on a producer thread so they overlap with compression here.
+        chunks = queue.Queue(maxsize=self.QUEUE_CHUNKS)
+        stop = threading.Event()
+        sink = _QueueWriter(chunks, lambda: stop.is_set() or not self.is_running)
+
+        def produce():
+            for remote, arcname, size, mtime in files:
+                if stop.is_set():
+                    break
+                chunks.put(("file", (arcname, size, mtime)))
+                try:
+                    client.pull_to(serial, remote, sink)
+                except TransferCancelled:
+                    break
+                except (AdbError, OSError) as e:
+                    logging.error(f"Zip download of {remote} failed: {e}")
+                    chunks.put(("failed", arcname))
+            chunks.put(None)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        start_time = time.time()
+        tracker = TransferProgress(total_bytes)
+        done_bytes = 0
+        entry = None
+        try:
+            with zipfile.ZipFile(self.save_path, "w", allowZip64=True) as zipf:
                 while True:
-                    char = process.stdout.read(1)
-                    if not char and process.poll() is not None:
+                    item = chunks.get()
+                    if item is None:
                         break
-                    
-                    if char in ['\r', '\n']:
-                        if buffer:
-                            line = buffer.strip()
-                            speed_match = re.search(r'(\d+\.?\d+\s*[KMG]?B/s)', line)
-                            spd = speed_match.group(1) if speed_match else ""
-                            
-                            match = re.search(r'(\d+)%', line)
-                            file_pct = int(match.group(1)) if match else 0
-                            
-                            overall_pct = int(((completed_files + (file_pct/100.0)) / total_files) * 100)
-                            self.progress_update.emit(f"Downloading {file_name}", overall_pct, spd, "")
-                            buffer = ""
-                    else:
-                        buffer += char
-
-                process.wait()
-                completed_files += 1
-                
-            # Zip creation
-            self.progress_update.emit("Zipping files...", 99, "", "")
-            with zipfile.ZipFile(self.save_path, 'w') as zipf:
-                for root, _, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        zipf.write(file_path, arcname=file)
-            
-            self.finished.emit()
-
-class MultiDownloadWorker(QThread):
+                    if isinstance(item, tuple):
+                        kind, value = item
+                        if kind == "failed":
+                            # What arrived of the file stays in the archive; the user is told it is incomplete.
+                            errors.append(value)
+                            continue
+                        if entry:
+                            entry.close()
+                        arcname, size, mtime = value
+                        entry = zipf.open(self._zip_info(arcname, size, mtime), "w")
+                        current = arcname
+                        continue
+                    # Stalling here fills the queue, which stops the producer's device stream too.
+                    self.wait_if_paused()
+                    self.throttle(len(item))
+                    entry.write(item)
+                    done_bytes += len(item)
+                    update = tracker.update(done_bytes)
+                    if update:
+                        percent, speed, eta = update
+                        self.progress_update.emit(f"Zipping {current}", min(percent, 99), speed, eta)
+                    if not self.is_running:
+                        break
+                if entry:
+                    entry.close()
+        finally:
+            stop.set()
+            # Unblock the producer if we stopped early.
+            while producer.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+        if not self.is_running:
+            # Cancelled: do not leave a truncated archive behind.
+            try:
+                os.remove(self.save_path)
+            except OSError:
+                pass
+
+        logging.debug(f"Zip of {len(files)} files ({done_bytes} bytes) finished in {time.time() - start_time:.2f}s, {len(errors)} errors")
+        get_metrics().observe("zip", serial, time.time() - start_time,
+                              CANCELLED if not self.is_running else ERROR if errors else OK, done_bytes)
+        if errors and self.is_running:
+            self.failed = len(errors)
+            shown = "\n".join(errors[:20]) + (f"\n... and {len(errors) - 20} more" if len(errors) > 20 else "")
+            self.error_occurred.emit(f"{len(errors)} files could not be read and are missing or incomplete "
+                                     f"in the archive:\n{shown}")
+        self.progress_update.emit("Finished", 100, "", "")
+
+    def _zip_info(self, arcname, size, mtime):
+        # Zip timestamps cannot predate 1980.
+        date_time = time.localtime(max(mtime, 315532800))[:6]
+        info = zipfile.ZipInfo(arcname, date_time=date_time)
+        info.file_size = size  # lets zipfile switch to ZIP64 headers for >4 GB entries
+        if os.path.splitext(arcname)[1].lower() in self.STORED_EXTENSIONS:
+            info.compress_type = zipfile.ZIP_STORED
+        else:
+            info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+class MultiDownloadWorker(TransferWorker):
     progress_update = pyqtSignal(str, int, str, str) # title, pct, speed, eta
-    finished = pyqtSignal()
-    
-    def __init__(self, items, current_directory, dest_folder, device=None, parent=None):
-        super().__init__(parent)
+
+    DEFAULT_CONCURRENCY = 4
+
+    def __init__(self, items, current_directory, dest_folder, device=None, parent=None, concurrency=DEFAULT_CONCURRENCY,
+                 job=None):
+        super().__init__(device, parent)
         self.items = items
         self.current_directory = current_directory
         self.dest_folder = dest_folder
-        self.device = device
-        self.is_running = True
+        self.concurrency = max(1, concurrency)
+        self.job = job  # journal id of an interrupted download to resume instead of items
 
+    @foreground_operation
     def run(self):
-        total_files = len(self.items)
-        if total_files == 0:
-            self.finished.emit()
+        if not self.items and self.job is None:
             return
 
-        serial = self.device.split()[0] if (self.device and self.device != "No Device") else None
-        completed_files = 0
-        
-        for file_name in self.items:
-            if not self.is_running: break
-            
-            target_path = os.path.join(self.dest_folder, file_name)
-            cmd = ["adb", "pull", "-p", f"{self.current_directory}/{file_name}", target_path]
-            if serial:
-                cmd = ["adb", "-s", serial, "pull", "-p", f"{self.current_directory}/{file_name}", target_path]
-            
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-            buffer = ""
-            while True:
-                char = process.stdout.read(1)
-                if not char and process.poll() is not None:
-                    break
-                
-                if char in ['\r', '\n']:
-                    if buffer:
-                        line = buffer.strip()
-                        match_pct = re.search(r'(\d+)%', line)
-                        file_pct = int(match_pct.group(1)) if match_pct else 0
-                        
-                        spd = ""
-                        speed_match = re.search(r'(\d+\.?\d+\s*[KMG]?B/s)', line)
-                        if speed_match: spd = speed_match.group(1)
-                        
-                        overall_pct = int(((completed_files + (file_pct/100.0)) / total_files) * 100)
-                        self.progress_update.emit(f"Downloading {file_name}", overall_pct, spd, "")
-                        buffer = ""
-                else:
-                    buffer += char
-            
-            process.wait()
-            completed_files += 1
-            
-        self.finished.emit()
+        serial = AdbManager.get_serial(self.device)
+        client = get_client()
+        journal = TransferJournal()
+
+        if self.job is None:
+            # Expand folders up front so the total size is known before any stream starts.
+            planned = []
+            for file_name in self.items:
+                try:
+                    planned.extend(client.plan_pull(serial, f"{self.current_directory}/{file_name}", self.dest_folder))
+                except (AdbError, OSError) as e:
+                    logging.error(f"Download of {file_name} failed: {e}")
+                    self.failed += 1
+            self.job = journal.create_job(serial, "pull", f"Download to {self.dest_folder}", planned)
+        else:
+            record = journal.job(self.job)
+            serial = record.serial if record else serial
+        files = journal.files(self.job)
+        total_bytes = sum(item.size for item in files) or 1
+        total_files = len(files)
+
+        lock = threading.Lock()
+        in_flight = {}  # remote -> bytes done so far
+        state = {"bytes": 0, "files": 0}
+
+        def pull(item):
+            if not self.is_running:
+                return
+            def on_progress(done, _total):
+                with lock:
+                    in_flight[item.source] = done
+            try:
+                with self.measure("pull", serial) as timing:
+                    pull_resumable(serial, journal, self.job, item, self.file_progress(on_progress))
+                    timing.bytes = item.size - item.offset
+            except TransferCancelled:
+                pass
+            except (AdbError, OSError) as e:
+                logging.error(f"Download of {item.source} failed: {e}")
+                with lock:
+                    self.failed += 1
+            with lock:
+                state["bytes"] += in_flight.pop(item.source, 0)
+                state["files"] += 1
+
+        start_time = time.time()
+        tracker = TransferProgress(total_bytes, base=sum(item.offset for item in files))
+        # Lots of small files: one tar stream first, whatever it did not deliver goes through sync below.
+        fresh = [item for item in files if not item.offset]
+        fresh = select_bulk(serial, fresh, [item.size for item in fresh])
+        if self.is_running and fresh:
+            def on_bulk_progress(done, _total):
+                update = tracker.update(tracker.base + done)
+                if update:
+                    self.progress_update.emit(f"Downloading {len(fresh)} files in bulk", *update)
+            try:
+                arrived = set(self.transfer_bulk(serial, PULL, [(item.source, item.destination, item.size) for item in fresh],
+                                                 on_bulk_progress))
+            except TransferCancelled:
+                arrived = set()
+            for item in fresh:
+                if item.source in arrived:
+                    journal.complete(self.job, item.source)
+                    state["bytes"] += item.size
+                    state["files"] += 1
+            files = [item for item in files if item.source not in arrived]
+
+        # Several sync streams in parallel hide the per-request latency of slow (WiFi) links.
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(pull, item) for item in files]
+            while not all(future.done() for future in futures):
+                time.sleep(0.25)
+                with lock:
+                    done_bytes = state["bytes"] + sum(in_flight.values())
+                    done_files = state["files"]
+                self.progress_update.emit(f"Downloading {done_files}/{total_files} files", *tracker.update(done_bytes, force=True))
+                if not self.is_running:
+                    for future in futures:
+                        future.cancel()
+
+        # Finished and cancelled jobs leave the journal; failed files stay in it so the download can be resumed.
+        if not self.is_running:
+            discard_job(journal, self.job)
+        elif not journal.files(self.job):
+            journal.finish(self.job)
+        else:
+            logging.warning(f"Download job {self.job} has unfinished files and can be resumed")
+        journal.close()
+        logging.debug(f"Downloaded {total_files} files ({total_bytes} bytes) with {self.concurrency} streams in {time.time() - start_time:.2f}s")
+
+class SyncPlanWorker(QThread):
+    """Dry run of a folder sync: builds both manifests and emits the SyncPlan without changing anything."""
+    planReady = pyqtSignal(object)
+    errorOccurred = pyqtSignal(str)
+
+    def __init__(self, remote_root, local_root, device=None, direction="pull", delete=False, checksum=False, parent=None):
+        super().__init__(parent)
+        self.remote_root = remote_root
+        self.local_root = local_root
+        self.device = device
+        self.direction = direction
+        self.delete = delete
+        self.checksum = checksum
+
+    @foreground_operation
+    def run(self):
+        cache = None
+        try:
+            serial = AdbManager.get_serial(self.device)
+            cache = ChecksumCache() if self.checksum else None
+            with get_metrics().timer("sync_plan", serial):
+                plan = plan_sync(serial, self.remote_root, self.local_root, self.direction, self.delete, self.checksum, cache)
+            self.planReady.emit(plan)
+        except (AdbError, OSError, sqlite3.Error) as e:
+            self.errorOccurred.emit(str(e))
+        finally:
+            if cache:
+                cache.close()
+
+class FolderSyncWorker(TransferWorker):
+    """
+    Carries out a SyncPlan: transfers run over parallel sync streams, device
+    deletions go out as one batch, and the synced manifest is saved for the
+    next two-way run. Files that failed are left out of that manifest.
+    """
+    progress_update = pyqtSignal(str, int, str, str) # title, pct, speed, eta
+    finished_sync = pyqtSignal(int) # number of failed actions
+
+    def __init__(self, plan, parent=None, concurrency=MultiDownloadWorker.DEFAULT_CONCURRENCY):
+        super().__init__(plan.serial, parent)
+        self.plan = plan
+        self.concurrency = max(1, concurrency)
+
+    @foreground_operation
+    def run(self):
+        plan = self.plan
+        client = get_client()
+        failed = set()
+        transfers = [action for action in plan.actions if action.op in (PULL, PUSH)]
+        total_files = len(transfers)
+        lock = threading.Lock()
+        in_flight = {}
+        state = {"bytes": 0, "files": 0}
+
+        def transfer(action):
+            def on_progress(done, _total):
+                with lock:
+                    in_flight[action.path] = done
+            try:
+                self.checkpoint()
+                with self.measure(action.op, plan.serial) as timing:
+                    if action.op == PULL:
+                        client.pull_file(plan.serial, plan.remote_path(action.path), plan.local_path(action.path),
+                                         action.mtime, self.file_progress(on_progress))
+                    else:
+                        client.push(plan.serial, plan.local_path(action.path), plan.remote_path(action.path),
+                                    self.file_progress(on_progress))
+                    timing.bytes = action.size
+            except TransferCancelled:
+                failed.add(action.path)
+            except (AdbError, OSError) as e:
+                logging.error(f"Sync of {action.path} failed: {e}")
+                failed.add(action.path)
+            with lock:
+                state["bytes"] += in_flight.pop(action.path, 0)
+                state["files"] += 1
+
+        start_time = time.time()
+        tracker = TransferProgress(plan.transfer_bytes() or 1)
+        # Folders of small files go as one tar stream per direction; the rest and any stragglers use sync streams.
+        for op in (PULL, PUSH):
+            group = [action for action in transfers if action.op == op]
+            group = select_bulk(plan.serial, group, [action.size for action in group])
+            if not self.is_running or not group:
+                continue
+            sources = {}
+            for action in group:
+                remote, local = plan.remote_path(action.path), plan.local_path(action.path)
+                sources[remote if op == PULL else local] = (action, local if op == PULL else remote)
+            def on_bulk_progress(done, _total, base=state["bytes"], count=len(group)):
+                update = tracker.update(base + done)
+                if update:
+                    self.progress_update.emit(f"Syncing {count} files in bulk", *update)
+            try:
+                arrived = self.transfer_bulk(plan.serial, op, [(source, destination, action.size)
+                                                               for source, (action, destination) in sources.items()],
+                                             on_bulk_progress)
+            except TransferCancelled:
+                arrived = []
+            delivered = {sources[source][0].path for source in arrived}
+            state["bytes"] += sum(action.size for action in group if action.path in delivered)
+            state["files"] += len(delivered)
+            transfers = [action for action in transfers if action.path not in delivered]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(transfer, action) for action in transfers]
+            while not all(future.done() for future in futures):
+                time.sleep(0.25)
+                with lock:
+                    done_bytes = state["bytes"] + sum(in_flight.values())
+                    done_files = state["files"]
+                self.progress_update.emit(f"Syncing {done_files}/{total_files} files", *tracker.update(done_bytes, force=True))
+
+        for action in plan.actions:
+            if action.op not in (DELETE_LOCAL, TOUCH_LOCAL):
+                continue
+            if not self.is_running:
+                failed.add(action.path)
+                continue
+            try:
+                if action.op == DELETE_LOCAL:
+                    os.remove(plan.local_path(action.path))
+                    prune_empty_dirs(plan.local_root, plan.local_path(action.path))
+                elif action.op == TOUCH_LOCAL:
+                    os.utime(plan.local_path(action.path), (action.mtime, action.mtime))
+            except OSError as e:
+                logging.error(f"Sync of {action.path} failed: {e}")
+                failed.add(action.path)
+
+        removals = [action for action in plan.actions if action.op == DELETE_REMOTE and self.is_running]
+        if removals:
+            try:
+                results = run_batch(plan.serial, [("rm", plan.remote_path(action.path)) for action in removals])
+                failed.update(action.path for action, result in zip(removals, results) if result.exit_code != 0)
+            except AdbError as e:
+                logging.error(f"Deleting {len(removals)} device files failed: {e}")
+                failed.update(action.path for action in removals)
+
+        try:
+            save_state(plan.local_root, plan.serial, plan.remote_root,
+                       {rel: value for rel, value in plan.state.items() if rel not in failed})
+        except OSError as e:
+            logging.error(f"Could not save sync state: {e}")
+        logging.debug(f"Synced {len(plan.actions) - len(failed)}/{len(plan.actions)} actions "
+                      f"({plan.transfer_bytes()} bytes) in {time.time() - start_time:.2f}s")
+        self.failed = len(failed)
+        self.progress_update.emit("Sync complete", 100, "", "")
+        self.finished_sync.emit(len(failed))
@@ -0,0 +1,65 @@
+import subprocess
+
+import pytest
+
+from src.utils.adb_client import AdbError
+from src.utils.batch import _BEGIN, _END, BatchResult, compile_script, parse_results
+
+
+def test_parse_results_matches_output_and_codes():
+    operations = [("rm", "/sdcard/a"), ("mv", "/sdcard/b", "/sdcard/c")]
+    output = (f"{_BEGIN}0\n{_END}0:0\n"
+              f"{_BEGIN}1\nmv: bad '/sdcard/b': No such file or directory\n{_END}1:1\n")
+    assert parse_results(output, operations) == [
+        BatchResult(operations[0], 0, ""),
+        BatchResult(operations[1], 1, "mv: bad '/sdcard/b': No such file or directory"),
+    ]
+
+
+def test_parse_results_output_without_trailing_newline():
+    operations = [("mkdir", "/sdcard/x")]
+    output = f"{_BEGIN}0\nline one\npartial{_END}0:2\n"
+    assert parse_results(output, operations) == [BatchResult(operations[0], 2, "line one\npartial")]
+
+
+def test_parse_results_ignores_noise_outside_markers():
+    operations = [("rm", "/sdcard/a")]
+    output = f"motd\n{_BEGIN}0\n{_END}0:0\ntrailing\n"
+    assert parse_results(output, operations)[0].exit_code == 0
+
+
+def test_parse_results_keeps_form_feeds_and_separators_in_output():
+    # Only \n separates lines; splitlines() would also split on \x1e and \x0c.
+    operations = [("rm", "/sdcard/a")]
+    output = f"{_BEGIN}0\nodd\x0cname\x1d\n{_END}0:1\n"
+    assert parse_results(output, operations)[0].output == "odd\x0cname\x1d"
+
+
+def test_parse_results_raises_when_script_stopped_early():
+    operations = [("rm", "/sdcard/a"), ("rm", "/sdcard/b")]
+    with pytest.raises(AdbError):
+        parse_results(f"{_BEGIN}0\n{_END}0:0\n{_BEGIN}1\n", operations)
+
+
+def test_compile_script_rejects_unknown_operation():
+    with pytest.raises(ValueError):
+        compile_script([("chmod", "777", "/sdcard/a")])
+
+
+def test_compiled_script_round_trip_through_sh(tmp_path):
+    # The same script the device runs, executed by a local sh: quoting and markers have to survive.
+    keep = tmp_path / "it's here"
+    keep.mkdir()
+    victim = tmp_path / "space name.txt"
+    victim.write_text("x")
+    operations = [
+        ("rm", str(victim)),
+        ("mv", str(tmp_path / "missing"), str(tmp_path / "elsewhere")),
+        ("mkdir", str(keep / "sub dir")),
+    ]
+    output = subprocess.run(["sh", "-c", compile_script(operations)], capture_output=True, text=True).stdout
+    results = parse_results(output, operations)
+    assert [result.exit_code for result in results] == [0, 1, 0]
+    assert results[1].output
+    assert not victim.exists()
+    assert (keep / "sub dir").is_dir()
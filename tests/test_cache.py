@@ -0,0 +1,37 @@
+from src.utils.cache import ListingCache
+
+
+def test_put_and_get_normalize_the_path():
+    cache = ListingCache()
+    cache.put("s1", "/sdcard//DCIM/", ["a"])
+    assert cache.get("s1", "/sdcard/DCIM") == (["a"], True)
+    assert cache.get("s2", "/sdcard/DCIM") is None
+
+
+def test_listing_taken_before_an_invalidation_is_dropped():
+    cache = ListingCache()
+    generation = cache.generation("s1", "/sdcard")
+    cache.invalidate("s1", "/sdcard")
+    cache.put("s1", "/sdcard", ["stale"], generation)
+    assert cache.get("s1", "/sdcard") is None
+    cache.put("s1", "/sdcard", ["fresh"], cache.generation("s1", "/sdcard"))
+    assert cache.get("s1", "/sdcard")[0] == ["fresh"]
+
+
+def test_recursive_device_and_full_invalidations_drop_listings_in_flight():
+    cache = ListingCache()
+    for invalidate in (lambda: cache.invalidate("s1", "/sdcard", recursive=True),
+                       lambda: cache.invalidate_device("s1"), cache.clear):
+        generation = cache.generation("s1", "/sdcard/Music")
+        invalidate()
+        cache.put("s1", "/sdcard/Music", ["stale"], generation)
+        assert cache.get("s1", "/sdcard/Music") is None
+
+
+def test_other_paths_are_not_affected():
+    cache = ListingCache()
+    generation = cache.generation("s1", "/sdcard/Music")
+    cache.invalidate("s1", "/sdcard/DCIM")
+    cache.invalidate("s2", "/sdcard", recursive=True)
+    cache.put("s1", "/sdcard/Music", ["kept"], generation)
+    assert cache.get("s1", "/sdcard/Music")[0] == ["kept"]
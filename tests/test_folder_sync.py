@@ -0,0 +1,175 @@
+import os
+import stat
+from contextlib import contextmanager
+
+import pytest
+
+from src.utils import folder_sync
+from src.utils.adb_client import AdbClient, FileEntry
+from src.utils.folder_sync import (
+    DELETE_LOCAL, DELETE_REMOTE, PULL, PUSH, STATE_FILE, TOUCH_LOCAL, SyncAction, SyncPlan,
+    diff_manifests, drop_identical, local_manifest, plan_sync, remote_manifest
+)
+
+
+def ops(actions):
+    return {(action.op, action.path) for action in actions}
+
+
+# --- diff_manifests ---
+def test_unchanged_files_need_nothing_within_mtime_slack():
+    actions, state = diff_manifests({"a": (3, 1000)}, {"a": (3, 1001)}, "pull")
+    assert actions == []
+    assert state == {"a": (3, 1001)}
+
+
+def test_pull_copies_new_and_changed_and_deletes_only_when_asked():
+    remote = {"new": (1, 10), "changed": (2, 20)}
+    local = {"changed": (5, 20), "extra": (1, 10)}
+    assert ops(diff_manifests(remote, local, "pull")[0]) == {(PULL, "new"), (PULL, "changed")}
+    assert ops(diff_manifests(remote, local, "pull", delete=True)[0]) == {
+        (PULL, "new"), (PULL, "changed"), (DELETE_LOCAL, "extra")}
+
+
+def test_push_mirrors_pull():
+    remote = {"extra": (1, 10)}
+    local = {"new": (4, 40)}
+    actions, state = diff_manifests(remote, local, "push", delete=True)
+    assert actions == [SyncAction(DELETE_REMOTE, "extra", 0, 0), SyncAction(PUSH, "new", 4, 40)]
+    assert state == {"new": (4, 40)}
+
+
+def test_two_way_side_that_changed_since_base_wins():
+    base = {"f": (1, 100)}
+    # Device unchanged, local edited (even to an older mtime): push.
+    assert ops(diff_manifests({"f": (1, 100)}, {"f": (2, 50)}, "both", base=base)[0]) == {(PUSH, "f")}
+    # Local unchanged, device edited: pull.
+    assert ops(diff_manifests({"f": (3, 50)}, {"f": (1, 100)}, "both", base=base)[0]) == {(PULL, "f")}
+
+
+def test_two_way_conflict_newer_wins():
+    base = {"f": (1, 100)}
+    assert ops(diff_manifests({"f": (2, 300)}, {"f": (3, 200)}, "both", base=base)[0]) == {(PULL, "f")}
+    assert ops(diff_manifests({"f": (2, 200)}, {"f": (3, 300)}, "both")[0]) == {(PUSH, "f")}
+
+
+def test_two_way_tells_deletions_from_new_files():
+    base = {"gone_local": (1, 10), "gone_remote": (2, 20)}
+    remote = {"gone_local": (1, 10), "new_remote": (3, 30)}
+    local = {"gone_remote": (2, 20), "new_local": (4, 40)}
+    actions, _ = diff_manifests(remote, local, "both", delete=True, base=base)
+    assert ops(actions) == {(DELETE_REMOTE, "gone_local"), (DELETE_LOCAL, "gone_remote"),
+                            (PULL, "new_remote"), (PUSH, "new_local")}
+    # Without delete, a file missing on one side is copied back instead.
+    actions, _ = diff_manifests(remote, local, "both", delete=False, base=base)
+    assert ops(actions) == {(PULL, "gone_local"), (PUSH, "gone_remote"), (PULL, "new_remote"), (PUSH, "new_local")}
+
+
+# --- Manifests ---
+def test_local_manifest_skips_state_file(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.txt").write_bytes(b"abc")
+    (tmp_path / STATE_FILE).write_text("{}")
+    os.utime(tmp_path / "sub" / "a.txt", (1000, 1000))
+    assert local_manifest(str(tmp_path)) == {"sub/a.txt": (3, 1000)}
+
+
+class _Stat:
+    is_dir = True
+
+
+class _Client:
+    """walk() the way AdbClient does it: paths start with the folder's name, except for /."""
+
+    def __init__(self, files, links=()):
+        self.files = files
+        self.links = links
+        self.walked = []
+
+    def stat(self, serial, path):
+        return _Stat()
+
+    def walk(self, serial, path, skipped=None):
+        self.walked.append(path)
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        if skipped is not None:
+            skipped.extend(f"{name}/{rel}" if name else rel for rel in self.links)
+        return [(f"{path.rstrip('/')}/{rel}", f"{name}/{rel}" if name else rel, size, mtime)
+                for rel, (size, mtime) in self.files.items()]
+
+
+@pytest.mark.parametrize("root", ["/sdcard/DCIM", "/sdcard/DCIM/", "/sdcard/DCIM//", "/"])
+def test_remote_manifest_relative_paths(monkeypatch, root):
+    files = {"a.jpg": (1, 10), "Camera/b.jpg": (2, 20)}
+    monkeypatch.setattr(folder_sync, "get_client", lambda: _Client(files))
+    assert remote_manifest("serial", root) == files
+
+
+class _Sync:
+    """Sync connection over {path: FileEntry}; stat follows links through targets."""
+
+    def __init__(self, entries, targets):
+        self.entries = entries
+        self.targets = targets
+
+    def list(self, path):
+        prefix = path.rstrip("/") + "/"
+        return [entry for full, entry in self.entries.items()
+                if full.startswith(prefix) and "/" not in full[len(prefix):]]
+
+    def stat(self, path):
+        return self.targets.get(path) or self.entries.get(path) or FileEntry(path, 0, 0, 0)
+
+
+class _SyncClient(AdbClient):
+    def __init__(self, sync):
+        super().__init__()
+        self._sync = sync
+
+    @contextmanager
+    def sync(self, serial=None):
+        yield self._sync
+
+
+def test_walk_follows_file_links_and_skips_folder_links():
+    dir_mode, file_mode, link_mode = stat.S_IFDIR | 0o755, stat.S_IFREG | 0o644, stat.S_IFLNK | 0o777
+    entries = {
+        "/s": FileEntry("s", dir_mode, 0, 0),
+        "/s/a.txt": FileEntry("a.txt", file_mode, 5, 10),
+        "/s/to_file": FileEntry("to_file", link_mode, 9, 1),
+        "/s/to_dir": FileEntry("to_dir", link_mode, 3, 1),
+        "/s/dangling": FileEntry("dangling", link_mode, 7, 1),
+    }
+    targets = {"/s/to_file": FileEntry("to_file", file_mode, 500, 20),
+               "/s/to_dir": FileEntry("to_dir", dir_mode, 0, 0)}
+    skipped = []
+    files = _SyncClient(_Sync(entries, targets)).walk("serial", "/s", skipped)
+    assert sorted(files) == [("/s/a.txt", "s/a.txt", 5, 10), ("/s/to_file", "s/to_file", 500, 20)]
+    assert sorted(skipped) == ["s/dangling", "s/to_dir"]
+
+
+@pytest.mark.parametrize("direction", ["pull", "push", "both"])
+def test_local_files_under_a_skipped_link_are_left_alone(monkeypatch, tmp_path, direction):
+    (tmp_path / "music").mkdir()
+    (tmp_path / "music" / "song.mp3").write_bytes(b"x")
+    (tmp_path / "extra.txt").write_bytes(b"x")
+    monkeypatch.setattr(folder_sync, "get_client", lambda: _Client({}, links=["music"]))
+    plan = plan_sync("serial", "/sdcard/s", str(tmp_path), direction, delete=True)
+    assert plan.skipped == ["music"]
+    assert all(not action.path.startswith("music") for action in plan.actions)
+    assert [action.path for action in plan.actions] == ["extra.txt"]
+
+
+# --- drop_identical ---
+@pytest.mark.parametrize("direction, expected", [("pull", [TOUCH_LOCAL]), ("both", [TOUCH_LOCAL]), ("push", [])])
+def test_identical_files_are_not_transferred(monkeypatch, tmp_path, direction, expected):
+    (tmp_path / "a.txt").write_bytes(b"same")
+    remote, local = {"a.txt": (4, 2000)}, {"a.txt": (4, 1000)}
+    digest = folder_sync.local_checksum(str(tmp_path / "a.txt"), "md5")
+    monkeypatch.setattr(folder_sync, "checksum_files", lambda serial, files, algorithm, cache: {
+        path: digest for path, _, _ in files})
+    actions, state = diff_manifests(remote, local, direction)
+    plan = SyncPlan("serial", "/sdcard/s", str(tmp_path), direction, actions, state)
+    drop_identical(plan, remote, local)
+    # A push never touches the local side, which is its source.
+    assert [action.op for action in plan.actions] == expected
@@ -0,0 +1,59 @@
+from src.utils.fuzzy import FuzzyIndex, score_match, trigrams
+
+
+def names(results):
+    return [item for item, _ in results]
+
+
+def test_trigrams():
+    assert trigrams("abcd") == {"abc", "bcd"}
+    assert trigrams("ab") == set()
+
+
+def test_score_prefers_substring_then_word_start_then_short():
+    assert score_match("cat", "cat.jpg") > score_match("cat", "bobcat.jpg")
+    assert score_match("cat", "my_cat.jpg") > score_match("cat", "bobcat.jpg")
+    assert score_match("cat", "cat.jpg") > score_match("cat", "cat_with_a_long_name.jpg")
+    assert score_match("cat", "c_a_t.jpg") < score_match("cat", "bobcat.jpg")
+    assert score_match("cat", "dog.jpg") is None
+
+
+def test_search_ranks_exact_and_word_start_matches_first():
+    index = FuzzyIndex(["concatenate.txt", "cat.jpg", "my_cat.png", "c-a-t.gif", "dog.jpg"])
+    assert names(index.search("cat")) == ["cat.jpg", "my_cat.png", "concatenate.txt", "c-a-t.gif"]
+
+
+def test_search_is_case_insensitive_and_keeps_items():
+    index = FuzzyIndex([("/sdcard/DCIM/IMG_0001.JPG", 1), ("/sdcard/Music/song.mp3", 2)], key=lambda item: item[0])
+    assert names(index.search("img_0001")) == [("/sdcard/DCIM/IMG_0001.JPG", 1)]
+
+
+def test_search_finds_one_typo_away():
+    index = FuzzyIndex(["vacation_photos", "vacuum_manual.pdf", "invoice.pdf"])
+    # A substituted character changes at most three trigrams, which the candidate count tolerates.
+    assert names(index.search("vacatiin_photos")) == ["vacation_photos"]
+
+
+def test_search_subsequence_and_short_queries():
+    index = FuzzyIndex(["screenshot_2024.png", "notes.txt"])
+    assert names(index.search("scr24")) == ["screenshot_2024.png"]
+    assert names(index.search("n")) == ["notes.txt", "screenshot_2024.png"]
+
+
+def test_search_limit_and_unlimited():
+    index = FuzzyIndex([f"file_{i:04d}.txt" for i in range(500)])
+    assert len(index.search("file", limit=10)) == 10
+    assert len(index.search("file", limit=None)) == 500
+
+
+def test_search_empty_query_and_cancel():
+    index = FuzzyIndex(["a.txt", "b.txt"])
+    assert index.search("   ") == []
+    assert index.search("ax", cancelled=lambda: True) == []
+
+
+def test_extend_updates_index():
+    index = FuzzyIndex(["one.txt"])
+    index.extend(["two.txt"])
+    assert len(index) == 2
+    assert names(index.search("two")) == ["two.txt"]
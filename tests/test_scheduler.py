@@ -0,0 +1,174 @@
+import pytest
+from PyQt6.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from src.utils.scheduler import (
+    CANCELLED, COMPLETED, FAILED, HIGH, LOW, NORMAL, PAUSED, QUEUED, RUNNING, TransferScheduler
+)
+
+
+@pytest.fixture(autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+class _Worker(QObject):
+    """Stands in for a TransferWorker thread: records the calls, finishes when told."""
+    finished = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def start(self):
+        self.calls.append("start")
+
+    def pause(self):
+        self.calls.append("pause")
+
+    def resume(self):
+        self.calls.append("resume")
+
+    def cancel(self):
+        self.calls.append("cancel")
+
+
+def submit(scheduler, transfer_id, device="s1", priority=NORMAL):
+    worker = _Worker()
+    scheduler.submit(transfer_id, worker, device, priority)
+    return worker
+
+
+def order(scheduler):
+    return sorted(scheduler.positions(), key=scheduler.positions().get)
+
+
+def outcomes(scheduler):
+    finished = {}
+    scheduler.transferFinished.connect(lambda transfer_id, outcome: finished.__setitem__(transfer_id, outcome))
+    return finished
+
+
+# --- Waiting order ---
+def test_higher_priority_starts_first():
+    scheduler = TransferScheduler(max_active=1)
+    submit(scheduler, "busy")
+    submit(scheduler, "low", priority=LOW)
+    submit(scheduler, "normal")
+    submit(scheduler, "high", priority=HIGH)
+    assert order(scheduler) == ["high", "normal", "low"]
+
+
+def test_devices_take_turns_and_each_device_keeps_submission_order():
+    scheduler = TransferScheduler(max_active=1, per_device=5)
+    submit(scheduler, "busy", "s0")
+    for transfer_id in ("a1", "a2", "a3"):
+        submit(scheduler, transfer_id, "s1")
+    submit(scheduler, "b1", "s2")
+    assert order(scheduler) == ["a1", "b1", "a2", "a3"]
+
+
+def test_device_served_longest_ago_goes_first():
+    scheduler = TransferScheduler(max_active=1, per_device=5)
+    busy = submit(scheduler, "busy", "s1")
+    submit(scheduler, "a", "s1")
+    submit(scheduler, "b", "s2")
+    # s1 was just served, so s2 is next although its transfer came later.
+    assert order(scheduler) == ["b", "a"]
+    busy.finished.emit()
+    assert scheduler.state("b") == RUNNING
+
+
+# --- Slots ---
+def test_per_device_cap():
+    scheduler = TransferScheduler(max_active=5, per_device=2)
+    workers = [submit(scheduler, f"a{index}", "s1") for index in range(3)]
+    other = submit(scheduler, "b", "s2")
+    assert [worker.calls for worker in workers] == [["start"], ["start"], []]
+    assert other.calls == ["start"]
+    workers[0].finished.emit()
+    assert workers[2].calls == ["start"]
+
+
+def test_global_cap():
+    scheduler = TransferScheduler(max_active=2, per_device=2)
+    workers = [submit(scheduler, f"t{index}", f"s{index}") for index in range(3)]
+    assert scheduler.active_count() == 2
+    assert scheduler.state("t2") == QUEUED
+    workers[1].finished.emit()
+    assert workers[2].calls == ["start"]
+
+
+def test_lower_limits_apply_to_new_starts_only():
+    scheduler = TransferScheduler(max_active=3, per_device=3)
+    workers = [submit(scheduler, f"t{index}") for index in range(3)]
+    scheduler.set_limits(1, 1)
+    assert scheduler.active_count() == 3
+    workers[0].finished.emit()
+    submit(scheduler, "later")
+    assert scheduler.state("later") == QUEUED
+
+
+def test_fan_out_needs_a_slot_on_every_device():
+    scheduler = TransferScheduler(max_active=5, per_device=1)
+    first = submit(scheduler, "a", "s1")
+    fan_out = submit(scheduler, "fan", ["s1", "s2"])
+    other = submit(scheduler, "b", "s2")
+    assert fan_out.calls == [] and other.calls == ["start"]
+    first.finished.emit()
+    assert fan_out.calls == []
+    other.finished.emit()
+    assert fan_out.calls == ["start"]
+    # While it runs it holds both devices.
+    submit(scheduler, "c", "s2")
+    assert scheduler.state("c") == QUEUED
+
+
+# --- Control ---
+def test_pause_frees_the_slot_and_resume_waits_for_one():
+    scheduler = TransferScheduler(max_active=1)
+    first = submit(scheduler, "a")
+    second = submit(scheduler, "b")
+    scheduler.pause("a")
+    assert first.calls == ["start", "pause"]
+    assert scheduler.state("a") == PAUSED
+    assert second.calls == ["start"]
+    scheduler.resume("a")
+    assert scheduler.state("a") == QUEUED
+    second.finished.emit()
+    assert first.calls == ["start", "pause", "resume"]
+    assert scheduler.state("a") == RUNNING
+
+
+def test_cancel_queued_transfer_never_starts_it():
+    scheduler = TransferScheduler(max_active=1)
+    finished = outcomes(scheduler)
+    submit(scheduler, "a")
+    queued = submit(scheduler, "b")
+    scheduler.cancel("b")
+    assert finished == {"b": CANCELLED}
+    assert queued.calls == []
+    assert scheduler.state("b") is None
+    assert len(scheduler) == 1
+
+
+def test_cancel_running_transfer_waits_for_the_worker():
+    scheduler = TransferScheduler()
+    finished = outcomes(scheduler)
+    worker = submit(scheduler, "a")
+    scheduler.cancel("a")
+    assert worker.calls == ["start", "cancel"]
+    assert finished == {}
+    worker.finished.emit()
+    assert finished == {"a": CANCELLED}
+
+
+def test_outcome_reports_errors():
+    scheduler = TransferScheduler()
+    finished = outcomes(scheduler)
+    ok, broken, partial = submit(scheduler, "ok"), submit(scheduler, "broken", "s2"), submit(scheduler, "partial", "s3")
+    broken.error_occurred.emit("device gone")
+    partial.failed = 2
+    for worker in (ok, broken, partial):
+        worker.finished.emit()
+    assert finished == {"ok": COMPLETED, "broken": FAILED, "partial": FAILED}
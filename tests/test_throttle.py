@@ -0,0 +1,100 @@
+import pytest
+
+from src.utils import throttle
+from src.utils.throttle import MIN_BURST, TokenBucket
+
+KB = 1024
+MB = 1024 * KB
+
+
+class _Clock:
+    """Stands in for the time module: sleeping only moves the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(throttle, "time", clock)
+    return clock
+
+
+def send(bucket, clock, total, chunk=64 * KB):
+    """
+    Seconds it takes to push total bytes through bucket in chunk sized
+    pieces. The saved up tokens pass at once and the last chunk on credit,
+    so at rate r this is about (total - saved - chunk) / r.
+    """
+    start = clock.now
+    for _ in range(total // chunk):
+        bucket.consume(chunk)
+    return clock.now - start
+
+
+def test_long_run_rate(clock):
+    bucket = TokenBucket(1 * MB)
+    assert send(bucket, clock, 4 * MB) == pytest.approx((4 * MB - 2 * MIN_BURST) / MB, rel=0.02)
+
+
+def test_chunks_larger_than_the_burst_are_paid_off(clock):
+    bucket = TokenBucket(256 * KB)
+    assert send(bucket, clock, 4 * MB, chunk=1 * MB) == pytest.approx((3 * MB - MIN_BURST) / (256 * KB), rel=0.02)
+
+
+def test_rate_change_applies_from_then_on(clock):
+    bucket = TokenBucket(1 * MB)
+    first = send(bucket, clock, 2 * MB)
+    bucket.set_rate(256 * KB)
+    second = send(bucket, clock, 2 * MB)
+    assert first == pytest.approx((2 * MB - 2 * MIN_BURST) / MB, rel=0.02)
+    assert second == pytest.approx(8, rel=0.02)
+    bucket.set_rate(1 * MB)
+    assert send(bucket, clock, 2 * MB) == pytest.approx(2, rel=0.02)
+
+
+def test_debt_survives_a_rate_change(clock):
+    bucket = TokenBucket(1 * MB)
+    bucket.consume(MIN_BURST)
+    bucket.consume(2 * MB)
+    bucket.set_rate(2 * MB)
+    start = clock.now
+    bucket.consume(1)
+    # The 2 MB taken on credit are paid off at the new rate before anything else passes.
+    assert clock.now - start == pytest.approx(1, rel=0.02)
+
+
+def test_idle_time_saves_up_at_most_a_quarter_second(clock):
+    bucket = TokenBucket(1 * MB)
+    clock.now += 100
+    assert send(bucket, clock, 2 * MB) == pytest.approx((2 * MB - MB // 4 - 64 * KB) / MB, rel=0.02)
+
+
+def test_unlimited_then_limited_starts_from_a_small_burst(clock):
+    bucket = TokenBucket(0)
+    assert send(bucket, clock, 16 * MB) == 0
+    clock.now += 100
+    bucket.set_rate(1 * MB)
+    assert send(bucket, clock, 2 * MB) == pytest.approx((2 * MB - 2 * MIN_BURST) / MB, rel=0.02)
+
+
+def test_lifting_the_limit_lets_everything_through(clock):
+    bucket = TokenBucket(64 * KB)
+    bucket.consume(4 * MB)
+    bucket.set_rate(0)
+    assert send(bucket, clock, 8 * MB) == 0
+
+
+def test_interrupted_consume_returns_early(clock):
+    bucket = TokenBucket(64 * KB)
+    bucket.consume(10 * MB)
+    start = clock.now
+    bucket.consume(1, interrupted=lambda: clock.now - start > 1)
+    assert clock.now - start < 1.5
@@ -0,0 +1,146 @@
+import asyncio
+import socket
+
+import pytest
+
+from src.utils.wifi_scan import (
+    WifiDevice, _MdnsListener, parse_dns_records, parse_hosts, parse_ports, probe_adb, scan
+)
+
+# A wireless-debugging announcement: PTR for the service, then SRV, TXT and A in the additional section,
+# with the name compression phones use.
+MDNS_RESPONSE = bytes.fromhex(
+    "000084000000000100000003105f6164622d746c732d636f6e6e656374045f74"
+    "6370056c6f63616c00000c0001000000780018156164622d5235384d31323341"
+    "42432d78597a39516bc00cc0330021800100000078001700000000914f09416e"
+    "64726f69642d33056c6f63616c00c0330010800100000078000403763d31c05d"
+    "00018001000000780004c0a8012a"
+)
+INSTANCE = "adb-R58M123ABC-xYz9Qk._adb-tls-connect._tcp.local"
+
+
+# --- Hosts and ports ---
+def test_parse_hosts_single_cidr_and_range():
+    assert parse_hosts("192.168.1.7") == ["192.168.1.7"]
+    assert parse_hosts("10.0.0.0/30") == ["10.0.0.1", "10.0.0.2"]
+    assert parse_hosts("192.168.1.10-12") == ["192.168.1.10", "192.168.1.11", "192.168.1.12"]
+    assert parse_hosts("192.168.1.254-192.168.2.1") == ["192.168.1.254", "192.168.1.255", "192.168.2.0", "192.168.2.1"]
+
+
+def test_parse_hosts_edge_cases():
+    assert parse_hosts("10.0.0.5/32") == ["10.0.0.5"]
+    assert parse_hosts(" 10.0.0.1 , ,10.0.0.2 ") == ["10.0.0.1", "10.0.0.2"]
+    assert parse_hosts("") == []
+    assert parse_hosts("10.0.0.9-7") == []
+    assert len(parse_hosts("192.168.0.0/24")) == 254
+
+
+@pytest.mark.parametrize("text", ["192.168.1.300", "not-a-host", "10.0.0.0/33"])
+def test_parse_hosts_rejects_bad_input(text):
+    with pytest.raises(ValueError):
+        parse_hosts(text)
+
+
+def test_parse_ports():
+    assert parse_ports("5555") == [5555]
+    assert parse_ports("5555-5557, 37000") == [5555, 5556, 5557, 37000]
+    assert parse_ports("") == []
+
+
+@pytest.mark.parametrize("text", ["0", "65536", "1-70000", "abc"])
+def test_parse_ports_rejects_bad_input(text):
+    with pytest.raises(ValueError):
+        parse_ports(text)
+
+
+# --- Probing ---
+async def _listener(handler):
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _answer(reply):
+    async def handle(reader, writer):
+        await reader.read(24)
+        writer.write(reply)
+        await writer.drain()
+        await asyncio.sleep(0.5)
+        writer.close()
+    return await _listener(handle)
+
+
+@pytest.mark.parametrize("reply", [b"CNXN" + bytes(20), b"AUTH" + bytes(20), b"STLS" + bytes(20)])
+def test_probe_adb_recognizes_adbd(reply):
+    async def run():
+        server, port = await _answer(reply)
+        async with server:
+            return await probe_adb("127.0.0.1", port, timeout=1)
+    assert asyncio.run(run())
+
+
+def test_probe_adb_rejects_other_services():
+    async def run():
+        server, port = await _answer(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        async with server:
+            return await probe_adb("127.0.0.1", port, timeout=1)
+    assert not asyncio.run(run())
+
+
+def test_probe_adb_times_out_on_silent_listener():
+    async def run():
+        async def handle(reader, writer):
+            await asyncio.sleep(2)
+            writer.close()
+        server, port = await _listener(handle)
+        async with server:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            result = await probe_adb("127.0.0.1", port, timeout=0.2)
+            return result, loop.time() - start
+    result, elapsed = asyncio.run(run())
+    assert not result
+    assert elapsed < 1
+
+
+def test_probe_adb_closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    assert not asyncio.run(probe_adb("127.0.0.1", port, timeout=0.5))
+
+
+def test_scan_reports_each_device_once():
+    async def run():
+        server, port = await _answer(b"CNXN" + bytes(20))
+        found, progress = [], []
+        async with server:
+            devices = await scan(["127.0.0.1", "127.0.0.1"], [port], found.append,
+                                 lambda done, total: progress.append((done, total)), timeout=1, mdns_seconds=0)
+        return devices, found, progress
+    devices, found, progress = asyncio.run(run())
+    assert len(devices) == len(found) == 1
+    assert found[0].host == "127.0.0.1" and found[0].source == "scan"
+    assert progress[-1] == (2, 2)
+
+
+# --- mDNS ---
+def test_parse_dns_records():
+    assert parse_dns_records(MDNS_RESPONSE) == [
+        ("_adb-tls-connect._tcp.local", 12, INSTANCE),
+        (INSTANCE, 33, (37199, "Android-3.local")),
+        ("Android-3.local", 1, "192.168.1.42"),
+    ]
+
+
+def test_parse_dns_records_truncated():
+    with pytest.raises((IndexError, ValueError)):
+        parse_dns_records(MDNS_RESPONSE[:60])
+
+
+def test_mdns_listener_reports_announced_device():
+    found = []
+    listener = _MdnsListener(found.append)
+    listener.datagram_received(MDNS_RESPONSE, ("192.168.1.99", 5353))
+    listener.datagram_received(b"garbage", ("192.168.1.99", 5353))
+    assert found[-1] == WifiDevice("192.168.1.42", 37199, "adb-R58M123ABC-xYz9Qk", "adb-tls-connect")